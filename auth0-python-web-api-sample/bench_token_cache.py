@@ -0,0 +1,88 @@
+"""Micro-benchmark of requires_auth with the verified-token cache on and off
+
+Signs a token with a throwaway RSA key, serves the matching JWKS document
+from a local file and calls /secured/private/ping through the Flask test
+client. Needs the "cryptography" package to generate the key.
+
+Usage: python bench_token_cache.py [--requests N]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+DOMAIN = "bench.example.com"
+AUDIENCE = "bench-api"
+KID = "bench-key"
+
+
+def make_token_and_jwks(directory):
+    """Returns a signed token and the file URL of the JWKS that verifies it
+    """
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(serialization.Encoding.PEM,
+                                            serialization.PrivateFormat.PKCS8,
+                                            serialization.NoEncryption())
+    public_pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                       serialization.PublicFormat.SubjectPublicKeyInfo)
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk = {k: v.decode("ascii") if isinstance(v, bytes) else v for k, v in public_jwk.items()}
+    public_jwk.update(kid=KID, use="sig")
+
+    jwks_path = os.path.join(directory, "jwks.json")
+    with open(jwks_path, "w") as jwks_file:
+        json.dump({"keys": [public_jwk]}, jwks_file)
+
+    token = jwt.encode({
+        "iss": "https://" + DOMAIN + "/",
+        "aud": AUDIENCE,
+        "exp": int(time.time()) + 3600,
+        "scope": "openid read:agenda"
+    }, private_pem.decode("ascii"), algorithm="RS256", headers={"kid": KID})
+    return token, "file://" + jwks_path
+
+
+def run(client, token, requests):
+    """Returns requests per second for the secured private ping
+    """
+    headers = {"Authorization": "Bearer " + token}
+    started = time.perf_counter()
+    for _ in range(requests):
+        resp = client.get("/secured/private/ping", headers=headers)
+        assert resp.status_code == 200, resp.data
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        token, jwks_url = make_token_and_jwks(directory)
+        os.environ.update(AUTH0_DOMAIN=DOMAIN, API_ID=AUDIENCE, JWKS_URL=jwks_url)
+        import server
+
+        client = server.APP.test_client()
+        run(client, token, 10)  # Warm up, fetches the JWKS document
+
+        cache_size = server.TOKEN_CACHE.max_size
+        server.TOKEN_CACHE.max_size = 0
+        rps_off = run(client, token, args.requests)
+        server.TOKEN_CACHE.max_size = cache_size
+        server.TOKEN_CACHE.clear()
+        rps_on = run(client, token, args.requests)
+
+    print("token cache off: {:8.0f} req/s".format(rps_off))
+    print("token cache on:  {:8.0f} req/s".format(rps_on))
+    print("speed-up:        {:8.1f}x".format(rps_on / rps_off))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Process-wide cache of the signing keys published in a JWKS document
+"""
+
+import json
+import threading
+import time
+from urllib.request import urlopen
+
+DEFAULT_TTL = 600
+DEFAULT_REFRESH_AHEAD = 0.8
+DEFAULT_NEGATIVE_TTL = 60
+DEFAULT_MIN_REFETCH_INTERVAL = 30
+DEFAULT_FETCH_TIMEOUT = 5
+DEFAULT_RETRY_INTERVAL = 30
+
+
+class JwksFetchError(Exception):
+    """The JWKS document couldn't be fetched, and no keys are cached
+    """
+
+
+class JwksCache(object):
+    """Keeps the keys of a JWKS document in memory, indexed by "kid"
+
+    The document is fetched once and then served from memory until the TTL
+    expires. Once a cached document is older than ``refresh_ahead * ttl`` a
+    background thread refreshes it, so secured requests keep being served
+    from memory while the new keys are downloaded.
+
+    A "kid" that is not in the cached document forces a refetch (keys may
+    have been rotated), but at most once every ``min_refetch_interval``
+    seconds. Unknown kids are remembered for ``negative_ttl`` seconds so a
+    flood of tokens with made up kids can't trigger a refetch stampede.
+
+    While the issuer is unreachable the stale keys keep being served, and
+    the document is refetched at most once every ``retry_interval`` seconds
+    instead of by every request.
+
+    Args:
+        url (str): Location of the JWKS document. Any URL understood by
+            urllib works, so tests can point it at a local
+            ``file:///path/to/jwks.json`` or at a stub server.
+        ttl (int): Seconds a fetched document is served without a refresh.
+        refresh_ahead (float): Fraction of the TTL after which a background
+            refresh is started.
+        negative_ttl (int): Seconds an unknown kid is remembered.
+        min_refetch_interval (int): Minimum seconds between two refetches
+            forced by unknown kids.
+        fetch_timeout (int): Network timeout in seconds for each fetch.
+        retry_interval (int): Minimum seconds between a failed fetch and the
+            next attempt.
+    """
+
+    def __init__(self, url, ttl=DEFAULT_TTL, refresh_ahead=DEFAULT_REFRESH_AHEAD,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 min_refetch_interval=DEFAULT_MIN_REFETCH_INTERVAL,
+                 fetch_timeout=DEFAULT_FETCH_TIMEOUT,
+                 retry_interval=DEFAULT_RETRY_INTERVAL, clock=time.monotonic):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.negative_ttl = negative_ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.fetch_timeout = fetch_timeout
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._keys = {}
+        self._fetched_at = None
+        self._last_forced_fetch = None
+        self._failed_at = None
+        self._unknown_kids = {}
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._refreshing = False
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    def get_key(self, kid):
+        """Returns the RSA key for a kid, or None if the issuer doesn't know it
+        Args:
+            kid (str): The "kid" from the unverified token header
+        Raises:
+            JwksFetchError: if no keys are cached and the document can't be
+                fetched
+        """
+        now = self._clock()
+        with self._lock:
+            if self._keys and self._in_retry_backoff(now):
+                # The last fetch failed, serve the stale keys until the next attempt is due
+                self.stale_hits += 1
+                return self._keys.get(kid)
+            if self._fetched_at is not None and now - self._fetched_at < self.ttl:
+                key = self._keys.get(kid)
+                if key is not None:
+                    self.hits += 1
+                    self._maybe_refresh_in_background(now)
+                    return key
+                if self._is_known_unknown(kid, now):
+                    self.negative_hits += 1
+                    return None
+                expired = False
+            else:
+                expired = True
+            self.misses += 1
+
+        try:
+            if expired:
+                self._fetch()
+            elif self._may_force_fetch(now):
+                self._fetch(forced=True)
+        except JwksFetchError:
+            # Keep serving the stale keys while the issuer is unreachable
+            if not self._keys:
+                raise
+
+        with self._lock:
+            key = self._keys.get(kid)
+            if key is None:
+                self._unknown_kids[kid] = self._clock() + self.negative_ttl
+            return key
+
+    def refresh(self):
+        """Refetches the JWKS document now, regardless of its age
+        """
+        self._fetch()
+
+    def clear(self):
+        """Drops all cached keys and counters
+        """
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = None
+            self._last_forced_fetch = None
+            self._failed_at = None
+            self._unknown_kids = {}
+            self.hits = self.misses = self.negative_hits = self.stale_hits = 0
+            self.fetches = self.fetch_errors = 0
+
+    def stats(self):
+        """Returns the cache counters as a dict
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+                "stale_hits": self.stale_hits,
+                "fetches": self.fetches,
+                "fetch_errors": self.fetch_errors,
+                "keys": len(self._keys),
+            }
+
+    def _in_retry_backoff(self, now):
+        # Called with self._lock held
+        return self._failed_at is not None and now - self._failed_at < self.retry_interval
+
+    def _is_known_unknown(self, kid, now):
+        expires_at = self._unknown_kids.get(kid)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del self._unknown_kids[kid]
+            return False
+        return True
+
+    def _may_force_fetch(self, now):
+        with self._lock:
+            if (self._last_forced_fetch is not None and
+                    now - self._last_forced_fetch < self.min_refetch_interval):
+                return False
+            self._last_forced_fetch = now
+            return True
+
+    def _maybe_refresh_in_background(self, now):
+        # Called with self._lock held
+        if self._refreshing or now - self._fetched_at < self.ttl * self.refresh_ahead:
+            return
+        self._refreshing = True
+        thread = threading.Thread(target=self._background_refresh, name="jwks-refresh")
+        thread.daemon = True
+        thread.start()
+
+    def _background_refresh(self):
+        try:
+            self._fetch()
+        except JwksFetchError:
+            pass  # The stale keys stay in use, the failure time throttles the retries
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _fetch(self, forced=False):
+        # Only one thread downloads the document, the others wait for its result
+        started = self._clock()
+        with self._fetch_lock:
+            with self._lock:
+                if not forced and self._fetched_at is not None and self._fetched_at >= started:
+                    return
+                if self._failed_at is not None and self._failed_at >= started:
+                    # Failed while this thread waited for the lock, don't retry right away
+                    raise JwksFetchError("Fetching {} failed".format(self.url))
+            try:
+                with urlopen(self.url, timeout=self.fetch_timeout) as response:
+                    jwks = json.loads(response.read().decode("utf-8"))
+            except Exception as error:
+                with self._lock:
+                    self.fetch_errors += 1
+                    self._failed_at = self._clock()
+                raise JwksFetchError("Fetching {} failed: {}".format(self.url, error)) from error
+            keys = {}
+            for key in jwks.get("keys", []):
+                if "kid" in key:
+                    keys[key["kid"]] = {
+                        "kty": key["kty"],
+                        "kid": key["kid"],
+                        "use": key["use"],
+                        "n": key["n"],
+                        "e": key["e"]
+                    }
+            with self._lock:
+                self._keys = keys
+                self._fetched_at = self._clock()
+                self._failed_at = None
+                self._unknown_kids = {
+                    kid: expires_at for kid, expires_at in self._unknown_kids.items() if kid not in keys
+                }
+                self.fetches += 1
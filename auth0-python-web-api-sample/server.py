@@ -2,19 +2,23 @@
 """
 
 from functools import wraps
-import json
 from os import environ as env, path
-import urllib
 
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify, _app_ctx_stack
 from flask_cors import cross_origin
 from jose import jwt
 
+from jwks_cache import JwksCache
+from token_cache import VerifiedTokenCache
+
 load_dotenv(path.join(path.dirname(__file__), ".env"))
 AUTH0_DOMAIN = env["AUTH0_DOMAIN"]
 API_AUDIENCE = env["API_ID"]
 ALGORITHMS = ["RS256"]
+JWKS_URL = env.get("JWKS_URL", "https://"+AUTH0_DOMAIN+"/.well-known/jwks.json")
+JWKS_CACHE = JwksCache(JWKS_URL, ttl=int(env.get("JWKS_CACHE_TTL", 600)))
+TOKEN_CACHE = VerifiedTokenCache(max_size=int(env.get("TOKEN_CACHE_SIZE", 10000)))
 APP = Flask(__name__)
 
 
@@ -58,67 +62,76 @@ def requires_scope(required_scope):
     Args:
         required_scope (str): The scope required to access the resource
     """
-    token = get_token_auth_header()
-    unverified_claims = jwt.get_unverified_claims(token)
-    token_scopes = unverified_claims["scope"].split()
-    for token_scope in token_scopes:
-        if token_scope == required_scope:
-            return True
-    return False
+    token_scopes = getattr(_app_ctx_stack.top, "current_scopes", None)
+    if token_scopes is None:
+        token = get_token_auth_header()
+        unverified_claims = jwt.get_unverified_claims(token)
+        token_scopes = unverified_claims["scope"].split()
+    return required_scope in token_scopes
+
+def verify_token(token):
+    """Verifies the signature and claims of the access token
+    Returns the decoded payload, or an error response
+    Args:
+        token (str): The raw bearer token
+    """
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        return handle_error({"code": "invalid_header",
+                             "description": "Invalid header. "
+                                            "Use an RS256 signed JWT Access Token"}, 401)
+    if unverified_header["alg"] == "HS256":
+        return handle_error({"code": "invalid_header",
+                             "description": "Invalid header. "
+                                            "Use an RS256 signed JWT Access Token"}, 401)
+    try:
+        rsa_key = JWKS_CACHE.get_key(unverified_header.get("kid"))
+    except Exception:
+        return handle_error({"code": "jwks_unavailable",
+                             "description": "Unable to fetch the signing"
+                                            " keys."}, 503)
+    if rsa_key:
+        try:
+            return jwt.decode(
+                token,
+                rsa_key,
+                algorithms=ALGORITHMS,
+                audience=API_AUDIENCE,
+                issuer="https://"+AUTH0_DOMAIN+"/"
+            )
+        except jwt.ExpiredSignatureError:
+            return handle_error({"code": "token_expired",
+                                 "description": "token is expired"}, 401)
+        except jwt.JWTClaimsError:
+            return handle_error({"code": "invalid_claims",
+                                 "description": "incorrect claims,"
+                                                " please check the audience and issuer"}, 401)
+        except Exception:
+            return handle_error({"code": "invalid_header",
+                                 "description": "Unable to parse authentication"
+                                                " token."}, 400)
+    return handle_error({"code": "invalid_header",
+                         "description": "Unable to find appropriate key"}, 400)
 
 def requires_auth(f):
     """Determines if the access token is valid
+    Tokens that were verified before are served from TOKEN_CACHE until they expire
     """
     @wraps(f)
     def decorated(*args, **kwargs):
         token = get_token_auth_header()
-        jsonurl = urllib.urlopen("https://"+AUTH0_DOMAIN+"/.well-known/jwks.json")
-        jwks = json.loads(jsonurl.read())
-        try:
-            unverified_header = jwt.get_unverified_header(token)
-        except jwt.JWTError:
-            return handle_error({"code": "invalid_header",
-                                 "description": "Invalid header. "
-                                                "Use an RS256 signed JWT Access Token"}, 401)
-        if unverified_header["alg"] == "HS256":
-            return handle_error({"code": "invalid_header",
-                                 "description": "Invalid header. "
-                                                "Use an RS256 signed JWT Access Token"}, 401)
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
-        if rsa_key:
-            try:
-                payload = jwt.decode(
-                    token,
-                    rsa_key,
-                    algorithms=ALGORITHMS,
-                    audience=API_AUDIENCE,
-                    issuer="https://"+AUTH0_DOMAIN+"/"
-                )
-            except jwt.ExpiredSignatureError:
-                return handle_error({"code": "token_expired",
-                                     "description": "token is expired"}, 401)
-            except jwt.JWTClaimsError:
-                return handle_error({"code": "invalid_claims",
-                                     "description": "incorrect claims,"
-                                                    " please check the audience and issuer"}, 401)
-            except Exception:
-                return handle_error({"code": "invalid_header",
-                                     "description": "Unable to parse authentication"
-                                                    " token."}, 400)
-
-            _app_ctx_stack.top.current_user = payload
-            return f(*args, **kwargs)
-        return handle_error({"code": "invalid_header",
-                             "description": "Unable to find appropriate key"}, 400)
+        if not isinstance(token, str):
+            return token
+        verified = TOKEN_CACHE.get(token)
+        if verified is None:
+            payload = verify_token(token)
+            if not isinstance(payload, dict):
+                return payload
+            verified = TOKEN_CACHE.put(token, payload)
+        _app_ctx_stack.top.current_user = verified.payload
+        _app_ctx_stack.top.current_scopes = verified.scopes
+        return f(*args, **kwargs)
     return decorated
 
 # Controllers API
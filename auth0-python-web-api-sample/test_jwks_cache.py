@@ -0,0 +1,100 @@
+"""Tests of jwks_cache against a local JWKS file, run with python -m unittest
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from jwks_cache import JwksCache, JwksFetchError
+
+
+def jwk(kid):
+    return {"kty": "RSA", "kid": kid, "use": "sig", "n": "n-" + kid, "e": "AQAB"}
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class JwksCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "jwks.json")
+        self.write_keys("key1")
+        self.clock = FakeClock()
+        # refresh_ahead=1 so that no background refresh races the assertions
+        self.cache = JwksCache("file://" + self.path, ttl=600, refresh_ahead=1, negative_ttl=60,
+                               min_refetch_interval=30, retry_interval=30, clock=self.clock)
+
+    def write_keys(self, *kids):
+        with open(self.path, "w") as jwks_file:
+            json.dump({"keys": [jwk(kid) for kid in kids]}, jwks_file)
+
+    def break_issuer(self):
+        os.remove(self.path)
+
+    def test_keys_are_served_from_memory_until_the_ttl_expires(self):
+        self.assertEqual(self.cache.get_key("key1")["n"], "n-key1")
+        self.write_keys("key2")
+        self.clock.now += 599
+        self.assertEqual(self.cache.get_key("key1")["n"], "n-key1")
+        self.assertEqual(self.cache.stats()["fetches"], 1)
+
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get_key("key1"))
+        self.assertEqual(self.cache.get_key("key2")["n"], "n-key2")
+        self.assertEqual(self.cache.stats()["fetches"], 2)
+
+    def test_unknown_kid_refetches_at_most_once_per_interval(self):
+        self.cache.get_key("key1")
+        self.write_keys("key1", "rotated")
+        self.assertEqual(self.cache.get_key("rotated")["n"], "n-rotated")
+        self.assertEqual(self.cache.stats()["fetches"], 2)
+
+        self.assertIsNone(self.cache.get_key("made-up"))
+        self.assertEqual(self.cache.stats()["fetches"], 2, "within min_refetch_interval of the last refetch")
+        self.clock.now += 30
+        self.assertIsNone(self.cache.get_key("made-up"))
+        self.assertEqual(self.cache.stats()["negative_hits"], 1, "remembered as unknown for negative_ttl")
+
+        self.clock.now += 60
+        self.assertIsNone(self.cache.get_key("made-up"))
+        self.assertEqual(self.cache.stats()["fetches"], 3)
+
+    def test_stale_keys_are_served_while_the_issuer_is_down(self):
+        self.cache.get_key("key1")
+        self.break_issuer()
+        self.clock.now += 600
+        self.assertEqual(self.cache.get_key("key1")["n"], "n-key1")
+        self.assertEqual(self.cache.stats()["fetch_errors"], 1)
+
+        # No retry until retry_interval has passed
+        self.clock.now += 29
+        for _ in range(10):
+            self.assertEqual(self.cache.get_key("key1")["n"], "n-key1")
+        self.assertEqual(self.cache.stats()["fetch_errors"], 1)
+        self.assertEqual(self.cache.stats()["stale_hits"], 10)
+
+        self.clock.now += 1
+        self.cache.get_key("key1")
+        self.assertEqual(self.cache.stats()["fetch_errors"], 2)
+
+        self.write_keys("key2")
+        self.clock.now += 30
+        self.assertEqual(self.cache.get_key("key2")["n"], "n-key2")
+        self.assertEqual(self.cache.stats()["fetches"], 2)
+
+    def test_fetch_failure_without_cached_keys_raises(self):
+        self.break_issuer()
+        with self.assertRaises(JwksFetchError):
+            self.cache.get_key("key1")
+        self.assertEqual(self.cache.stats()["fetch_errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
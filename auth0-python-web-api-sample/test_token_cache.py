@@ -0,0 +1,89 @@
+"""Tests of token_cache and of the scope checks of cached tokens, run with python -m unittest
+"""
+import os
+import time
+import unittest
+
+from token_cache import VerifiedTokenCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = VerifiedTokenCache(max_size=2, clock=self.clock)
+
+    def test_token_is_served_until_its_exp(self):
+        self.cache.put("token1", {"sub": "user1", "exp": 1100})
+        self.clock.now = 1099
+        self.assertEqual(self.cache.get("token1").payload["sub"], "user1")
+        self.clock.now = 1100
+        self.assertIsNone(self.cache.get("token1"))
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "size": 0})
+
+    def test_expired_or_exp_less_tokens_are_not_stored(self):
+        self.cache.put("expired", {"exp": 1000})
+        self.cache.put("no-exp", {})
+        self.assertIsNone(self.cache.get("expired"))
+        self.assertIsNone(self.cache.get("no-exp"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_least_recently_used_token_is_evicted(self):
+        self.cache.put("token1", {"exp": 2000})
+        self.cache.put("token2", {"exp": 2000})
+        self.cache.get("token1")
+        self.cache.put("token3", {"exp": 2000})
+        self.assertIsNotNone(self.cache.get("token1"))
+        self.assertIsNone(self.cache.get("token2"))
+        self.assertIsNotNone(self.cache.get("token3"))
+
+    def test_scopes(self):
+        verified = self.cache.put("token1", {"exp": 2000, "scope": "read:agenda write:agenda"})
+        self.assertEqual(verified.scopes, frozenset(["read:agenda", "write:agenda"]))
+        self.assertEqual(self.cache.get("token1").scopes, verified.scopes)
+        self.assertEqual(self.cache.put("token2", {"exp": 2000}).scopes, frozenset())
+
+    def test_disabled_cache(self):
+        cache = VerifiedTokenCache(max_size=0, clock=self.clock)
+        self.assertEqual(cache.put("token1", {"exp": 2000, "scope": "a"}).scopes, frozenset(["a"]))
+        self.assertIsNone(cache.get("token1"))
+
+
+class CachedTokenScopeTestCase(unittest.TestCase):
+    """requires_scope must check the scopes of the cached token, which skips the signature verification
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("AUTH0_DOMAIN", "test.example.com")
+        os.environ.setdefault("API_ID", "test-api")
+        import server
+        cls.server = server
+
+    def setUp(self):
+        self.server.TOKEN_CACHE.clear()
+        self.client = self.server.APP.test_client()
+
+    def get_private_ping(self, token, scope):
+        self.server.TOKEN_CACHE.put(token, {"sub": "user1", "exp": time.time() + 60, "scope": scope})
+        resp = self.client.get("/secured/private/ping", headers={"Authorization": "Bearer " + token})
+        self.assertEqual(resp.status_code, 200)
+        return resp.get_data(as_text=True)
+
+    def test_token_with_the_scope(self):
+        self.assertIn("has the appropriate scope", self.get_private_ping("token1", "read:agenda"))
+
+    def test_token_without_the_scope(self):
+        self.assertEqual(self.get_private_ping("token2", "read:other"), "You don't have access to this resource")
+        self.assertEqual(self.server.TOKEN_CACHE.stats()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
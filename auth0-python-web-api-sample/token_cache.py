@@ -0,0 +1,94 @@
+"""Bounded LRU cache of access tokens whose signature has already been verified
+"""
+
+from collections import OrderedDict, namedtuple
+import hashlib
+import threading
+import time
+
+DEFAULT_MAX_SIZE = 10000
+
+VerifiedToken = namedtuple("VerifiedToken", ["payload", "scopes", "expires_at"])
+
+
+class VerifiedTokenCache(object):
+    """Remembers the decoded payload of tokens that passed jwt.decode
+
+    Entries are keyed by a SHA-256 of the raw token, so the tokens themselves
+    are never kept in memory, and are dropped as soon as the token's "exp"
+    claim passes. When the cache is full the least recently used token is
+    evicted.
+
+    Args:
+        max_size (int): Maximum number of tokens kept. 0 disables the cache.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, clock=time.time):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token):
+        if isinstance(token, str):
+            token = token.encode("utf-8")
+        return hashlib.sha256(token).digest()
+
+    def get(self, token):
+        """Returns the VerifiedToken for a token, or None if it must be verified
+        Args:
+            token (str): The raw bearer token
+        """
+        if not self.max_size:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, token, payload):
+        """Stores the payload of a verified token and returns its VerifiedToken
+        Args:
+            token (str): The raw bearer token
+            payload (dict): The claims returned by jwt.decode
+        """
+        entry = VerifiedToken(payload, frozenset(payload.get("scope", "").split()),
+                              payload.get("exp", 0))
+        if not self.max_size or entry.expires_at <= self._clock():
+            return entry
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """Drops all cached tokens and counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Returns the cache counters as a dict
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
@@ -16,6 +16,8 @@ from flask import send_from_directory
 from flask import session
 
 import constants
+from session_store import regenerate_session
+from session_store import session_interface_from_env
 
 load_dotenv(path.join(path.dirname(__file__), ".env"))
 AUTH0_CALLBACK_URL = env[constants.AUTH0_CALLBACK_URL]
@@ -26,6 +28,7 @@ AUTH0_DOMAIN = env[constants.AUTH0_DOMAIN]
 APP = Flask(__name__, static_url_path='')
 APP.secret_key = constants.SECRET_KEY
 APP.debug = True
+APP.session_interface = session_interface_from_env(env, path.dirname(__file__))
 
 
 def requires_atn(f):
@@ -69,6 +72,7 @@ def callback_handling():
     token = get_token.authorization_code(AUTH0_CLIENT_ID,
                                          AUTH0_CLIENT_SECRET, code, AUTH0_CALLBACK_URL)
     user_info = auth0_users.userinfo(token['access_token'])
+    regenerate_session(session)
     session[constants.PROFILE_KEY] = json.loads(user_info)
     return redirect('/dashboard')
 
@@ -0,0 +1,187 @@
+"""Server-side Flask sessions: the session cookie only holds a random session ID, the session data (the Auth0 profile)
+is kept in a store instead of being re-sent and re-verified with every request.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from flask.sessions import SessionInterface
+from flask.sessions import SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_TTL = 8 * 3600  # seconds
+SWEEP_INTERVAL = 300  # seconds
+
+
+class MemorySessionStore(object):
+    """LRU store in process memory, for a single process.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= self._clock():
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            return data
+
+    def set(self, sid, data):
+        with self._lock:
+            self._sessions[sid] = (data, self._clock() + self.ttl)
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def delete_expired(self):
+        with self._lock:
+            now = self._clock()
+            expired = [sid for sid, (_, expires_at) in self._sessions.items() if expires_at <= now]
+            for sid in expired:
+                del self._sessions[sid]
+            return len(expired)
+
+
+class SqliteSessionStore(object):
+    """Store in a SQLite file, shared by the worker processes on a host.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self._clock = clock
+        with self._connect() as conn:
+            conn.execute('create table if not exists session (sid text primary key, data text, expires_at real)')
+            conn.execute('create index if not exists ix_session_expires_at on session (expires_at)')
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def get(self, sid):
+        with self._connect() as conn:
+            row = conn.execute('select data from session where sid = ? and expires_at > ?',
+                               (sid, self._clock())).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, sid, data):
+        with self._connect() as conn:
+            conn.execute('insert or replace into session (sid, data, expires_at) values (?, ?, ?)',
+                         (sid, json.dumps(data), self._clock() + self.ttl))
+
+    def delete(self, sid):
+        with self._connect() as conn:
+            conn.execute('delete from session where sid = ?', (sid,))
+
+    def delete_expired(self):
+        with self._connect() as conn:
+            return conn.execute('delete from session where expires_at <= ?', (self._clock(),)).rowcount
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super(ServerSideSession, self).__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.regenerate_sid = False
+
+    def regenerate(self):
+        """Give the session a new ID when it is saved, call on login so that a session ID known before (e.g. set by an
+        attacker) doesn't become a logged in session.
+        """
+        self.regenerate_sid = True
+        self.modified = True
+
+
+def regenerate_session(session):
+    """Give the session a new ID when it is saved, if it is kept server side, see ServerSideSession.regenerate. Cookie
+    sessions have no ID.
+    """
+    if isinstance(session, ServerSideSession):
+        session.regenerate()
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps the sessions in a MemorySessionStore or SqliteSessionStore. A session is stored when modified and expires
+    the store's ttl seconds after, expired sessions are swept every SWEEP_INTERVAL seconds.
+    """
+
+    def __init__(self, store, clock=time.time):
+        self.store = store
+        self._clock = clock
+        self._swept_at = clock()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(new=True)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and session.sid:
+                self.store.delete(session.sid)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            if session.regenerate_sid and session.sid is not None:
+                self.store.delete(session.sid)
+                session.sid = None
+            if session.sid is None:
+                session.sid = os.urandom(32).hex()
+            self.store.set(session.sid, dict(session))
+            response.set_cookie(app.session_cookie_name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                secure=self.get_cookie_secure(app))
+        self.sweep()
+
+    def sweep(self, force=False):
+        """Delete the expired sessions, at most every SWEEP_INTERVAL seconds unless forced.
+        """
+        now = self._clock()
+        if not force and now - self._swept_at < SWEEP_INTERVAL:
+            return 0
+        self._swept_at = now
+        return self.store.delete_expired()
+
+
+def session_interface_from_env(env, directory):
+    """SESSION_STORE=sqlite (default), stored in SESSION_STORE_PATH, or memory for a single worker process. SESSION_TTL
+    is in seconds.
+    """
+    kind = env.get('SESSION_STORE', 'sqlite')
+    ttl = int(env.get('SESSION_TTL', DEFAULT_TTL))
+    if kind == 'sqlite':
+        store = SqliteSessionStore(env.get('SESSION_STORE_PATH', os.path.join(directory, 'sessions.sqlite3')), ttl)
+    elif kind == 'memory':
+        store = MemorySessionStore(ttl=ttl)
+    else:
+        raise ValueError('Unknown SESSION_STORE {}'.format(kind))
+    return ServerSideSessionInterface(store)
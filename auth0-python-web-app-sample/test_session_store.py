@@ -0,0 +1,154 @@
+"""Tests of session_store, run with python -m unittest
+"""
+import os
+import tempfile
+import unittest
+
+from flask import Flask, session
+
+from session_store import MemorySessionStore, SWEEP_INTERVAL, ServerSideSessionInterface, SqliteSessionStore, \
+    regenerate_session, session_interface_from_env
+
+PROFILE = {"email": "user1@example.com", "name": "User 1"}
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_app(store=None):
+    """Sessions kept in store, in the cookie if None."""
+    app = Flask(__name__)
+    app.secret_key = "secret"
+    if store is not None:
+        app.session_interface = ServerSideSessionInterface(store)
+
+    @app.route("/login")
+    def login():
+        regenerate_session(session)
+        session["profile"] = PROFILE
+        return "ok"
+
+    @app.route("/profile")
+    def profile():
+        return session.get("profile", {}).get("email", "anonymous")
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return "ok"
+
+    return app
+
+
+def session_id(resp):
+    cookies = [header for header in resp.headers.getlist("Set-Cookie") if header.startswith("session=")]
+    return cookies[0].split(";")[0].split("=", 1)[1] if cookies else None
+
+
+class StoreTestCase(object):
+    """Tests run against both stores, the subclasses set make_store.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = self.make_store()
+
+    def test_set_get_delete(self):
+        self.store.set("a", {"profile": PROFILE})
+        self.assertEqual(self.store.get("a"), {"profile": PROFILE})
+        self.store.delete("a")
+        self.assertIsNone(self.store.get("a"))
+        self.assertIsNone(self.store.get("unknown"))
+
+    def test_sessions_expire(self):
+        self.store.set("a", {})
+        self.clock.now += 59
+        self.assertEqual(self.store.get("a"), {})
+        self.clock.now += 1
+        self.assertEqual(self.store.delete_expired(), 1)
+        self.assertIsNone(self.store.get("a"))
+
+    def test_session_round_trip(self):
+        app = make_app(self.store)
+        with app.test_client() as client:
+            sid = session_id(client.get("/login"))
+            self.assertEqual(len(sid), 64)
+            self.assertEqual(self.store.get(sid), {"profile": PROFILE})
+
+            resp = client.get("/profile")
+            self.assertEqual(resp.get_data(as_text=True), "user1@example.com")
+            self.assertIsNone(session_id(resp), "an unmodified session is not saved again")
+
+            client.get("/logout")
+            self.assertIsNone(self.store.get(sid))
+            self.assertEqual(client.get("/profile").get_data(as_text=True), "anonymous")
+
+    def test_login_gives_the_session_a_new_id(self):
+        app = make_app(self.store)
+        with app.test_client() as client:
+            client.set_cookie("localhost", "session", "fixed")
+            self.store.set("fixed", {"next": "/dashboard"})
+            sid = session_id(client.get("/login"))
+
+            self.assertNotEqual(sid, "fixed")
+            self.assertIsNone(self.store.get("fixed"))
+            self.assertEqual(self.store.get(sid), {"next": "/dashboard", "profile": PROFILE})
+
+    def test_login_with_cookie_sessions(self):
+        with make_app().test_client() as client:
+            self.assertEqual(client.get("/login").status_code, 200)
+            self.assertEqual(client.get("/profile").get_data(as_text=True), PROFILE["email"])
+
+
+class MemorySessionStoreTestCase(StoreTestCase, unittest.TestCase):
+    def make_store(self):
+        return MemorySessionStore(max_size=2, ttl=60, clock=self.clock)
+
+    def test_least_recently_used_session_is_evicted(self):
+        self.store.set("a", {})
+        self.store.set("b", {})
+        self.store.get("a")
+        self.store.set("c", {})
+        self.assertIsNone(self.store.get("b"))
+        self.assertEqual(self.store.get("a"), {})
+
+
+class SqliteSessionStoreTestCase(StoreTestCase, unittest.TestCase):
+    def make_store(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        return SqliteSessionStore(os.path.join(self.directory.name, "sessions.sqlite3"), ttl=60, clock=self.clock)
+
+    def test_sessions_are_stored_as_json(self):
+        self.store.set("a", {"profile": PROFILE})
+        with self.store._connect() as conn:
+            self.assertEqual(conn.execute("select data from session").fetchone()[0], '{"profile": {"email": '
+                             '"user1@example.com", "name": "User 1"}}')
+
+
+class SessionInterfaceTestCase(unittest.TestCase):
+    def test_sweep_deletes_expired_sessions(self):
+        store_clock, sweep_clock = FakeClock(), FakeClock()
+        interface = ServerSideSessionInterface(MemorySessionStore(ttl=60, clock=store_clock), clock=sweep_clock)
+        interface.store.set("a", {})
+        store_clock.now += 60
+
+        self.assertEqual(interface.sweep(), 0, "swept at most every SWEEP_INTERVAL seconds")
+        sweep_clock.now += SWEEP_INTERVAL
+        self.assertEqual(interface.sweep(), 1)
+
+    def test_session_interface_from_env(self):
+        with tempfile.TemporaryDirectory() as directory:
+            interface = session_interface_from_env({"SESSION_TTL": "60"}, directory)
+            self.assertIsInstance(interface.store, SqliteSessionStore)
+            self.assertEqual(interface.store.path, os.path.join(directory, "sessions.sqlite3"))
+            self.assertEqual(interface.store.ttl, 60)
+        self.assertIsInstance(session_interface_from_env({"SESSION_STORE": "memory"}, directory).store,
+                              MemorySessionStore)
+        with self.assertRaises(ValueError):
+            session_interface_from_env({"SESSION_STORE": "redis"}, directory)
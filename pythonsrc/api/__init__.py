@@ -1,5 +1,8 @@
 from flask import Blueprint
 
+from util.instrumentation import init_blueprint
+
 api = Blueprint('api', __name__)
+init_blueprint(api)
 
-from . import healthcheck, main, swagger
+from . import healthcheck, jobs, main, metrics, swagger
@@ -0,0 +1,42 @@
+from flask import g
+
+from api import api
+from util.access_util import login_required
+from util.api_util import forbidden, not_found
+from util.job_util import job_queue
+from util.json_util import jsonify
+
+
+@api.route('/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """
+    ---
+    get:
+        description: Get the progress and outcome of a background job.
+
+        parameters:
+            - name: job_id
+              description: Job ID, as returned when the job was queued.
+              in: path
+              required: true
+              type: integer
+
+        responses:
+            200:
+                description: The job. "status" is one of queued, running, succeeded or failed, "progress" is a
+                    percentage and "message" describes the current step, or why the job failed.
+            403:
+                description: The job is for a project of another user.
+            404:
+                description: No such job.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return not_found()
+    # Every job is for a project, only its owner may see it
+    owner_user_id = db.session.query(Project.owner_user_id)\
+        .filter(Project.id == job['args'].get('project_id')).scalar()
+    if owner_user_id != g.current_user.id:
+        return forbidden()
+    return jsonify(job)
@@ -1,20 +1,44 @@
-from flask import g
+from flask import g, url_for
 from datetime import datetime
 
 from util.api_util import not_found
 from util.json_util import jsonify
 from api import api
-from util.api_util import Location, bad_request
-from marshmallow import missing
+from util.api_util import Location, bad_request, keyset_page_keys, stream_all
+from marshmallow import ValidationError, missing, validate
 from webargs import fields
 from webargs.flaskparser import use_kwargs
 from util.access_util import login_required, project_owner_required
+from services import branch_service, clone_service, decision_service, metrics_service
+from util.job_util import job_queue
+from util.instrumentation import timed_serialization
+from util.tree_history import cdh_tree_history
+from util.tree_util import Tree
+from util.response_cache import branches_cache, invalidate_cdh, invalidate_project
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_DECISION_UPDATES = 1000
+
+# Decision fields a planner can update, shared by the single and bulk decision updates
+DECISION_ARGS = {
+    'assigned_starting_bay_id': fields.Int(allow_none=True),
+    'comment': fields.Str(),
+    'is_active_choice': fields.Boolean(),
+}
 
 
 @api.route('/main', methods=['GET'])
 @login_required
-@use_kwargs({'section_id':fields.Int(), 'owner_user_id': fields.Int()}, locations=Location.query)
-def get_projects(section_id, owner_user_id):
+@use_kwargs({
+        'section_id': fields.Int(),
+        'owner_user_id': fields.Int(),
+        'stream': fields.Bool(missing=False),
+        'limit': fields.Int(validate=validate.Range(min=1)),
+        'after': fields.Int(),
+    },
+    locations=Location.query)
+def get_projects(section_id, owner_user_id, stream, limit, after):
     """
     ---
     get:
@@ -29,13 +53,31 @@ def get_projects(section_id, owner_user_id):
               description: ID of the user you want the results filtered by.
               in: query
               type: integer
+            - name: stream
+              description: Stream the list in chunks, keeps server memory flat for large result sets.
+              in: query
+              type: boolean
+            - name: limit
+              description: Return at most this many projects (capped at 500). The response then has an X-Next-Cursor
+                  header when more projects follow.
+              in: query
+              type: integer
+            - name: after
+              description: Cursor, return the projects following the one with this ID. Use the X-Next-Cursor value of
+                  the previous page.
+              in: query
+              type: integer
 
         responses:
             200:
-                description: List of projects.
+                description: List of projects, ordered by ID.
                 schema:
                     type: array
                     items: ProjectSchema
+                headers:
+                    X-Next-Cursor:
+                        description: Value of "after" for the next page, absent on the last page.
+                        type: integer
 
     """
 
@@ -54,7 +96,24 @@ def get_projects(section_id, owner_user_id):
 
     query = query.order_by(Project.id, Task.workflow_order)
 
-    return get_all(query, ProjectSchema, exclude = ['decisions', 'section'])
+    next_cursor = None
+    if limit != missing or after != missing:
+        # Page on the project IDs so that each project's task_state collection is always complete
+        limit = min(MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE if limit == missing else limit)
+        project_ids = keyset_page_keys(query, Project.id, limit + 1, None if after == missing else after)
+        if len(project_ids) > limit:
+            project_ids = project_ids[:limit]
+            next_cursor = project_ids[-1]
+        query = query.filter(Project.id.in_(project_ids))
+
+    if stream:
+        resp = stream_all(query, ProjectSchema, key_column=Project.id, exclude=['decisions', 'section'])
+    else:
+        resp = get_all(query, ProjectSchema, exclude = ['decisions', 'section'])
+
+    if next_cursor is not None:
+        resp.headers['X-Next-Cursor'] = str(next_cursor)
+    return resp
 
 
 @api.route('/projects/<int:project_id>', methods=['GET'])
@@ -95,8 +154,9 @@ def get_project(project_id):
 @api.route('/projects/<int:project_id>/task_complete', methods=['POST'])
 @login_required
 @project_owner_required
-@use_kwargs({'task_name': fields.Str(required=True)}, locations=Location.json)
-def set_task_complete(task_name, project_id):
+@use_kwargs({'task_name': fields.Str(required=True), 'background': fields.Bool(missing=False)},
+            locations=Location.json)
+def set_task_complete(task_name, background, project_id):
     """
     ---
     post:
@@ -112,10 +172,17 @@ def set_task_complete(task_name, project_id):
               description: Name of the task that is complete
               in: body
               type: string
+            - name: background
+              description: Complete build_branches in a background job instead of within the request
+              in: body
+              type: boolean
 
         responses:
             200:
                 description: Task has been set as complete
+            202:
+                description: A background job completing the task has been queued. Its ID is returned as "job_id",
+                    poll /api/jobs/<job_id> for its progress.
             400:
                 description: Task could not be set as complete
     """
@@ -123,39 +190,20 @@ def set_task_complete(task_name, project_id):
 
     # TODO: When we have other tasks this will need updating to check that they can build_branches based on the project state
     if task_name == 'build_branches':
-        project.delete_branch_skus()
-
-        cdh_item_branches = db.session.query(CdhItemMember).filter(CdhItemMember.project_id == project.id)
-        for cdh_item_branch in cdh_item_branches:
-            if cdh_item_branch.cdh_item_id:
-                project.map_skus_to_branches(cdh_item_branch.cdh_item_id, cdh_item_branch.branch_id)
-
-            if cdh_item_branch.cdh_item_sku_id:
-                cdh_item_sku = db.session.query(CdhItemSku).filter(
-                    CdhItemSku.id == cdh_item_branch.cdh_item_sku_id).first()
-
-                db.session.add(BranchSku(
-                    branch_id=cdh_item_branch.branch_id,
-                    cdh_id=project.cdh_id,
-                    sku_id=cdh_item_sku.sku_id
-                ))
-
-        db.session.flush()
-
-        if project.has_mapped_all_cdh_items():
-            db.session.commit()
-            project.viewstate_for_cann_boundary_builder = project.viewstate_for_branch_builder
-            project.copy_branches_to_cann_boundaries()
-            project.assign_recommended_branch_quality_framework_classification_and_sales()
+        if background:
+            job_id = job_queue.enqueue('build_branches', dedupe=True, project_id=project_id)
+            resp = jsonify({'job_id': job_id})
+            resp.status_code = 202
+            resp.headers['Location'] = url_for('api.get_job', job_id=job_id)
 
-            project.complete_task('build_branches')
+            return resp
 
-            db.session.commit()
+        error = branch_service.complete_build_branches(project_id)
+        if error is None:
             return '', 200
         else:
-            db.session.rollback()
             message = {
-                'message': 'Some CDH Items have not been mapped to a branch'
+                'message': error
             }
             resp = jsonify(message)
             resp.status_code = 400
@@ -170,6 +218,7 @@ def set_task_complete(task_name, project_id):
             project.complete_task(task_name)
 
             db.session.commit()
+            invalidate_cdh(project.cdh_id)
             return '', 200
         else:
             message = {
@@ -216,6 +265,7 @@ def update_project(project_id, current_task_id):
     current_task = Task.query.get(current_task_id)
 
     project_service.set_current_task_and_delete_workflow_data(project, current_task)
+    invalidate_cdh(project.cdh_id)
 
     return get_project(project_id)
 
@@ -259,31 +309,51 @@ def get_branches(cluster, num_bands, project_id, branch_id=None):
                     properties:
                         branch_id:
                             $ref: BranchSchema
+                headers:
+                    ETag:
+                        description: Send it back in If-None-Match to get a 304 if the branches haven't changed.
+                        type: string
+            304:
+                description: The branches haven't changed since the ETag sent in If-None-Match.
     """
 
+    cache_key = branches_cache.key(project_id, cluster, num_bands, branch_id)
+    resp = branches_cache.get(cache_key)
+    if resp is not None:
+        return resp
+
+    # Read the banding and metrics from their materialised tables when fresh, otherwise compute them live
+    sku_with_bands_alias = metrics_alias = None
+    if metrics_service.branch_metrics.enabled():
+        aliases = metrics_service.branch_metrics.aliases(project_id, cluster, num_bands)
+        if aliases is not None:
+            sku_with_bands_alias, metrics_alias = aliases
+    sku_with_bands = sku_with_bands_alias or SkuWithBands
+    branch_sku_metrics = metrics_alias or BranchSkuMetricsWithBands
+
     assigned_space_break_alias = db.aliased(SpaceBreak)
     recommended_space_break_alias = db.aliased(SpaceBreak)
 
     query = (
         db.session.query(Branch)
             .join(BranchSku)
-            .join(SkuWithBands,
-                  SkuWithBands.id == BranchSku.sku_id)
+            .join(sku_with_bands,
+                  sku_with_bands.id == BranchSku.sku_id)
             .join(Project,
                   Project.id == project_id)
             .join(Cluster,
                   Cluster.clustering_id == Project.clustering_id)
             .outerjoin(QualityFrameworkClassification, QualityFrameworkClassification.id == Branch.strategic_quality_framework_id)
             .outerjoin(SubBrand,
-                       SubBrand.id == SkuWithBands.sub_brand_id)
+                       SubBrand.id == sku_with_bands.sub_brand_id)
             .outerjoin(PlanogramSummary,
                        db.and_(
-                           PlanogramSummary.sku_id == SkuWithBands.id,
+                           PlanogramSummary.sku_id == sku_with_bands.id,
                            PlanogramSummary.cluster_id == Cluster.id))
-            .outerjoin(BranchSkuMetricsWithBands,
+            .outerjoin(branch_sku_metrics,
                        db.and_(
-                           BranchSku.id == BranchSkuMetricsWithBands.branch_sku_id,
-                           BranchSkuMetricsWithBands.cluster_id == Cluster.id))
+                           BranchSku.id == branch_sku_metrics.branch_sku_id,
+                           branch_sku_metrics.cluster_id == Cluster.id))
             .outerjoin(ProjectSkuDecision,
                        db.and_(
                            BranchSku.id == ProjectSkuDecision.branch_sku_id,
@@ -294,12 +364,15 @@ def get_branches(cluster, num_bands, project_id, branch_id=None):
             .outerjoin(recommended_space_break_alias,
                        ProjectSkuDecision.recommended_starting_bay_id == recommended_space_break_alias.id)
             .options(db.contains_eager(Branch.strategic_quality_framework))
-            .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.sku_with_bands))
-            .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.sku_with_bands)
+            .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.sku_with_bands,
+                                                                   alias=sku_with_bands_alias))
+            .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.sku_with_bands,
+                                                                   alias=sku_with_bands_alias)
                      .contains_eager(SkuWithBands.sub_brand))
-            .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.sku_with_bands)
+            .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.sku_with_bands,
+                                                                   alias=sku_with_bands_alias)
                      .contains_eager(SkuWithBands.planogram).load_only('store_count', 'space_breaks'))
-            .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.metrics))
+            .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.metrics, alias=metrics_alias))
             .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.decisions))
             .options(db.contains_eager(Branch.skus).contains_eager(BranchSku.decisions)
                      .contains_eager(ProjectSkuDecision.recommended_starting_bay,
@@ -318,18 +391,13 @@ def get_branches(cluster, num_bands, project_id, branch_id=None):
 
     results = query.all()
 
-    return jsonify(convert_result_set_to_dict_with_custom_key(results, 'id'))
+    return branches_cache.store(cache_key, jsonify(convert_result_set_to_dict_with_custom_key(results, 'id')))
 
 
 @api.route('/projects/<int:project_id>/decisions/<int:decision_id>', methods=['PATCH'])
 @login_required
 @project_owner_required
-@use_kwargs({
-    'assigned_starting_bay_id': fields.Int(allow_none=True),
-    'comment': fields.Str(),
-    'is_active_choice': fields.Boolean(),
-    },
-    locations=Location.json)
+@use_kwargs(DECISION_ARGS, locations=Location.json)
 def update_decision(assigned_starting_bay_id, comment, is_active_choice, project_id, decision_id):
     """
     ---
@@ -381,10 +449,67 @@ def update_decision(assigned_starting_bay_id, comment, is_active_choice, project
     if is_active_choice != missing:
         decision.is_active_choice = is_active_choice
     db.session.commit()
+    invalidate_project(project_id)
     return get_one(db.session.query(ProjectSkuDecision).filter(ProjectSkuDecision.id == decision_id),
                    ProjectSkuDecisionSchema, exclude=['assigned_starting_bay', 'recommended_starting_bay'])
 
 
+def validate_unique_ids(items):
+    ids = [item['id'] for item in items]
+    if len(set(ids)) != len(ids):
+        raise ValidationError('Each ID can only be given once.')
+
+
+@api.route('/projects/<int:project_id>/decisions', methods=['PATCH'])
+@login_required
+@project_owner_required
+@use_kwargs({
+    'decisions': fields.Nested(dict(DECISION_ARGS, id=fields.Int(required=True)), many=True, required=True,
+                               validate=[validate.Length(min=1, max=MAX_DECISION_UPDATES), validate_unique_ids]),
+    },
+    locations=Location.json)
+def update_decisions(decisions, project_id):
+    """
+    ---
+    patch:
+        description: Record the ranging decisions (i.e. starting bays) and comments of many SKUs at once, e.g. when
+            reassigning the starting bays of a whole branch. All the decisions are updated or, if any of them isn't
+            the project's, none is.
+
+        parameters:
+            - name: project_id
+              description: Project ID.
+              in: path
+              required: true
+              type: integer
+            - name: decisions
+              description: Up to 1000 decision updates, each with the decision id and any of assigned_starting_bay_id,
+                  comment and is_active_choice as for a single decision. Fields left out are unchanged.
+              in: body
+              required: true
+              type: array
+
+        responses:
+            200:
+                description: Updated ProjectSkuDecisions, by ID
+                schema:
+                    type: array
+                    items: ProjectSkuDecisionSchema
+            404:
+                description: Some of the decisions don't exist or aren't the project's.
+    """
+    try:
+        decision_ids = decision_service.bulk_update_decisions(project_id, decisions)
+    except decision_service.UnknownDecisionsError as e:
+        resp = jsonify({'message': e.args[0], 'decision_ids': e.decision_ids})
+        resp.status_code = 404
+        return resp
+    return get_all(db.session.query(ProjectSkuDecision)
+                   .filter(ProjectSkuDecision.id.in_(decision_ids))
+                   .order_by(ProjectSkuDecision.id),
+                   ProjectSkuDecisionSchema, exclude=['assigned_starting_bay', 'recommended_starting_bay'])
+
+
 @api.route('/projects', methods=['POST'])
 @login_required
 @use_kwargs({
@@ -450,7 +575,11 @@ def add_project(name, section_id, clustering_dataset_id, metric_calculation_date
     'name': fields.Str(required=True),
     },
     locations=Location.json)
-def clone_project(name, project_id):
+@use_kwargs({
+    'idempotency_key': fields.Str(load_from='Idempotency-Key', validate=validate.Length(min=1, max=255)),
+    },
+    locations=Location.headers)
+def clone_project(name, idempotency_key, project_id):
     """
     ---
     post:
@@ -466,25 +595,45 @@ def clone_project(name, project_id):
               description: Name of new project.
               in: body
               type: string
+            - name: Idempotency-Key
+              description: Unique key of the request, e.g. a UUID. Retrying with the same key returns the project
+                  cloned by the first request instead of creating another clone.
+              in: header
+              type: string
 
         responses:
             200:
                 description: Created project
                 schema: ProjectSchema
+            404:
+                description: No such project.
 
     """
-    project = services.project_service.clone_project(project_id, g.current_user.id, name)
-    return get_one(db.session.query(Project).filter(Project.id == project.id), ProjectSchema,
+    try:
+        clone_id = clone_service.clone_project(project_id, g.current_user.id, name,
+                                               None if idempotency_key == missing else idempotency_key)
+    except clone_service.IdempotencyKeyReusedError as e:
+        return bad_request(e.args[0])
+    if clone_id is None:
+        return not_found()
+    return get_one(db.session.query(Project).filter(Project.id == clone_id), ProjectSchema,
                    exclude = ['cdh', 'decisions', 'owner_user'])
 
 
 @api.route('/projects/<int:project_id>/cdh_tree', methods=['GET'])
 @login_required
-def get_cdh_tree(project_id):
+@use_kwargs({
+        'root': fields.Str(),
+        'depth': fields.Int(validate=validate.Range(min=0)),
+        'since': fields.Str(),
+    },
+    locations=Location.query)
+def get_cdh_tree(project_id, root, depth, since):
     """
     ---
     get:
-        description: Return a list of items, each item a root CDH node with child nodes down to Sku level.
+        description: Return the revision of the tree and its root CDH nodes in "items", each with child nodes down
+            to Sku level.
 
         parameters:
             - name: project_id
@@ -492,18 +641,103 @@ def get_cdh_tree(project_id):
               in: path
               required: true
               type: integer
+            - name: root
+              description: Return only the subtree of this node, given as <node type>:<node ID>.
+              in: query
+              type: string
+            - name: depth
+              description: Return this many levels of child nodes only, 0 for the top nodes alone.
+              in: query
+              type: integer
+            - name: since
+              description: Revision of the tree the client has, from the revision of a previous response. Only the
+                  nodes added, changed (in "changed", without children) or removed (in "removed", as node type and ID)
+                  since are returned, unless that revision is no longer known, then the full tree is. Can't be
+                  combined with root and depth.
+              in: query
+              type: string
 
         responses:
             200:
-                description: List of CDH nodes.
+                description: List of CDH nodes in "items", or changes in "changed" and "removed", with the revision of
+                    the tree in "revision".
                 schema:
-                    type: array
-                    items: CdhTreeSchema
+                    type: object
+                    required:
+                        - revision
+                    properties:
+                        revision:
+                            type: string
+                        items:
+                            description: The tree, only without since or when that revision is no longer known.
+                            type: array
+                            items:
+                                $ref: CdhTreeSchema
+                        changed:
+                            description: Nodes added or changed since the revision given as since, without
+                                children.
+                            type: array
+                            items:
+                                $ref: CdhTreeSchema
+                        removed:
+                            description: Nodes removed since the revision given as since.
+                            type: array
+                            items:
+                                type: object
+                                properties:
+                                    node_type:
+                                        type: string
+                                    node_id:
+                                        type: integer
+            400:
+                description: Invalid root node, or since combined with root or depth.
+            404:
+                description: No such root node in the project's CDH.
     """
-
-    nodes = CdhTree.query.params(project_id=project_id).all()
-
-    top_level_nodes = [node for node in nodes if node.parent_node_type is None]
-    dump = CdhTreeSchema().dump(top_level_nodes, many=True)
-    json = jsonify({ 'items': dump.data } )
-    return json
+    root_key = None
+    if root != missing:
+        node_type, _, node_id = root.partition(':')
+        try:
+            root_key = (node_type, int(node_id))
+        except ValueError:
+            return bad_request('root must be given as <node type>:<node ID>')
+
+    if since != missing and (root_key is not None or depth != missing):
+        return bad_request('since can\'t be combined with root or depth')
+
+    if since != missing and cdh_tree_history.is_current(project_id, since):
+        return jsonify({'revision': since, 'changed': [], 'removed': []})
+
+    stale_counter = cdh_tree_history.stale_counter(project_id)  # Before reading, see TreeHistory
+    # All nodes in one query, serialized flat (no lazy loads of children) then linked to their parents in one pass.
+    # Children keep the order of the query, ordered so that it is the same on every request.
+    nodes = CdhTree.query.params(project_id=project_id).order_by(CdhTree.node_type, CdhTree.node_id).all()
+    with timed_serialization():
+        items = CdhTreeSchema(exclude=['children']).dump(nodes, many=True).data
+    keys = [(node.node_type, node.node_id) for node in nodes]
+    for item, node in zip(items, nodes):
+        item['parent_node_type'] = node.parent_node_type
+        item['parent_node_id'] = node.parent_node_id
+    revision = cdh_tree_history.record(project_id, items, keys, stale_counter)
+
+    touched = None if since == missing else cdh_tree_history.touched_since(project_id, since)
+    if touched is not None:
+        changed = [item for item, key in zip(items, keys) if key in touched]
+        removed = touched.difference(keys)
+        return jsonify({
+            'revision': revision,
+            'changed': changed,
+            'removed': [{'node_type': node_type, 'node_id': node_id} for node_type, node_id in sorted(removed)],
+        })
+
+    tree = Tree(items, keys, [None if node.parent_node_type is None else (node.parent_node_type, node.parent_node_id)
+                              for node in nodes])
+    tree_items = tree.roots
+    if root_key is not None:
+        root_item = tree.get(root_key)
+        if root_item is None:
+            return not_found()
+        tree_items = [root_item]
+    if depth != missing:
+        tree_items = tree.truncate(tree_items, depth)
+    return jsonify({'revision': revision, 'items': tree_items})
@@ -0,0 +1,79 @@
+from flask import Response
+
+from api import api
+from util.access_util import get_user_cache_stats
+from util.instrumentation import endpoint_metrics
+from util.response_cache import branches_cache
+from util.tree_history import cdh_tree_history
+
+PREFIX = 'rpt_'
+
+# Endpoint totals: (metric, type, help, field of EndpointMetrics)
+ENDPOINT_METRICS = [
+    ('http_requests_total', 'counter', 'API requests handled.', 'requests'),
+    ('http_request_seconds_total', 'counter', 'Time spent handling API requests.', 'request_seconds'),
+    ('sql_statements_total', 'counter', 'SQL statements executed by API requests.', 'statements'),
+    ('sql_seconds_total', 'counter', 'Time spent executing SQL statements in API requests.', 'db_seconds'),
+    ('sql_rows_fetched_total', 'counter', 'Rows returned by SQL statements in API requests.', 'rows_fetched'),
+    ('serialization_seconds_total', 'counter',
+     'Time spent serializing responses (schema dumps and JSON encoding) in API requests.', 'serialization_seconds'),
+]
+
+# Cache stats: (metric, type, help, key of the stats dicts)
+CACHE_METRICS = [
+    ('cache_hits_total', 'counter', 'Cache hits.', 'hits'),
+    ('cache_misses_total', 'counter', 'Cache misses.', 'misses'),
+    ('cache_loads_total', 'counter', 'Values loaded from their source after a cache miss, e.g. the database lookups '
+                                     'of the users cache.', 'loads'),
+    ('cache_size', 'gauge', 'Entries in the cache.', 'size'),
+]
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(name, _label_value(value)) for name, value in sorted(labels.items())) + '}'
+
+
+def format_metrics(endpoint_totals, cache_stats):
+    """
+    :param endpoint_totals: EndpointMetrics.snapshot()
+    :param cache_stats: dict of cache name to stats dict
+    :return: the metrics in the Prometheus text exposition format
+    """
+    lines = []
+    for name, metric_type, help_text, field in ENDPOINT_METRICS:
+        lines += ['# HELP {}{} {}'.format(PREFIX, name, help_text), '# TYPE {}{} {}'.format(PREFIX, name, metric_type)]
+        for (endpoint, method, status), totals in sorted(endpoint_totals.items()):
+            lines.append('{}{}{} {}'.format(PREFIX, name, _labels(endpoint=endpoint, method=method, status=status),
+                                            totals[field]))
+    for name, metric_type, help_text, key in CACHE_METRICS:
+        lines += ['# HELP {}{} {}'.format(PREFIX, name, help_text), '# TYPE {}{} {}'.format(PREFIX, name, metric_type)]
+        for cache, stats in sorted(cache_stats.items()):
+            if key not in stats:
+                continue
+            lines.append('{}{}{} {}'.format(PREFIX, name, _labels(cache=cache), stats[key]))
+    return '\n'.join(lines) + '\n'
+
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    ---
+    get:
+        description: Return the request, SQL, serialization and cache metrics of this app process, in the Prometheus
+            text format. Counters are totals since the process started, per endpoint, method and status.
+
+        responses:
+            200:
+                description: Metrics in the Prometheus text format.
+    """
+    cache_stats = {
+        'branches': branches_cache.stats(),
+        'cdh_tree_history': cdh_tree_history.stats(),
+        'users': get_user_cache_stats(),
+    }
+    return Response(format_metrics(endpoint_metrics.snapshot(), cache_stats),
+                    mimetype='text/plain; version=0.0.4')
@@ -1,6 +1,106 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from os.path import abspath, dirname, isfile, join, relpath
+
 from api import api
-from app import app
-from flask import json, Response
+from app import app, get_version, register_api_doc_paths, wire_app
+from flask import Response, request
+from util.json_util import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_SPEC_PATH = 'swagger.json'
+SOURCE_HASH_KEY = 'x-source-hash'
+SOURCE_DIR = dirname(dirname(abspath(__file__)))
+
+
+class EncodedSpec:
+    """
+    The Swagger spec as JSON bytes, with its gzip and (if the brotli package is installed) brotli encodings.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.encodings = {'gzip': gzip.compress(body, 9)}
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(body)
+
+
+_encoded_spec = None
+_encoded_spec_lock = threading.Lock()
+
+
+def build_spec_json():
+    """
+    :return: the app's Swagger spec as JSON text
+    """
+    # With LAZY_INIT the API may not be registered yet, e.g. in build_swagger_spec.py, and the spec would have no paths
+    wire_app()
+    register_api_doc_paths()
+    return dumps(app.api_doc.to_dict())
+
+
+def source_hash():
+    """
+    :return: digest of the app's Python sources, from which the spec is generated
+    """
+    digest = hashlib.sha1()
+    for directory, directory_names, file_names in os.walk(SOURCE_DIR):
+        directory_names[:] = sorted(name for name in directory_names if name != '__pycache__')
+        for file_name in sorted(name for name in file_names if name.endswith('.py')):
+            path = join(directory, file_name)
+            digest.update(relpath(path, SOURCE_DIR).encode('utf-8'))
+            with open(path, 'rb') as source_file:
+                digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def build_spec_artifact():
+    """
+    :return: the spec as JSON text, with the hash of the sources it was built from in its info, for
+    build_swagger_spec.py
+    """
+    spec = json.loads(build_spec_json())
+    spec.setdefault('info', {})[SOURCE_HASH_KEY] = source_hash()
+    return dumps(spec)
+
+
+def _load_spec_artifact():
+    """
+    Load the spec written at build time by build_swagger_spec.py, if there is one for this version of the app built
+    from the same sources. Without version.json every build has the same version, the source hash still tells a stale
+    artifact apart.
+    :return: the spec as JSON bytes, None if there is no up to date artifact
+    """
+    spec_path = app.config.get('SWAGGER_SPEC_PATH', DEFAULT_SPEC_PATH)
+    if not isfile(spec_path):
+        return None
+    with open(spec_path, 'rb') as spec_file:
+        body = spec_file.read()
+    info = json.loads(body.decode('utf-8')).get('info', {})
+    if info.get('version') != get_version() or info.get(SOURCE_HASH_KEY) != source_hash():
+        return None
+    return body
+
+
+def get_encoded_spec():
+    """
+    The spec is built once per process, on first use, unless a build time artifact is available.
+    """
+    global _encoded_spec
+    if _encoded_spec is None:
+        with _encoded_spec_lock:
+            if _encoded_spec is None:
+                body = _load_spec_artifact() or build_spec_json().encode('utf-8')
+                _encoded_spec = EncodedSpec(body)
+    return _encoded_spec
 
 
 @api.route('/swagger', methods=['GET'])
@@ -13,6 +113,19 @@ def get_swagger():
         responses:
             200:
                 description: Swagger spec. in JSON form
+            304:
+                description: The spec hasn't changed since the ETag sent in If-None-Match.
     """
-    spec_dict = app.api_doc.to_dict()
-    return Response(json.dumps(spec_dict), status=200, mimetype='application/json')
+    spec = get_encoded_spec()
+    content_encoding = next((encoding for encoding in ('br', 'gzip')
+                             if encoding in spec.encodings and encoding in request.accept_encodings), None)
+
+    resp = Response(spec.encodings[content_encoding] if content_encoding else spec.body, status=200,
+                    mimetype='application/json')
+    resp.vary.add('Accept-Encoding')
+    if content_encoding:
+        resp.headers['Content-Encoding'] = content_encoding
+        resp.set_etag('{}-{}'.format(spec.etag, content_encoding))
+    else:
+        resp.set_etag(spec.etag)
+    return resp.make_conditional(request)
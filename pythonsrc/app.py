@@ -1,5 +1,6 @@
 import sys
 import json
+import threading
 from os.path import isfile
 import sqlalchemy
 import warnings
@@ -8,7 +9,6 @@ import warnings
 if 'tests' in sys.path[0]:
     del sys.path[0]
 
-import apispec
 import os
 from flask import Flask
 from util.json_util import AppJSONEncoder
@@ -19,28 +19,95 @@ app.config.from_pyfile('secrets.config', silent=True)
 app.config.from_pyfile(os.path.join(os.getcwd(), 'config', os.getenv('APPLICATION_ENV', 'development').lower() + '.config'))
 
 
-# Create an API doc store for Swagger
-version_file_path = 'version.json'
-if isfile(version_file_path):
-    version_details = json.loads(open(version_file_path).read())
-    version = 'Build: {0}, Commit: {1}'.format(version_details['build_no'], version_details['commit'])
+_version = None
+
+
+def get_version():
+    """
+    :return: build number and commit of the app, as found in version.json
+    """
+    global _version
+    if _version is None:
+        version_file_path = 'version.json'
+        if isfile(version_file_path):
+            version_details = json.loads(open(version_file_path).read())
+            _version = 'Build: {0}, Commit: {1}'.format(version_details['build_no'], version_details['commit'])
+        else:
+            _version = 'No {} file found.'.format(version_file_path)
+    return _version
+
+
+# API doc store for Swagger, see register_api_doc_paths
+app.api_doc = None
+
+
+def register_api_doc_paths():
+    """
+    Create the API doc store and add every view to it, parsing the YAML in its docstring.
+    Deferred until the spec is first needed (see api.swagger) because apispec and parsing the docstrings slow down
+    start-up.
+    """
+    if app.api_doc is not None:
+        return
+    import apispec
+    api_doc = apispec.APISpec(
+        title='Range Planning Tool',
+        version=get_version(),
+        description='Sainsburys range planner project.',
+        plugins=[
+            'apispec.ext.flask',
+            'apispec.ext.marshmallow',
+        ],
+    )
+    for view_name in app.view_functions.keys():
+        if not view_name.startswith('_') and view_name not in ['static']:
+            view_fn = app.view_functions[view_name]
+            api_doc.add_path(view=view_fn)
+    app.api_doc = api_doc
+
+
+_wired = False
+_wiring_lock = threading.Lock()
+
+
+def wire_app():
+    """
+    Import and register the API blueprint and set up the app's extensions.
+    """
+    global _wired
+    with _wiring_lock:
+        if _wired:
+            return
+
+        from api import api as api_blueprint
+        app.register_blueprint(api_blueprint, url_prefix='/api')
+
+        from util.job_util import job_queue
+        from util.response_cache import branches_cache
+        from util.tree_history import cdh_tree_history
+        job_queue.init_app(app)
+        branches_cache.init_app(app)
+        cdh_tree_history.init_app(app)
+        _wired = True
+
+
+class LazyWiringMiddleware:
+    """
+    WSGI middleware wiring the app up on its first request, then getting out of the way.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        wire_app()
+        app.wsgi_app = self.wsgi_app
+        return self.wsgi_app(environ, start_response)
+
+
+# With LAZY_INIT (app setting, or environment variable set to 1) workers boot without importing the API, which then
+# happens on the first request. Use python -m util.import_profiler to see where start-up time goes.
+if app.config.get('LAZY_INIT', os.getenv('LAZY_INIT') == '1'):
+    app.wsgi_app = LazyWiringMiddleware(app.wsgi_app)
 else:
-    version = 'No {} file found.'.format(version_file_path)
-
-app.api_doc = apispec.APISpec(
-    title='Range Planning Tool',
-    version=version,
-    description='Sainsburys range planner project.',
-    plugins=[
-        'apispec.ext.flask',
-        'apispec.ext.marshmallow',
-    ],
-)
-
-from api import api as api_blueprint
-app.register_blueprint(api_blueprint, url_prefix='/api')
-
-for view_name in app.view_functions.keys():
-    if not view_name.startswith('_') and view_name not in ['static']:
-        view_fn = app.view_functions[view_name]
-        app.api_doc.add_path(view=view_fn)
+    wire_app()
@@ -0,0 +1,21 @@
+"""
+Write the app's Swagger spec to a file at build time, e.g. python build_swagger_spec.py swagger.json after version.json
+has been written. The app serves the file instead of building the spec when the versions and the hashes of the sources
+match, see api.swagger.
+"""
+
+import json
+import sys
+
+from app import app, get_version
+from api.swagger import DEFAULT_SPEC_PATH, build_spec_artifact
+
+if __name__ == '__main__':
+    spec_path = sys.argv[1] if len(sys.argv) > 1 else app.config.get('SWAGGER_SPEC_PATH', DEFAULT_SPEC_PATH)
+    with app.app_context():
+        spec_json = build_spec_artifact()
+    if not json.loads(spec_json).get('paths'):
+        sys.exit('The Swagger spec has no paths, not writing it to {}'.format(spec_path))
+    with open(spec_path, 'w') as spec_file:
+        spec_file.write(spec_json)
+    print('Swagger spec for {} written to {}'.format(get_version(), spec_path))
@@ -16,6 +16,7 @@ from flask import send_from_directory
 from flask import session
 
 import constants
+from util.session_store import DEFAULT_TTL, init_session_store, regenerate_session
 
 load_dotenv(path.join(path.dirname(__file__), "../.env"))
 AUTH0_CALLBACK_URL = env[constants.AUTH0_CALLBACK_URL]
@@ -26,6 +27,12 @@ AUTH0_DOMAIN = env[constants.AUTH0_DOMAIN]
 APP = Flask(__name__, static_url_path='', template_folder='../templates')
 APP.secret_key = constants.SECRET_KEY
 APP.debug = True
+# The sessions hold the Auth0 profile, keep them server side: 'sqlite' (default) at SESSION_STORE_PATH, shared by the
+# worker processes, 'memory' for a single process, 'cookie' for Flask's signed cookie. SESSION_TTL is in seconds.
+APP.config['SESSION_STORE'] = env.get('SESSION_STORE', 'sqlite')
+APP.config['SESSION_STORE_PATH'] = env.get('SESSION_STORE_PATH', path.join(path.dirname(__file__), 'sessions.sqlite3'))
+APP.config['SESSION_TTL'] = int(env.get('SESSION_TTL', DEFAULT_TTL))
+init_session_store(APP)
 
 
 def requires_login(f):
@@ -70,6 +77,7 @@ def callback_handling():
     token = get_token.authorization_code(AUTH0_CLIENT_ID,
                                          AUTH0_CLIENT_SECRET, code, AUTH0_CALLBACK_URL)
     user_info = auth0_users.userinfo(token['access_token'])
+    regenerate_session(session)
     session[constants.PROFILE_KEY] = json.loads(user_info)
     return redirect('/main')
 
@@ -0,0 +1,73 @@
+"""
+Set-based building of a project's branches.
+"""
+
+from util.job_util import JobError, job_queue
+from util.response_cache import invalidate_cdh
+
+
+def build_branch_skus(project):
+    """
+    Create the BranchSku rows of a project from its CDH item members with a single INSERT ... SELECT.
+    A member maps either a whole CDH item, in which case every SKU of the item goes to the member's branch, or a
+    single CDH item SKU. Run project.delete_branch_skus() first, and check project.has_mapped_all_cdh_items()
+    afterwards as before.
+    :param project: Project being built
+    :return: number of BranchSku rows created
+    """
+    mapped_items = db.session.query(CdhItemMember.branch_id,
+                                    db.literal(project.cdh_id).label('cdh_id'),
+                                    CdhItemSku.sku_id)\
+        .join(CdhItemSku, CdhItemSku.cdh_item_id == CdhItemMember.cdh_item_id)\
+        .filter(CdhItemMember.project_id == project.id)
+
+    mapped_skus = db.session.query(CdhItemMember.branch_id,
+                                   db.literal(project.cdh_id).label('cdh_id'),
+                                   CdhItemSku.sku_id)\
+        .join(CdhItemSku, CdhItemSku.id == CdhItemMember.cdh_item_sku_id)\
+        .filter(CdhItemMember.project_id == project.id)
+
+    insert = BranchSku.__table__.insert().from_select(['branch_id', 'cdh_id', 'sku_id'],
+                                                      mapped_items.union_all(mapped_skus).statement)
+    return db.session.execute(insert).rowcount
+
+
+def complete_build_branches(project_id, progress=None):
+    """
+    Build the project's branches from its CDH item members and complete its build_branches task.
+    :param project_id: Project ID
+    :param progress: optional progress(percent, message) callback
+    :return: None on success, otherwise a message explaining why the task could not be completed
+    """
+    progress = progress or (lambda percent, message=None: None)
+    project = Project.query.filter(Project.id == project_id).first()
+
+    progress(0, 'Mapping SKUs to branches')
+    project.delete_branch_skus()
+    build_branch_skus(project)
+    db.session.flush()
+
+    if not project.has_mapped_all_cdh_items():
+        db.session.rollback()
+        return 'Some CDH Items have not been mapped to a branch'
+
+    db.session.commit()
+    progress(30, 'Copying branches to cann boundaries')
+    project.viewstate_for_cann_boundary_builder = project.viewstate_for_branch_builder
+    project.copy_branches_to_cann_boundaries()
+
+    progress(60, 'Assigning recommended quality framework classifications and sales')
+    project.assign_recommended_branch_quality_framework_classification_and_sales()
+
+    project.complete_task('build_branches')
+    db.session.commit()
+    invalidate_cdh(project.cdh_id)  # The BranchSku rows are shared by the projects of the CDH
+    return None
+
+
+@job_queue.job('build_branches')
+def build_branches_job(progress, project_id):
+    message = complete_build_branches(project_id, progress)
+    if message:
+        raise JobError(message)
+    return {'project_id': project_id}
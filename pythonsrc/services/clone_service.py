@@ -0,0 +1,122 @@
+"""
+Set-based cloning of projects.
+"""
+
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from util.clone_util import CloneStep, clone_rows, cloned_id, foreign_key_remap, map_table_name
+
+# Clone requests by idempotency key, so that retried or double-clicked requests return the first clone
+clone_request = db.Table(
+    'clone_request',
+    db.Column('user_id', db.Integer, primary_key=True),
+    db.Column('idempotency_key', db.String(255), primary_key=True),
+    db.Column('source_project_id', db.Integer, nullable=False),
+    db.Column('project_id', db.Integer),
+    db.Column('created_at', db.DateTime, nullable=False),
+)
+
+
+class IdempotencyKeyReusedError(Exception):
+    """
+    Raised when an idempotency key already used to clone a project is sent to clone another one.
+    """
+
+
+def clone_steps():
+    """
+    What a clone copies: the project's CDH with its CDH items and their SKUs, from which the clone's CDH tree is built,
+    the project, its branches and branch SKUs, CDH item memberships, decisions and task states. Reference data
+    (sections, SKUs, clusters, space breaks) is shared with the original.
+    Every foreign key to a copied table is remapped to the copy, e.g. a membership's cdh_item_id, cdh_item_sku_id and
+    branch_id reference the clone's CDH items and branches.
+    """
+    project, cdh, cdh_item, cdh_item_sku, branch, branch_sku, member, decision, task_state = (
+        model.__table__ for model in (Project, Cdh, CdhItem, CdhItemSku, Branch, BranchSku, CdhItemMember,
+                                      ProjectSkuDecision, TaskState))
+
+    def copied_from(table, column):
+        return 't.{} IN (SELECT old_id FROM {})'.format(column, map_table_name(table))
+
+    steps = [
+        (cdh, 't.id IN (SELECT cdh_id FROM {} WHERE id = :project_id)'.format(project.name), {}),
+        (cdh_item, copied_from(cdh, 'cdh_id'), {'cdh_id': cdh}),
+        (cdh_item_sku, copied_from(cdh_item, 'cdh_item_id'), {'cdh_item_id': cdh_item}),
+        (project, 't.id = :project_id', {'cdh_id': cdh}),
+        (branch, copied_from(cdh, 'cdh_id'), {'cdh_id': cdh}),
+        (branch_sku, copied_from(branch, 'branch_id'), {'cdh_id': cdh, 'branch_id': branch}),
+        (member, 't.project_id = :project_id', {'project_id': project, 'branch_id': branch, 'cdh_item_id': cdh_item,
+                                                'cdh_item_sku_id': cdh_item_sku}),
+        (decision, 't.project_id = :project_id', {'project_id': project, 'branch_sku_id': branch_sku}),
+        (task_state, 't.project_id = :project_id', {'project_id': project}),
+    ]
+    copied_tables = set()
+    clone_steps = []
+    for table, where, remap in steps:
+        copied_tables.add(table)
+        # Any other foreign key to a copied table, e.g. a parent CDH item
+        remap = dict(foreign_key_remap(table, copied_tables), **remap)
+        values = {'name': ':name', 'owner_user_id': ':owner_user_id'} if table is project else None
+        clone_steps.append(CloneStep(table, where, remap=remap, values=values))
+    return clone_steps
+
+
+def create_clone_request_table(bind=None):
+    """
+    Migration creating the clone_request table. Safe to run more than once.
+    :param bind: engine or connection, defaults to the app's engine
+    """
+    clone_request.create(bind or db.engine, checkfirst=True)
+
+
+def clone_project(project_id, owner_user_id, name, idempotency_key=None):
+    """
+    Copy a project and everything hanging off it (see clone_steps) in one transaction, with one INSERT ... SELECT per
+    table.
+    :param project_id: ID of the project to clone
+    :param owner_user_id: ID of the user owning the clone
+    :param name: name of the clone
+    :param idempotency_key: optional key identifying the request, e.g. the Idempotency-Key header. A request with a
+    key already used by the user returns the project cloned by the first request instead of cloning again, waiting
+    for the first request to finish if needed.
+    :return: ID of the clone, None if there is no such project
+    :raise IdempotencyKeyReusedError: if the key was used by the user to clone another project
+    """
+    if idempotency_key is not None:
+        # A concurrent request with the same key blocks here until the first one commits (or rolls back)
+        inserted = db.session.execute(
+            pg_insert(clone_request)
+            .values(user_id=owner_user_id, idempotency_key=idempotency_key, source_project_id=project_id,
+                    created_at=datetime.utcnow())
+            .on_conflict_do_nothing()
+            .returning(clone_request.c.idempotency_key)).first()
+        if inserted is None:
+            source_project_id, clone_id = db.session.execute(
+                db.select([clone_request.c.source_project_id, clone_request.c.project_id])
+                .where(db.and_(clone_request.c.user_id == owner_user_id,
+                               clone_request.c.idempotency_key == idempotency_key))).first()
+            db.session.rollback()
+            if source_project_id != project_id:
+                raise IdempotencyKeyReusedError('Idempotency key {} was used to clone project {}'
+                                                .format(idempotency_key, source_project_id))
+            return clone_id
+
+    try:
+        clone_rows(db.session, clone_steps(), {'project_id': project_id, 'owner_user_id': owner_user_id,
+                                               'name': name})
+        clone_id = cloned_id(db.session, Project.__table__, project_id)
+        if clone_id is None:
+            db.session.rollback()
+            return None
+        if idempotency_key is not None:
+            db.session.execute(clone_request.update()
+                               .where(db.and_(clone_request.c.user_id == owner_user_id,
+                                              clone_request.c.idempotency_key == idempotency_key))
+                               .values(project_id=clone_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return clone_id
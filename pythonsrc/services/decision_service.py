@@ -0,0 +1,70 @@
+"""
+Set-based updates of project SKU decisions.
+"""
+
+from marshmallow import missing
+
+from util.response_cache import invalidate_project
+
+# (attribute, SQL type) of the decision fields a planner can update
+UPDATABLE_FIELDS = [
+    ('assigned_starting_bay_id', 'integer'),
+    ('comment', 'text'),
+    ('is_active_choice', 'boolean'),
+]
+
+
+class UnknownDecisionsError(Exception):
+    """
+    Raised when some of the decisions to update don't exist or don't belong to the project.
+    """
+
+    def __init__(self, decision_ids):
+        super().__init__('No such decisions in the project: {}'.format(', '.join(str(id) for id in decision_ids)))
+        self.decision_ids = decision_ids
+
+
+def bulk_update_decisions(project_id, updates):
+    """
+    Apply updates to many decisions of a project with a single UPDATE ... FROM (VALUES ...), committed in one
+    transaction. Each row of the VALUES list has, for each updatable field, a flag telling whether the field is set
+    and its value, so fields missing from an update are left unchanged.
+    :param project_id: Project ID
+    :param updates: list of dicts with the decision id and any of the UPDATABLE_FIELDS, missing fields may be absent
+    or marshmallow.missing
+    :return: IDs of the updated decisions
+    :raise UnknownDecisionsError: if any decision isn't the project's, nothing is updated then
+    """
+    table = ProjectSkuDecision.__table__
+    params = {'project_id': project_id}
+    rows = []
+    for n, update in enumerate(updates):
+        row = ['CAST(:id_{} AS integer)'.format(n)]
+        params['id_{}'.format(n)] = update['id']
+        for field, sql_type in UPDATABLE_FIELDS:
+            value = update.get(field, missing)
+            row.append('CAST(:set_{}_{} AS boolean)'.format(field, n))
+            row.append('CAST(:{}_{} AS {})'.format(field, n, sql_type))
+            params['set_{}_{}'.format(field, n)] = value is not missing
+            params['{}_{}'.format(field, n)] = None if value is missing else value
+        rows.append('(' + ', '.join(row) + ')')
+
+    statement = db.text(
+        'UPDATE {table} AS d SET {assignments} '
+        'FROM (VALUES {rows}) AS v (id, {columns}) '
+        'WHERE d.id = v.id AND d.project_id = :project_id '
+        'RETURNING d.id'.format(
+            table=table.name,
+            assignments=', '.join('{0} = CASE WHEN v.set_{0} THEN v.{0} ELSE d.{0} END'.format(field)
+                                  for field, _ in UPDATABLE_FIELDS),
+            rows=', '.join(rows),
+            columns=', '.join('set_{0}, {0}'.format(field) for field, _ in UPDATABLE_FIELDS)))
+
+    updated_ids = [row[0] for row in db.session.execute(statement, params)]
+    unknown_ids = sorted(set(update['id'] for update in updates).difference(updated_ids))
+    if unknown_ids:
+        db.session.rollback()
+        raise UnknownDecisionsError(unknown_ids)
+    db.session.commit()
+    invalidate_project(project_id)
+    return updated_ids
@@ -0,0 +1,10 @@
+"""
+Materialised banding and metrics read by get_branches.
+"""
+
+from util.materialise_util import Materialisation, MaterialisedModel
+
+branch_metrics = Materialisation('branch_metrics', [
+    MaterialisedModel(SkuWithBands, 'materialised_sku_with_bands'),
+    MaterialisedModel(BranchSkuMetricsWithBands, 'materialised_branch_sku_metrics_with_bands'),
+])
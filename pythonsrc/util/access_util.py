@@ -5,10 +5,86 @@ Authentication and access control logic.
 import sys
 from functools import wraps
 from flask import g, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import get_history
+
+from util.cache_util import TTLCache
 
 
 ATN_HEADER = 'X-Forwarded-Email'
 
+USER_CACHE_TTL = 60  # seconds
+USER_CACHE_MAX_SIZE = 1000
+USER_EMAIL_INDEX_NAME = 'ix_user_lower_email'
+
+# Column values of recently resolved users, keyed by lowercase email
+_user_cache = TTLCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL)
+
+
+def get_user_by_email(user_email):
+    """
+    Resolve a lowercase email address to a User attached to the current session.
+    Recently resolved users are rebuilt from the user cache without touching the database.
+    :param user_email: lowercase email address
+    :return: the User
+    :raises sqlalchemy.orm.exc.NoResultFound: if no user has that email
+    """
+    values = _user_cache.get(user_email)
+    if values is None:
+        _user_cache.record_load()
+        user = db.session.query(User).filter(func.lower(User.email) == user_email).one()
+        mapper = inspect(User)
+        _user_cache.set(user_email, {attr.key: getattr(user, attr.key) for attr in mapper.column_attrs})
+        return user
+
+    user = inspect(User).class_manager.new_instance()
+    for key, value in values.items():
+        setattr(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate_user(user_email):
+    """
+    Drop a user from the user cache, e.g. after the user has been changed outside this process.
+    :param user_email: email address, any case
+    """
+    _user_cache.delete(user_email.lower())
+
+
+def invalidate_user_cache():
+    _user_cache.clear()
+
+
+def get_user_cache_stats():
+    """
+    :return: user cache hits, misses, size and the number of database lookups done to resolve users
+    """
+    stats = _user_cache.stats()
+    stats['db_lookups'] = stats['loads']
+    return stats
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_changed_user(mapper, connection, target):
+    added, unchanged, deleted = get_history(target, 'email')
+    for email in (added or []) + (unchanged or []) + (deleted or []):
+        if email:
+            invalidate_user(email)
+
+
+def create_user_email_index(bind=None):
+    """
+    Optional migration adding a functional index on lower(email), which keeps the user lookups done on cache misses
+    cheap. Safe to run more than once.
+    :param bind: engine or connection, defaults to the app's engine
+    """
+    bind = bind or db.engine
+    table = bind.dialect.identifier_preparer.format_table(User.__table__)
+    bind.execute('CREATE INDEX IF NOT EXISTS {} ON {} (lower(email))'.format(USER_EMAIL_INDEX_NAME, table))
+
 
 def login_required(f):
     """
@@ -23,8 +99,7 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         try:
             user_email = request.headers[ATN_HEADER].lower()
-            user = db.session.query(User).filter(func.lower(User.email) == user_email).one()
-            g.current_user = user
+            g.current_user = get_user_by_email(user_email)
         except:
             # TODO log error
             print('Error checking {} request header: {}'.format(ATN_HEADER, sys.exc_info()[0]))
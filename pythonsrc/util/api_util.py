@@ -1,6 +1,11 @@
+from flask import Response, stream_with_context
 from api import api
-from util.json_util import jsonify
+from util.json_util import COMPACT_SEPARATORS, dumps, jsonify
 from marshmallow import missing
+from sqlalchemy.orm import Session
+
+
+STREAM_CHUNK_SIZE = 500
 
 
 class Location:
@@ -23,6 +28,17 @@ def not_found(error=None):
     return resp
 
 
+@api.errorhandler(403)
+def forbidden(error=None):
+    message = {
+        'message': 'Forbidden'
+    }
+    resp = jsonify(message)
+    resp.status_code = 403
+
+    return resp
+
+
 @api.errorhandler(422)
 def handle_unprocessable_entity(error):
     """
@@ -80,10 +96,91 @@ def update_from_args(obj, args):
 def disable_browser_cache(response):
     """
     Disable caching (needed for IE).
+    Responses with an ETag may still be stored but must be revalidated on every use.
     """
     response.cache_control.max_age = 0
     response.cache_control.must_revalidate = True
     response.cache_control.no_cache = True
-    response.cache_control.no_store = True
+    response.cache_control.no_store = 'ETag' not in response.headers
     return response
 
+
+def keyset_page_keys(query, key_column, limit, after=None):
+    """
+    Return the next page of distinct key values of a query in ascending order, for keyset pagination.
+    Works on queries that join and eager load collections because only the key column is selected.
+    :param query: ORM query, its joins, filters and params are kept but its ordering is replaced
+    :param key_column: column to page on, e.g. Project.id
+    :param limit: maximum number of keys to return
+    :param after: only keys greater than this one are returned (the cursor), None for the first page
+    :return: list of key values
+    """
+    key_select = query.order_by(None).statement.with_only_columns([key_column]).distinct()
+    if after is not None:
+        key_select = key_select.where(key_column > after)
+    key_select = key_select.order_by(key_column).limit(limit)
+    return [row[0] for row in query.session.execute(key_select)]
+
+
+def iter_query_chunks(query, chunk_size=STREAM_CHUNK_SIZE, key_column=None):
+    """
+    Yield the results of a query as lists of at most chunk_size entities.
+    Without a key column the rows are fetched with yield_per. Queries that eager load collections (contains_eager,
+    joinedload) can't use yield_per as a collection may be split between two chunks, so for those pass key_column:
+    each chunk is then loaded by a separate query limited to the next chunk_size keys.
+    """
+    if key_column is None:
+        chunk = []
+        for obj in query.yield_per(chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    after = None
+    while True:
+        keys = keyset_page_keys(query, key_column, chunk_size, after)
+        if not keys:
+            return
+        yield query.filter(key_column.in_(keys)).all()
+        if len(keys) < chunk_size:
+            return
+        after = keys[-1]
+
+
+def stream_all(query, schema_class, key_column=None, chunk_size=None, **schema_kwargs):
+    """
+    Streaming alternative to get_all: the query results are loaded, serialized and sent as a JSON array one chunk
+    at a time, so memory use doesn't grow with the size of the result.
+    :param query: ORM query
+    :param schema_class: marshmallow schema used to serialize each entity
+    :param key_column: see iter_query_chunks, required when the query eager loads collections
+    :param chunk_size: number of entities loaded and serialized at a time, STREAM_CHUNK_SIZE by default
+    :param schema_kwargs: passed to the schema, e.g. exclude
+    :return: chunked JSON response
+    """
+    schema = schema_class(many=True, **schema_kwargs)
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    bind = query.session.get_bind()
+
+    def generate():
+        # Loaded entities are not needed once serialized, they are cleared from the identity map after each chunk. The
+        # query runs in a session of its own for that: clearing the request's session would also detach the objects the
+        # rest of the request uses, e.g. the current user.
+        session = Session(bind=bind)
+        try:
+            separator = '['
+            for chunk in iter_query_chunks(query.with_session(session), chunk_size, key_column):
+                data = schema.dump(chunk).data
+                session.expunge_all()
+                if data:
+                    yield separator + ','.join(dumps(item, separators=COMPACT_SEPARATORS) for item in data)
+                    separator = ','
+            yield '[]' if separator == '[' else ']'
+        finally:
+            session.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
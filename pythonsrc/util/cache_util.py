@@ -0,0 +1,231 @@
+"""
+In-process and on-disk caches.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+
+class TTLCache:
+    """
+    Thread safe LRU cache whose entries also expire a fixed number of seconds after they were stored.
+    Keeps hit/miss counters, and a count of the values the caller loaded from their source (see record_load), so
+    callers can report how effective the cache is.
+    Also keeps generation counters, which are never evicted: bumping a group's generation invalidates the entries
+    stored under the previous one when the group's keys include it.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        """
+        :param max_size: maximum number of entries, the least recently used entry is evicted beyond it
+        :param ttl: seconds an entry stays valid for, None for no expiry
+        :param clock: time source, overridable in tests
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            expires_at = None if self.ttl is None else self._clock() + self.ttl
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate):
+        """
+        Delete every entry for which predicate(key, value) is true.
+        :return: number of deleted entries
+        """
+        with self._lock:
+            keys = [key for key, (value, _) in self._entries.items() if predicate(key, value)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def delete_prefix(self, prefix):
+        """
+        Delete every entry whose (string) key starts with prefix.
+        :return: number of deleted entries
+        """
+        return self.delete_where(lambda key, value: key.startswith(prefix))
+
+    def delete_expired(self):
+        """
+        Delete the expired entries, which are otherwise only dropped when looked up or evicted.
+        :return: number of deleted entries
+        """
+        with self._lock:
+            now = self._clock()
+            keys = [key for key, (_, expires_at) in self._entries.items()
+                    if expires_at is not None and expires_at <= now]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record_load(self):
+        """
+        Count a value loaded from its source after a miss, e.g. a database lookup.
+        """
+        with self._lock:
+            self.loads += 1
+
+    def generation(self, group):
+        """
+        :return: the current generation of a group of entries, 0 until next_generation is first called
+        """
+        with self._lock:
+            return self._generations.get(group, 0)
+
+    def next_generation(self, group):
+        """
+        Atomically increment the generation of a group of entries.
+        :return: the new generation
+        """
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+            return self._generations[group]
+
+    def stats(self):
+        """
+        :return: dict with the hit, miss and load counters, the hit ratio and the current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteCache:
+    """
+    Cache with the same interface as TTLCache but stored in a SQLite file, so that it is shared by all the app's
+    processes on a host. Keys are strings and values are stored as JSON, so a tuple comes back as a list. When full the
+    entries closest to expiry are evicted. The generations are shared, the hit/miss/load counters are per process.
+    """
+
+    def __init__(self, path, max_size, ttl, clock=time.time):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        with self._connect() as conn:
+            conn.execute('create table if not exists cache (key text primary key, value text, expires_at real)')
+            conn.execute('create index if not exists ix_cache_expires_at on cache (expires_at)')
+            conn.execute('create table if not exists generation (grp text primary key, value integer not null)')
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def get(self, key, default=None):
+        with self._connect() as conn:
+            row = conn.execute('select value from cache where key = ? and (expires_at is null or expires_at > ?)',
+                               (key, self._clock())).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        expires_at = None if self.ttl is None else self._clock() + self.ttl
+        with self._connect() as conn:
+            conn.execute('insert or replace into cache (key, value, expires_at) values (?, ?, ?)',
+                         (key, json.dumps(value), expires_at))
+            conn.execute('delete from cache where expires_at <= ?', (self._clock(),))
+            conn.execute('delete from cache where key in (select key from cache order by expires_at desc limit -1 '
+                         'offset ?)', (self.max_size,))
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('delete from cache where key = ?', (key,))
+
+    def delete_prefix(self, prefix):
+        with self._connect() as conn:
+            return conn.execute("delete from cache where substr(key, 1, ?) = ?", (len(prefix), prefix)).rowcount
+
+    def delete_expired(self):
+        with self._connect() as conn:
+            return conn.execute('delete from cache where expires_at <= ?', (self._clock(),)).rowcount
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('delete from cache')
+
+    def record_load(self):
+        with self._lock:
+            self.loads += 1
+
+    def generation(self, group):
+        with self._connect() as conn:
+            row = conn.execute('select value from generation where grp = ?', (group,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def next_generation(self, group):
+        with self._connect() as conn:
+            conn.execute('begin immediate')
+            conn.execute('insert or ignore into generation (grp, value) values (?, 0)', (group,))
+            conn.execute('update generation set value = value + 1 where grp = ?', (group,))
+            value = conn.execute('select value from generation where grp = ?', (group,)).fetchone()[0]
+            conn.execute('commit')
+        return value
+
+    def stats(self):
+        with self._connect() as conn:
+            size = conn.execute('select count(*) from cache').fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': size,
+            }
+
+    def __len__(self):
+        return self.stats()['size']
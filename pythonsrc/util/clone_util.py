@@ -0,0 +1,103 @@
+"""
+Set-based copying of a graph of rows (e.g. a project and everything hanging off it) in PostgreSQL.
+"""
+
+from collections import namedtuple
+
+from sqlalchemy import text
+
+
+class CloneStep(namedtuple('CloneStep', ['table', 'where', 'remap', 'values'])):
+    """
+    Copy of the rows of one table.
+    table: SQLAlchemy Table
+    where: SQL condition selecting the rows to copy, the table being aliased as t, e.g. 't.project_id = :project_id'
+    remap: dict of foreign key column name to the Table it references, that table must have been copied by an earlier
+    step. The copies reference the copied rows instead of the originals.
+    values: dict of column name to SQL expression replacing the column's value, e.g. {'name': ':name'}
+    """
+
+    def __new__(cls, table, where, remap=None, values=None):
+        return super().__new__(cls, table, where, remap or {}, values or {})
+
+
+def foreign_key_remap(table, copied_tables):
+    """
+    :return: remap for a CloneStep of table, every foreign key column of table referencing one of copied_tables (which
+    may include table itself) mapped to the table it references
+    """
+    return {column.name: foreign_key.column.table for column in table.columns
+            for foreign_key in column.foreign_keys if foreign_key.column.table in copied_tables}
+
+
+def map_table_name(table):
+    """
+    :return: name of the temporary table mapping the IDs of the original rows of table to the IDs of their copies
+    """
+    return 'clone_map_' + table.name
+
+
+def clone_rows(session, steps, params):
+    """
+    Run the steps, in order, in the session's transaction. Each step is two statements whatever the number of rows:
+    new IDs are drawn from the table's sequence into a temporary table mapping old to new IDs, then the rows are
+    copied with an INSERT ... SELECT joined to the mapping tables of the referenced tables. Tables without a single id
+    primary key column get no mapping table and can't be referenced. Mapping tables are dropped at commit, or by the
+    next clone in the same transaction (e.g. in the tests, whose commits only release a SAVEPOINT), so read them with
+    cloned_id before cloning again.
+    :param session: SQLAlchemy session, nothing is committed
+    :param steps: list of CloneStep
+    :param params: SQL parameters of the where and values expressions
+    :return: dict of table name to number of rows copied
+    """
+    counts = {}
+    for step in steps:
+        table = step.table
+        has_id = list(table.primary_key.columns.keys()) == ['id']
+        columns = [column.name for column in table.columns]
+        select_columns = []
+        joins = []
+        for column in columns:
+            if column in step.values:
+                select_columns.append(step.values[column])
+            elif column == 'id' and has_id:
+                select_columns.append('m.new_id')
+            elif column in step.remap:
+                alias = 'm_' + column
+                joins.append('LEFT JOIN {} AS {} ON {}.old_id = t.{}'.format(
+                    map_table_name(step.remap[column]), alias, alias, column))
+                select_columns.append('COALESCE({}.new_id, t.{})'.format(alias, column))
+            else:
+                select_columns.append('t.' + column)
+
+        if has_id:
+            map_table = map_table_name(table)
+            session.execute(text('DROP TABLE IF EXISTS {}'.format(map_table)))
+            session.execute(text('CREATE TEMPORARY TABLE {} (old_id integer PRIMARY KEY, new_id integer NOT NULL) '
+                                 'ON COMMIT DROP'.format(map_table)))
+            session.execute(text("INSERT INTO {map_table} (old_id, new_id) "
+                                 "SELECT t.id, nextval(pg_get_serial_sequence('{table}', 'id')) FROM {table} AS t "
+                                 "WHERE {where}".format(map_table=map_table, table=table.name, where=step.where)),
+                            params)
+            session.execute(text('ANALYZE {}'.format(map_table)))
+            source = '{} AS t JOIN {} AS m ON m.old_id = t.id'.format(table.name, map_table)
+            where = ''
+        else:
+            source = '{} AS t'.format(table.name)
+            where = ' WHERE ' + step.where
+
+        result = session.execute(text('INSERT INTO {table} ({columns}) SELECT {select_columns} FROM {source} {joins}'
+                                      '{where}'.format(table=table.name, columns=', '.join(columns),
+                                                       select_columns=', '.join(select_columns), source=source,
+                                                       joins=' '.join(joins), where=where)),
+                                 params)
+        counts[table.name] = result.rowcount
+    return counts
+
+
+def cloned_id(session, table, old_id):
+    """
+    :return: ID of the copy of a row cloned in the current transaction, None if it wasn't
+    """
+    return session.execute(text('SELECT new_id FROM {} WHERE old_id = :old_id'.format(map_table_name(table))),
+                           {'old_id': old_id}).scalar()
@@ -0,0 +1,99 @@
+"""
+Import-time profile of the app's start-up, from the interpreter's -X importtime output.
+Usage, from pythonsrc: python -m util.import_profiler [--module app] [--top 15] [--budget-ms 1500]
+Exits with status 1 when the total import time is over the budget, so it can guard start-up time in CI.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import namedtuple
+
+ImportTiming = namedtuple('ImportTiming', ['name', 'self_us', 'cumulative_us', 'depth'])
+
+_IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def parse_import_times(output):
+    """
+    :param output: stderr of python -X importtime
+    :return: list of ImportTiming, in the order the imports completed
+    """
+    timings = []
+    for line in output.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            # The first level is indented by one space, each nested level by two more
+            timings.append(ImportTiming(name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return timings
+
+
+def total_import_time_us(timings):
+    """
+    :return: microseconds spent in all imports, the sum of the top level cumulative times
+    """
+    return sum(timing.cumulative_us for timing in timings if timing.depth == 0)
+
+
+def self_time_by_package(timings):
+    """
+    :return: list of (top level package, self microseconds) tuples, slowest first
+    """
+    totals = {}
+    for timing in timings:
+        package = timing.name.split('.')[0]
+        totals[package] = totals.get(package, 0) + timing.self_us
+    return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+
+def profile_import(module, cwd=None, env=None):
+    """
+    Import a module in a fresh interpreter.
+    :param module: module to import, e.g. app
+    :param cwd: directory to run the interpreter in, defaults to the current directory
+    :param env: extra environment variables, e.g. {'LAZY_INIT': '1'}
+    :return: list of ImportTiming
+    """
+    process_env = dict(os.environ, **(env or {}))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module], cwd=cwd,
+                             env=process_env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = process.stderr.decode('utf-8', 'replace')
+    if process.returncode != 0:
+        raise RuntimeError('Importing {} failed:\n{}'.format(module, stderr))
+    return parse_import_times(stderr)
+
+
+def format_report(timings, top):
+    lines = ['Total import time: {:.1f} ms'.format(total_import_time_us(timings) / 1000), '',
+             'Slowest packages (self time):']
+    for package, self_us in self_time_by_package(timings)[:top]:
+        lines.append('  {:>9.1f} ms  {}'.format(self_us / 1000, package))
+    lines += ['', 'Slowest modules (cumulative time):']
+    for timing in sorted(timings, key=lambda timing: -timing.cumulative_us)[:top]:
+        lines.append('  {:>9.1f} ms  {}'.format(timing.cumulative_us / 1000, timing.name))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile the time spent importing the app.')
+    parser.add_argument('--module', default='app', help='module to import, default app')
+    parser.add_argument('--top', type=int, default=15, help='number of packages and modules to list')
+    parser.add_argument('--budget-ms', type=float, help='fail if the total import time is over this many ms')
+    parser.add_argument('--lazy', action='store_true', help='start the app with LAZY_INIT=1')
+    args = parser.parse_args(argv)
+
+    timings = profile_import(args.module, env={'LAZY_INIT': '1'} if args.lazy else None)
+    print(format_report(timings, args.top))
+
+    total_ms = total_import_time_us(timings) / 1000
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print('\nImport time {:.1f} ms is over the {:.1f} ms budget'.format(total_ms, args.budget_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Per-request SQL and serialization instrumentation of the API.
+SQL statements are timed by SQLAlchemy engine event listeners. Serialization is JSON encoding, timed by
+util.json_util.dumps, plus the marshmallow schema dumps, which must be wrapped in timed_serialization. Each API
+response gets a Server-Timing header, and the totals per endpoint are kept for the /api/metrics endpoint.
+The body of streamed responses is produced after the request is finished, its statements aren't counted.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestStats:
+    """
+    What one request did.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows_fetched = 0
+        self.serialization_seconds = 0.0
+
+
+class EndpointMetrics:
+    """
+    Totals of the RequestStats per (endpoint, method, status), since the process started.
+    """
+
+    FIELDS = ('requests', 'request_seconds', 'statements', 'db_seconds', 'rows_fetched', 'serialization_seconds')
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, method, status, stats, request_seconds):
+        key = (endpoint, method, status)
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = dict.fromkeys(self.FIELDS, 0)
+            totals['requests'] += 1
+            totals['request_seconds'] += request_seconds
+            totals['statements'] += stats.statements
+            totals['db_seconds'] += stats.db_seconds
+            totals['rows_fetched'] += stats.rows_fetched
+            totals['serialization_seconds'] += stats.serialization_seconds
+
+    def snapshot(self):
+        """
+        :return: dict of (endpoint, method, status) to a dict of totals, see FIELDS
+        """
+        with self._lock:
+            return {key: dict(totals) for key, totals in self._totals.items()}
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+
+endpoint_metrics = EndpointMetrics()
+
+
+def current_stats():
+    """
+    :return: the RequestStats of the current request, None outside instrumented requests (e.g. in background jobs)
+    """
+    if not has_request_context():
+        return None
+    return g.get('request_stats')
+
+
+def record_serialization_time(seconds):
+    stats = current_stats()
+    if stats is not None:
+        stats.serialization_seconds += seconds
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Count the time spent in the block as serialization, e.g. around a schema dump:
+        with timed_serialization():
+            data = schema.dump(objects).data
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_serialization_time(time.perf_counter() - started_at)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info['query_started_at'].pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += time.perf_counter() - started_at
+        if cursor.description is not None and cursor.rowcount > 0:
+            stats.rows_fetched += cursor.rowcount
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started_at'):
+        conn.info['query_started_at'].pop()
+
+
+def start_request():
+    """
+    Blueprint before_request handler.
+    """
+    g.request_stats = RequestStats()
+
+
+def finish_request(response):
+    """
+    Blueprint after_request handler adding the request's stats to the endpoint metrics and the Server-Timing header
+    (unless the SERVER_TIMING app setting is false).
+    """
+    stats = current_stats()
+    if stats is None:
+        return response
+    request_seconds = time.perf_counter() - stats.started_at
+    endpoint_metrics.add(request.endpoint or 'unknown', request.method, response.status_code, stats, request_seconds)
+
+    if current_app.config.get('SERVER_TIMING', True):
+        response.headers['Server-Timing'] = ', '.join([
+            'db;dur={:.1f};desc="{} statements, {} rows"'.format(stats.db_seconds * 1000, stats.statements,
+                                                                 stats.rows_fetched),
+            'serialize;dur={:.1f}'.format(stats.serialization_seconds * 1000),
+            'total;dur={:.1f}'.format(request_seconds * 1000),
+        ])
+    return response
+
+
+def init_blueprint(blueprint):
+    blueprint.before_request(start_request)
+    blueprint.after_request(finish_request)
@@ -0,0 +1,242 @@
+"""
+Background job queue for work too slow for an HTTP request.
+Jobs are stored in a local SQLite database shared by all the app's processes and run by a pool of worker threads in
+each process, so no external broker is needed.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+DEFAULT_QUEUE_PATH = 'jobs.sqlite3'
+DEFAULT_NUM_WORKERS = 2
+POLL_INTERVAL = 1.0  # seconds, only matters for jobs enqueued by another process
+HEARTBEAT_INTERVAL = 15  # seconds between the heartbeats of a running job
+STALE_AFTER = 120  # seconds without a heartbeat after which a running job is failed, its worker having died
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+create table if not exists job (
+    id integer primary key autoincrement,
+    name text not null,
+    args text not null,
+    dedupe_key text,
+    status text not null,
+    progress integer not null default 0,
+    message text,
+    result text,
+    created_at text not null,
+    started_at text,
+    heartbeat_at text,
+    finished_at text
+)
+"""
+
+STALE_MESSAGE = 'The worker running the job stopped, the job has been abandoned.'
+
+
+class JobError(Exception):
+    """
+    Raised by a job function to fail the job with a message for the user instead of a traceback.
+    """
+
+
+class JobQueue:
+    """
+    Usage:
+        job_queue = JobQueue()
+        job_queue.init_app(app)
+
+        @job_queue.job('rebuild')
+        def rebuild(progress, project_id):
+            progress(50, 'Half way')
+            return {'project_id': project_id}
+
+        job_id = job_queue.enqueue('rebuild', project_id=1)
+        job_queue.get(job_id)
+
+    Job functions run inside an app context and receive a progress(percent, message) callback as first argument.
+    Their return value is stored as the job result and must be JSON serializable.
+
+    A running job's worker records a heartbeat every HEARTBEAT_INTERVAL seconds. A job left running by a process that
+    crashed or was restarted stops getting heartbeats and is failed once STALE_AFTER seconds have passed, so that it
+    can be queued again.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.path = None
+        self.num_workers = DEFAULT_NUM_WORKERS
+        self._functions = {}
+        self._workers = []
+        self._lock = threading.Lock()
+        self._wake_up = threading.Event()
+
+    def init_app(self, app):
+        """
+        Configured by the JOB_QUEUE_PATH and JOB_WORKERS app settings.
+        """
+        self.app = app
+        self.path = app.config.get('JOB_QUEUE_PATH', os.path.join(os.getcwd(), DEFAULT_QUEUE_PATH))
+        self.num_workers = app.config.get('JOB_WORKERS', DEFAULT_NUM_WORKERS)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    def job(self, name):
+        """
+        Decorator registering a job function under a name.
+        """
+        def register(fn):
+            self._functions[name] = fn
+            return fn
+        return register
+
+    def enqueue(self, name, dedupe=False, **kwargs):
+        """
+        Queue a job and make sure this process's workers are running.
+        :param name: name the job function was registered under
+        :param dedupe: if true and the same job with the same arguments is already queued or running, return its ID
+        instead of queueing another one (e.g. when a user double-clicks)
+        :param kwargs: job arguments, must be JSON serializable
+        :return: job ID
+        """
+        if name not in self._functions:
+            raise KeyError('No job registered as {}'.format(name))
+        args = json.dumps(kwargs, sort_keys=True)
+        dedupe_key = name + ':' + args if dedupe else None
+        with self._connect() as conn:
+            conn.execute('begin immediate')
+            self._fail_stale_jobs(conn)
+            existing = dedupe_key and conn.execute(
+                'select id from job where dedupe_key = ? and status in (?, ?)',
+                (dedupe_key, QUEUED, RUNNING)).fetchone()
+            if existing:
+                job_id = existing[0]
+            else:
+                job_id = conn.execute(
+                    'insert into job (name, args, dedupe_key, status, created_at) values (?, ?, ?, ?, ?)',
+                    (name, args, dedupe_key, QUEUED, _now())).lastrowid
+            conn.execute('commit')
+        self._start_workers()
+        self._wake_up.set()
+        return job_id
+
+    def get(self, job_id):
+        """
+        :return: the job as a dict, None if there is no such job
+        """
+        with self._connect() as conn:
+            row = conn.execute('select * from job where id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['args'] = json.loads(job['args'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        del job['dedupe_key']
+        del job['heartbeat_at']
+        return job
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return closing(conn)  # Closing discards any transaction left open by an error
+
+    def _start_workers(self):
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.num_workers:
+                worker = threading.Thread(target=self._work, name='job-worker-{}'.format(len(self._workers)))
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+    def _fail_stale_jobs(self, conn):
+        """
+        Fail the running jobs without a heartbeat for STALE_AFTER seconds, within the caller's transaction.
+        """
+        stale_before = (datetime.utcnow() - timedelta(seconds=STALE_AFTER)).isoformat()
+        count = conn.execute('update job set status = ?, message = ?, finished_at = ? '
+                             'where status = ? and coalesce(heartbeat_at, started_at) < ?',
+                             (FAILED, STALE_MESSAGE, _now(), RUNNING, stale_before)).rowcount
+        if count:
+            logger.warning('Failed %s running jobs without a heartbeat for %s seconds', count, STALE_AFTER)
+
+    def _claim(self):
+        with self._connect() as conn:
+            conn.execute('begin immediate')
+            self._fail_stale_jobs(conn)
+            row = conn.execute('select id, name, args from job where status = ? and name in ({}) order by id limit 1'
+                               .format(','.join('?' * len(self._functions))),
+                               (QUEUED,) + tuple(self._functions)).fetchone()
+            if row:
+                now = _now()
+                conn.execute('update job set status = ?, started_at = ?, heartbeat_at = ? where id = ?',
+                             (RUNNING, now, now, row['id']))
+            conn.execute('commit')
+        return row
+
+    def _update(self, job_id, **values):
+        with self._connect() as conn:
+            conn.execute('update job set {} where id = ?'.format(', '.join(k + ' = ?' for k in values)),
+                         tuple(values.values()) + (job_id,))
+
+    def _work(self):
+        while True:
+            try:
+                row = self._claim()
+                if row is None:
+                    self._wake_up.wait(POLL_INTERVAL)
+                    self._wake_up.clear()
+                    continue
+                self._run(row['id'], self._functions[row['name']], json.loads(row['args']))
+            except Exception:
+                # E.g. the queue database is locked for longer than the connection timeout, keep the worker alive
+                logger.exception('Job worker error')
+                time.sleep(POLL_INTERVAL)
+
+    def _heartbeat(self, job_id, finished):
+        while not finished.wait(HEARTBEAT_INTERVAL):
+            try:
+                self._update(job_id, heartbeat_at=_now())
+            except Exception:
+                logger.exception('Job %s heartbeat error', job_id)
+
+    def _run(self, job_id, fn, kwargs):
+        def progress(percent, message=None):
+            self._update(job_id, progress=percent, message=message, heartbeat_at=_now())
+
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, finished),
+                                     name='job-heartbeat-{}'.format(job_id))
+        heartbeat.daemon = True
+        heartbeat.start()
+        try:
+            with self.app.app_context():
+                result = fn(progress, **kwargs)
+            self._update(job_id, status=SUCCEEDED, progress=100, result=json.dumps(result), finished_at=_now())
+        except JobError as e:
+            self._update(job_id, status=FAILED, message=str(e), finished_at=_now())
+        except Exception:
+            logger.exception('Job %s failed', job_id)
+            self._update(job_id, status=FAILED, message='Unexpected error, the job has been abandoned.',
+                         finished_at=_now())
+        finally:
+            finished.set()
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+job_queue = JobQueue()
@@ -1,22 +1,67 @@
+import json
+import re
 from decimal import Decimal
 from flask.json import JSONEncoder as FlaskJSONEncoder
 from flask_sqlalchemy import Model
-from flask import jsonify as flask_jsonify
+from flask import current_app, request
+from sqlalchemy import inspect, Numeric
+
+from util.instrumentation import timed_serialization
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_model_serializers = {}
+
+
+def _compile_model_serializer(model_class):
+    """
+    Build the function converting instances of a model class to dicts.
+    The exportable attributes (public, not in __json_exclude__) are worked out once from the SQLAlchemy mapper, as are
+    the Numeric columns whose Decimal values are converted to strings. Only attributes already loaded into the
+    instance's __dict__ are exported, so serializing never triggers lazy loads.
+    :param model_class: mapped Model subclass
+    :return: function taking a model instance and returning a dict
+    """
+    mapper = inspect(model_class)
+    json_exclude = frozenset(getattr(model_class, '__json_exclude__', None) or ())
+    keys = [attr.key for attr in mapper.attrs if not attr.key.startswith('_') and attr.key not in json_exclude]
+    decimal_keys = tuple(attr.key for attr in mapper.column_attrs
+                         if attr.key in keys and isinstance(attr.columns[0].type, Numeric)
+                         and attr.columns[0].type.asdecimal)
+    plain_keys = tuple(key for key in keys if key not in decimal_keys)
+
+    def to_dict(o):
+        values = o.__dict__
+        result = {k: values[k] for k in plain_keys if k in values}
+        for k in decimal_keys:
+            if k in values:
+                value = values[k]
+                result[k] = str(value) if isinstance(value, Decimal) else value
+        return result
+
+    return to_dict
+
+
+def model_to_dict(o):
+    """
+    :param o: model instance
+    :return: dict of the instance's loaded, exportable attributes
+    """
+    model_class = type(o)
+    to_dict = _model_serializers.get(model_class)
+    if to_dict is None:
+        to_dict = _model_serializers[model_class] = _compile_model_serializer(model_class)
+    return to_dict(o)
 
 
 class AppJSONEncoder(FlaskJSONEncoder):
     def default(self, o):
         if isinstance(o, Model):
-            # Explicit optimization for the case when there is no __json_exclude__
-            json_exclude = getattr(o, '__json_exclude__', None)
-            if json_exclude:
-                return {
-                    k: v for k, v in o.__dict__.items() if not k.startswith('_') and k not in json_exclude
-                }
-            else:
-                return {
-                    k: v for k, v in o.__dict__.items() if not k.startswith('_')
-                }
+            return model_to_dict(o)
         elif isinstance(o, Decimal):
             return str(o)
         else:
@@ -25,12 +70,122 @@ class AppJSONEncoder(FlaskJSONEncoder):
 
 _app_json_encoder = AppJSONEncoder()
 
+COMPACT_SEPARATORS = (',', ':')
+
+
+class StdlibJSONBackend:
+    """
+    The standard library json module with AppJSONEncoder, the reference every other backend must match byte for byte.
+    """
+    name = 'stdlib'
+
+    def dumps(self, obj, sort_keys=True, ensure_ascii=True, indent=None, separators=None):
+        return json.dumps(obj, cls=AppJSONEncoder, sort_keys=sort_keys, ensure_ascii=ensure_ascii, indent=indent,
+                          separators=separators)
+
+
+class OrjsonJSONBackend:
+    """
+    orjson, a C-accelerated encoder, used for compact output only (COMPACT_SEPARATORS, as jsonify uses). Models,
+    Decimals and dates are still converted by AppJSONEncoder.default. Whenever orjson's output could differ from the
+    stdlib's (pretty printing, non-ASCII text with ensure_ascii, tiny floats printed without an exponent, ints over 64
+    bits, non-string keys in nested dicts) the stdlib backend is used instead.
+    Known difference: NaN and infinite floats, which aren't valid JSON, are encoded as null instead of NaN/Infinity.
+    """
+    name = 'orjson'
+
+    # Floats orjson formats differently from repr(), e.g. 0.00001 for 1e-05 and 2.5e-7 for 2.5e-07
+    _negative_exponent = re.compile(rb'\de-\d')
+
+    def __init__(self, fallback):
+        if orjson is None:
+            raise ImportError('The orjson JSON backend needs the orjson package')
+        self.fallback = fallback
+
+    def dumps(self, obj, sort_keys=True, ensure_ascii=True, indent=None, separators=None):
+        if indent is not None or tuple(separators or ()) != COMPACT_SEPARATORS:
+            return self.fallback.dumps(obj, sort_keys, ensure_ascii, indent, separators)
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            if isinstance(obj, dict) and obj and all(type(key) is int for key in obj):
+                # Result sets keyed by ID (e.g. get_branches): the stdlib sorts int keys numerically
+                items = sorted(obj.items()) if sort_keys else obj.items()
+                encoded = b'{' + b','.join(b'"%d":%s' % (key, orjson.dumps(value, default=_app_json_encoder.default,
+                                                                           option=option))
+                                           for key, value in items) + b'}'
+            else:
+                encoded = orjson.dumps(obj, default=_app_json_encoder.default, option=option)
+        except TypeError:
+            return self.fallback.dumps(obj, sort_keys, ensure_ascii, indent, separators)
+
+        # With ensure_ascii the stdlib also escapes DEL (0x7f), orjson leaves it as is
+        if ensure_ascii and (not encoded.isascii() or b'\x7f' in encoded):
+            return self.fallback.dumps(obj, sort_keys, ensure_ascii, indent, separators)
+        if b'0.0000' in encoded or (b'e-' in encoded and self._negative_exponent.search(encoded)):
+            return self.fallback.dumps(obj, sort_keys, ensure_ascii, indent, separators)
+        return encoded.decode('utf-8')
+
+
+_stdlib_backend = StdlibJSONBackend()
+_backends = {}
+
+
+def get_json_backend(name=None):
+    """
+    :param name: 'stdlib', 'orjson', or 'auto' for orjson if installed and the stdlib otherwise. Defaults to the
+    JSON_BACKEND app setting, itself defaulting to 'stdlib'.
+    :return: JSON backend instance
+    """
+    if name is None:
+        name = current_app.config.get('JSON_BACKEND', 'stdlib')
+    if name == 'auto':
+        name = 'stdlib' if orjson is None else 'orjson'
+    backend = _backends.get(name)
+    if backend is None:
+        if name == 'stdlib':
+            backend = _stdlib_backend
+        elif name == 'orjson':
+            backend = OrjsonJSONBackend(_stdlib_backend)
+        else:
+            raise ValueError('Unknown JSON backend {}'.format(name))
+        _backends[name] = backend
+    return backend
+
+
+def dumps(obj, **kwargs):
+    """
+    Serialize obj to a JSON string with the configured backend, defaulting the options from the app settings like
+    flask.json.dumps does.
+    """
+    kwargs.setdefault('sort_keys', current_app.config['JSON_SORT_KEYS'])
+    kwargs.setdefault('ensure_ascii', current_app.config['JSON_AS_ASCII'])
+    with timed_serialization():
+        return get_json_backend().dumps(obj, **kwargs)
+
 
 def jsonify(*args, **kwargs):
     """
-    :param args: top level model objects are converted to dicts, anything else goes right to flask jsonify
-    :param kwargs: passed along to flask jsonify
-    :return: flask jsonification result
+    Same as flask.jsonify but encodes with the configured JSON backend.
+    :param args: top level model objects are converted to dicts, anything else is serialized as flask jsonify would
+    :param kwargs: serialized as flask jsonify would
+    :return: JSON response
     """
-    args = map(lambda o: _app_json_encoder.default(o) if isinstance(o, Model) else o, args)
-    return flask_jsonify(*args, **kwargs)
\ No newline at end of file
+    indent = None
+    separators = COMPACT_SEPARATORS
+    if current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] and not request.is_xhr:
+        indent = 2
+        separators = (', ', ': ')
+
+    args = [_app_json_encoder.default(o) if isinstance(o, Model) else o for o in args]
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    elif len(args) == 1:
+        data = args[0]
+    else:
+        data = args or kwargs
+
+    return current_app.response_class(
+        (dumps(data, indent=indent, separators=separators), '\n'),
+        mimetype=current_app.config['JSONIFY_MIMETYPE']
+    )
@@ -0,0 +1,223 @@
+"""
+Materialisation of models mapped to parameterised selects (e.g. SkuWithBands, whose banding depends on num_bands) into
+indexed tables, per project, cluster and number of bands.
+"""
+
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import Integer, MetaData, Table, inspect, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from util.cache_util import TTLCache
+from util.job_util import job_queue
+from util.response_cache import on_invalidate_project
+
+# Seconds for which a process doesn't queue the same refresh again, so that stale reads don't each write to the queue
+ENQUEUED_TTL = 60
+
+# Columns added to the materialised tables, prefixed as the models may have columns of the same name
+KEY_COLUMNS = ('mat_project_id', 'mat_cluster_id', 'mat_num_bands')
+
+# Freshness of each materialisation: rows are fresh when refreshed_generation is generation, every change to the
+# project bumps generation
+materialisation = db.Table(
+    'materialisation',
+    db.Column('name', db.String(64), primary_key=True),
+    db.Column('project_id', db.Integer, primary_key=True),
+    db.Column('cluster_id', db.Integer, primary_key=True),
+    db.Column('num_bands', db.Integer, primary_key=True),
+    db.Column('generation', db.Integer, nullable=False),
+    db.Column('refreshed_generation', db.Integer, nullable=False),
+    db.Column('refreshed_at', db.DateTime),
+)
+
+_materialisations = {}
+
+
+class CreateTableAs(Executable, ClauseElement):
+    """
+    CREATE TABLE ... AS <select> WITH NO DATA, so that the column types are worked out by the database.
+    """
+
+    def __init__(self, name, select):
+        self.name = name
+        self.select = select
+
+
+@compiles(CreateTableAs)
+def _compile_create_table_as(element, compiler, **kwargs):
+    return 'CREATE TABLE IF NOT EXISTS {} AS {} WITH NO DATA'.format(element.name,
+                                                                     compiler.process(element.select, **kwargs))
+
+
+class MaterialisedModel:
+    """
+    Table holding the rows of a model mapped to a parameterised select, for each (project, cluster, number of bands)
+    it has been refreshed for. The select's bind parameters must be project_id, cluster_id and num_bands.
+    """
+
+    def __init__(self, model, table_name):
+        self.model = model
+        self.table_name = table_name
+        self._table = None
+
+    @property
+    def selectable(self):
+        return inspect(self.model).local_table
+
+    def _select(self, project_id, cluster_id, num_bands):
+        """
+        :return: select of the model's rows for a key, prefixed with the key columns
+        """
+        key_values = [literal(value, Integer).label(name)
+                      for name, value in zip(KEY_COLUMNS, (project_id, cluster_id, num_bands))]
+        return select(key_values + list(self.selectable.c))\
+            .params(project_id=project_id, cluster_id=cluster_id, num_bands=num_bands)
+
+    def create(self, bind):
+        bind.execute(CreateTableAs(self.table_name, self._select(0, 0, 1)))
+        bind.execute('CREATE INDEX IF NOT EXISTS ix_{0}_key ON {0} ({1})'.format(self.table_name,
+                                                                                ', '.join(KEY_COLUMNS)))
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = Table(self.table_name, MetaData(), autoload=True, autoload_with=db.engine)
+        return self._table
+
+    def _key_filter(self, project_id, cluster_id, num_bands):
+        return db.and_(*[self.table.c[name] == value
+                         for name, value in zip(KEY_COLUMNS, (project_id, cluster_id, num_bands))])
+
+    def refresh(self, session, project_id, cluster_id, num_bands):
+        """
+        Replace the materialised rows of a key, in the session's transaction.
+        """
+        session.execute(self.table.delete().where(self._key_filter(project_id, cluster_id, num_bands)))
+        session.execute(self.table.insert().from_select(
+            list(KEY_COLUMNS) + [column.name for column in self.selectable.c],
+            self._select(project_id, cluster_id, num_bands)))
+
+    def aliased(self, project_id, cluster_id, num_bands):
+        """
+        :return: alias of the model reading the materialised rows of a key, usable wherever the model is in a query
+        """
+        columns = [column for column in self.table.c if column.name not in KEY_COLUMNS]
+        rows = select(columns).where(self._key_filter(project_id, cluster_id, num_bands)).alias(self.table_name)
+        return db.aliased(self.model, rows, adapt_on_names=True)
+
+
+class Materialisation:
+    """
+    Group of models materialised and refreshed together, by a background job. Enabled by the MATERIALISED_VIEWS app
+    setting, run create_materialised_tables() first.
+
+    A key (project, cluster, number of bands) is materialised when first requested, until then and whenever its rows
+    are stale the query path computes the models live. Every change to a project (see
+    util.response_cache.invalidate_project) marks its materialised keys stale and queues their refresh, other
+    projects' rows are untouched. The refresh jobs are deduplicated by key and generation: a change made while a
+    refresh runs queues another one.
+    """
+
+    def __init__(self, name, materialised_models):
+        self.name = name
+        self.materialised_models = materialised_models
+        self._enqueued = TTLCache(1000, ENQUEUED_TTL)
+        _materialisations[name] = self
+
+    @staticmethod
+    def enabled():
+        return current_app.config.get('MATERIALISED_VIEWS', False)
+
+    def _key(self, project_id, cluster_id, num_bands):
+        return db.and_(materialisation.c.name == self.name, materialisation.c.project_id == project_id,
+                       materialisation.c.cluster_id == cluster_id, materialisation.c.num_bands == num_bands)
+
+    def _enqueue_refresh(self, project_id, cluster_id, num_bands, generation):
+        """
+        Queue the refresh of a key to generation (0 for a key not recorded yet), unless this process just did.
+        """
+        job_key = (project_id, cluster_id, num_bands, generation)
+        if self._enqueued.get(job_key) is None:
+            job_queue.enqueue('refresh_materialisation', dedupe=True, name=self.name, project_id=project_id,
+                              cluster_id=cluster_id, num_bands=num_bands, generation=generation)
+            self._enqueued.set(job_key, True)
+
+    def aliases(self, project_id, cluster_id, num_bands):
+        """
+        Read only, so that it can be called in any request: the bookkeeping of a new key is left to its refresh job.
+        :return: list of aliases of the models reading their materialised rows, in the order of materialised_models,
+        None if the rows are stale or not materialised yet (their refresh is then queued)
+        """
+        row = db.session.execute(select([materialisation.c.generation, materialisation.c.refreshed_generation])
+                                 .where(self._key(project_id, cluster_id, num_bands))).first()
+        if row is not None and row.generation == row.refreshed_generation:
+            return [materialised_model.aliased(project_id, cluster_id, num_bands)
+                    for materialised_model in self.materialised_models]
+
+        self._enqueue_refresh(project_id, cluster_id, num_bands, 0 if row is None else row.generation)
+        return None
+
+    def refresh(self, project_id, cluster_id, num_bands):
+        """
+        Recompute the materialised rows of a key in one transaction, recording the key first if it is new. A change to
+        the project while refreshing leaves the rows stale, to be refreshed again.
+        """
+        key = self._key(project_id, cluster_id, num_bands)
+        generation = db.session.execute(select([materialisation.c.generation]).where(key)).scalar()
+        if generation is None:
+            # Committed before refreshing so that invalidate_project sees the key and can mark it stale
+            db.session.execute(pg_insert(materialisation)
+                               .values(name=self.name, project_id=project_id, cluster_id=cluster_id,
+                                       num_bands=num_bands, generation=1, refreshed_generation=0)
+                               .on_conflict_do_nothing())
+            db.session.commit()
+            generation = db.session.execute(select([materialisation.c.generation]).where(key)).scalar()
+        for materialised_model in self.materialised_models:
+            materialised_model.refresh(db.session, project_id, cluster_id, num_bands)
+        db.session.execute(materialisation.update().where(key)
+                           .values(refreshed_generation=generation, refreshed_at=datetime.utcnow()))
+        db.session.commit()
+
+    def invalidate_project(self, project_id):
+        """
+        Mark the project's materialised rows stale and queue their refresh.
+        """
+        keys = db.session.execute(materialisation.update()
+                                  .where(db.and_(materialisation.c.name == self.name,
+                                                 materialisation.c.project_id == project_id))
+                                  .values(generation=materialisation.c.generation + 1)
+                                  .returning(materialisation.c.cluster_id, materialisation.c.num_bands,
+                                             materialisation.c.generation)).fetchall()
+        db.session.commit()
+        for cluster_id, num_bands, generation in keys:
+            self._enqueue_refresh(project_id, cluster_id, num_bands, generation)
+
+
+def create_materialised_tables(bind=None):
+    """
+    Migration creating the materialisation and materialised tables. Safe to run more than once.
+    :param bind: engine or connection, defaults to the app's engine
+    """
+    bind = bind or db.engine
+    materialisation.create(bind, checkfirst=True)
+    for group in _materialisations.values():
+        for materialised_model in group.materialised_models:
+            materialised_model.create(bind)
+
+
+@on_invalidate_project
+def invalidate_materialisations(project_id):
+    if Materialisation.enabled():
+        for group in _materialisations.values():
+            group.invalidate_project(project_id)
+
+
+@job_queue.job('refresh_materialisation')
+def refresh_materialisation_job(progress, name, project_id, cluster_id, num_bands, generation):
+    # generation only tells the jobs queued after each change apart, the refresh is to the current generation
+    _materialisations[name].refresh(project_id, cluster_id, num_bands)
+    return {'name': name, 'project_id': project_id, 'cluster_id': cluster_id, 'num_bands': num_bands}
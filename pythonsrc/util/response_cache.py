@@ -0,0 +1,122 @@
+"""
+Caching of serialized API responses, with ETag revalidation.
+"""
+
+import hashlib
+import os
+
+from flask import current_app, request
+
+from util.cache_util import SqliteCache, TTLCache
+
+DEFAULT_MAX_SIZE = 256
+DEFAULT_TTL = 600  # seconds
+DEFAULT_PATH = 'response_cache.sqlite3'
+
+
+class ResponseCache:
+    """
+    Cache of the bodies of successful JSON responses of one endpoint, keyed by project and the request parameters.
+    Every change to a project must call invalidate_project(project_id), every change to data shared by the projects of
+    a CDH (e.g. its BranchSku rows) invalidate_cdh(cdh_id).
+
+    The keys include the project's generation, which invalidate_project increments, and a response is only stored if
+    its project's generation hasn't changed since its key was made. So a request that read the project before an
+    invalidation can't store its stale response.
+
+    By default the cache is a SQLite file, RESPONSE_CACHE_PATH, shared by all the app's worker processes so that they
+    see each other's invalidations. Set RESPONSE_CACHE_PATH to an empty value for a cache in process memory, only
+    suitable for a single worker process. The size and TTL are set by RESPONSE_CACHE_SIZE and RESPONSE_CACHE_TTL.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.backend = TTLCache(DEFAULT_MAX_SIZE, DEFAULT_TTL)
+
+    def init_app(self, app):
+        max_size = app.config.get('RESPONSE_CACHE_SIZE', DEFAULT_MAX_SIZE)
+        ttl = app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL)
+        path = app.config.get('RESPONSE_CACHE_PATH', os.path.join(os.getcwd(), DEFAULT_PATH))
+        self.backend = SqliteCache(path, max_size, ttl) if path else TTLCache(max_size, ttl)
+
+    def _project_prefix(self, project_id):
+        return '{}:{}'.format(self.name, project_id)
+
+    def key(self, project_id, *params):
+        """
+        Make the cache key of a request, before reading the project from the database.
+        """
+        prefix = self._project_prefix(project_id)
+        return ':'.join([prefix, str(self.backend.generation(prefix))] + [str(param) for param in params])
+
+    def get(self, key):
+        """
+        :return: the cached response for the current request (304 if the client's copy is current), None on a miss
+        """
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        body, etag = entry
+        body = body.encode('utf-8')
+        return self._conditional_response(current_app.response_class(body, mimetype='application/json'), etag,
+                                          'HIT')
+
+    def store(self, key, resp):
+        """
+        Cache a freshly built response if it is a success.
+        :return: the response, with its ETag set (304 if the client's copy is current)
+        """
+        if resp.status_code != 200:
+            return resp
+        body = resp.get_data()
+        etag = hashlib.sha1(body).hexdigest()
+        name, project_id, generation = key.split(':', 3)[:3]
+        if str(self.backend.generation(self._project_prefix(project_id))) == generation:
+            self.backend.set(key, (body.decode('utf-8'), etag))
+        return self._conditional_response(resp, etag, 'MISS')
+
+    def invalidate_project(self, project_id):
+        prefix = self._project_prefix(project_id)
+        self.backend.next_generation(prefix)
+        self.backend.delete_prefix(prefix + ':')
+
+    def stats(self):
+        return self.backend.stats()
+
+    @staticmethod
+    def _conditional_response(resp, etag, cache_status):
+        resp.set_etag(etag)
+        resp.headers['X-Cache'] = cache_status
+        return resp.make_conditional(request)
+
+
+branches_cache = ResponseCache('branches')
+
+_project_invalidation_callbacks = []
+
+
+def on_invalidate_project(callback):
+    """
+    Decorator registering a function called with the project ID by invalidate_project, e.g. to refresh data derived
+    from the project.
+    """
+    _project_invalidation_callbacks.append(callback)
+    return callback
+
+
+def invalidate_project(project_id):
+    """
+    Drop every cached response of a project, call after any change to the project or its decisions.
+    """
+    branches_cache.invalidate_project(project_id)
+    for callback in _project_invalidation_callbacks:
+        callback(project_id)
+
+
+def invalidate_cdh(cdh_id):
+    """
+    Invalidate every project on a CDH, call after any change to data keyed by the CDH rather than by the project, e.g.
+    rebuilding its BranchSku rows.
+    """
+    for project_id, in db.session.query(Project.id).filter(Project.cdh_id == cdh_id):
+        invalidate_project(project_id)
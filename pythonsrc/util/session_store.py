@@ -0,0 +1,117 @@
+"""
+Server-side Flask sessions: the session cookie only holds a random session ID, the session data is kept in a store.
+Flask's default cookie session re-sends, re-verifies and deserialises the whole session (e.g. the Auth0 profile) on
+every request, and grows with it.
+"""
+
+import os
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from util.cache_util import SqliteCache, TTLCache
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_TTL = 8 * 3600  # seconds
+SWEEP_INTERVAL = 300  # seconds
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.regenerate_sid = False
+
+    def regenerate(self):
+        """
+        Give the session a new ID when it is saved, call on login so that a session ID known before (e.g. set by an
+        attacker) doesn't become a logged in session.
+        """
+        self.regenerate_sid = True
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Session interface keeping the sessions in a TTLCache (in process memory, for a single process) or a SqliteCache
+    (shared by the processes on a host). A session is stored when modified and expires ttl seconds after, the store's
+    expired sessions are swept every SWEEP_INTERVAL seconds.
+    """
+
+    def __init__(self, store, clock=time.monotonic):
+        self.store = store
+        self._clock = clock
+        self._swept_at = clock()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(new=True)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and session.sid:
+                self.store.delete(session.sid)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            if session.regenerate_sid and session.sid is not None:
+                self.store.delete(session.sid)
+                session.sid = None
+            if session.sid is None:
+                session.sid = os.urandom(32).hex()
+            self.store.set(session.sid, dict(session))
+            response.set_cookie(app.session_cookie_name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                secure=self.get_cookie_secure(app))
+        self.sweep()
+
+    def sweep(self, force=False):
+        """
+        Delete the expired sessions, at most every SWEEP_INTERVAL seconds unless forced.
+        :return: number of deleted sessions
+        """
+        now = self._clock()
+        if not force and now - self._swept_at < SWEEP_INTERVAL:
+            return 0
+        self._swept_at = now
+        return self.store.delete_expired()
+
+
+def regenerate_session(session):
+    """
+    Give the session a new ID when it is saved, if it is kept server side, see ServerSideSession.regenerate. Cookie
+    sessions have no ID.
+    """
+    if isinstance(session, ServerSideSession):
+        session.regenerate()
+
+
+def init_session_store(app):
+    """
+    Replace the app's cookie sessions as set by its SESSION_STORE setting: 'memory' or 'sqlite' (at
+    SESSION_STORE_PATH), by default the sessions stay in the cookie. SESSION_STORE_SIZE and SESSION_TTL set the
+    maximum number of sessions and their lifetime in seconds.
+    """
+    kind = app.config.get('SESSION_STORE', 'cookie')
+    max_size = app.config.get('SESSION_STORE_SIZE', DEFAULT_MAX_SIZE)
+    ttl = app.config.get('SESSION_TTL', DEFAULT_TTL)
+    if kind == 'memory':
+        app.session_interface = ServerSideSessionInterface(TTLCache(max_size, ttl))
+    elif kind == 'sqlite':
+        app.session_interface = ServerSideSessionInterface(SqliteCache(app.config['SESSION_STORE_PATH'], max_size,
+                                                                       ttl))
+    elif kind != 'cookie':
+        raise ValueError('Unknown SESSION_STORE {}'.format(kind))
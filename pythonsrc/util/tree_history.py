@@ -0,0 +1,231 @@
+"""
+Revision history of trees, e.g. each project's CDH tree, so that clients polling a tree can fetch only what changed.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from util.response_cache import on_invalidate_project
+
+DEFAULT_PATH = 'tree_history.sqlite3'
+DEFAULT_REVISIONS = 20
+DEFAULT_RECHECK_INTERVAL = 60  # seconds
+
+_SCHEMA = [
+    """
+    create table if not exists tree (
+        tree text primary key,
+        revision integer not null,
+        stale integer not null default 0,
+        checked_stale integer not null default 0,
+        checked_at real not null
+    )
+    """,
+    """
+    create table if not exists tree_node (
+        tree text not null,
+        key text not null,
+        digest text not null,
+        primary key (tree, key)
+    )
+    """,
+    """
+    create table if not exists tree_change (
+        tree text not null,
+        revision integer not null,
+        keys text not null,
+        primary key (tree, revision)
+    )
+    """,
+]
+
+
+class TreeHistory:
+    """
+    Keeps a monotonic revision counter per tree and the keys of the nodes changed by each of the last revisions.
+    When a tree is read after it was marked stale, or once recheck_interval seconds have passed since it was last
+    compared, its nodes are compared with the last revision. A new revision is recorded if any node was added, removed
+    or changed. A client sending the revision it has gets the nodes touched since, as long as the history still covers
+    that revision.
+
+    The history is kept in a SQLite file shared by the app's worker processes, so a revision from one worker can be
+    diffed by any other. Revisions are integers counting up from 1 per tree. The digest of each node is kept in its own
+    row, so that a revision only writes the rows of the nodes it changed.
+
+    A tree is marked stale when its source data changes, e.g. by util.response_cache.invalidate_project. Until then,
+    and for at most TREE_HISTORY_RECHECK_INTERVAL seconds after the tree was last compared, is_current tells a client
+    that has the current revision that nothing changed, without the tree being read, and record doesn't compare the
+    nodes. Marking a tree stale increments its stale counter. A reader gets the counter before reading the tree, with
+    stale_counter, and record only clears the stale mark up to that count, so that a change made during the read
+    isn't lost.
+    The file, the number of revisions kept per tree and the recheck interval are set by TREE_HISTORY_PATH,
+    TREE_HISTORY_REVISIONS and TREE_HISTORY_RECHECK_INTERVAL.
+    """
+
+    def __init__(self, name, path=None, clock=time.time):
+        self.name = name
+        self.path = path
+        self.revisions = DEFAULT_REVISIONS
+        self.recheck_interval = DEFAULT_RECHECK_INTERVAL
+        self._clock = clock
+        self._schema_created = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.path = app.config.get('TREE_HISTORY_PATH', os.path.join(os.getcwd(), DEFAULT_PATH))
+        self.revisions = app.config.get('TREE_HISTORY_REVISIONS', DEFAULT_REVISIONS)
+        self.recheck_interval = app.config.get('TREE_HISTORY_RECHECK_INTERVAL', DEFAULT_RECHECK_INTERVAL)
+        self._schema_created = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path or os.path.join(os.getcwd(), DEFAULT_PATH), timeout=30,
+                               isolation_level=None)
+        if not self._schema_created:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._schema_created = True
+        return closing(conn)
+
+    def _tree(self, tree_id):
+        return '{}:{}'.format(self.name, tree_id)
+
+    def stale_counter(self, tree_id):
+        """
+        :return: number of times the tree was marked stale, get it before reading the tree and pass it to record
+        """
+        with self._connect() as conn:
+            row = conn.execute('select stale from tree where tree = ?', (self._tree(tree_id),)).fetchone()
+        return 0 if row is None else row[0]
+
+    def record(self, tree_id, items, keys, stale_counter=None):
+        """
+        Record the current state of a tree, as a new revision if it changed. The nodes are only compared if the tree
+        was marked stale or wasn't compared for recheck_interval seconds.
+        :param tree_id: ID of the tree, e.g. the project ID
+        :param items: flat list of node dicts, without children, their parent keys included
+        :param keys: key of each node, in the same order as items
+        :param stale_counter: stale_counter of the tree before items were read, None for the current one
+        :return: current revision of the tree
+        """
+        tree = self._tree(tree_id)
+        with self._lock:
+            self.misses += 1
+        with self._connect() as conn:
+            row = conn.execute('select revision, stale, checked_stale, checked_at from tree where tree = ?',
+                               (tree,)).fetchone()
+            if row is not None and row[1] == row[2] and row[3] > self._clock() - self.recheck_interval:
+                return str(row[0])
+
+            digests = {_dump_key(key): _digest(item) for item, key in zip(items, keys)}
+            conn.execute('begin immediate')
+            row = conn.execute('select revision, stale from tree where tree = ?', (tree,)).fetchone()
+            checked_stale = (0 if row is None else row[1]) if stale_counter is None else stale_counter
+            if row is None:
+                revision = 1
+                conn.execute('insert into tree (tree, revision, checked_at) values (?, ?, ?)',
+                             (tree, revision, self._clock()))
+                conn.execute('delete from tree_node where tree = ?', (tree,))
+                conn.executemany('insert into tree_node (tree, key, digest) values (?, ?, ?)',
+                                 ((tree, key, digest) for key, digest in digests.items()))
+            else:
+                revision = row[0]
+                previous = dict(conn.execute('select key, digest from tree_node where tree = ?', (tree,)))
+                changed = [(key, digest) for key, digest in digests.items() if previous.get(key) != digest]
+                removed = [key for key in previous if key not in digests]
+                if changed or removed:
+                    revision += 1
+                    touched = [key for key, _ in changed] + removed
+                    conn.execute('insert into tree_change (tree, revision, keys) values (?, ?, ?)',
+                                 (tree, revision, json.dumps(sorted(json.loads(key) for key in touched))))
+                    conn.execute('delete from tree_change where tree = ? and revision <= ?',
+                                 (tree, revision - self.revisions))
+                    conn.executemany('insert or replace into tree_node (tree, key, digest) values (?, ?, ?)',
+                                     ((tree, key, digest) for key, digest in changed))
+                    conn.executemany('delete from tree_node where tree = ? and key = ?',
+                                     ((tree, key) for key in removed))
+                    conn.execute('update tree set revision = ? where tree = ?', (revision, tree))
+            # A tree marked stale again while it was being read stays stale
+            conn.execute('update tree set checked_stale = max(checked_stale, ?), checked_at = ? where tree = ?',
+                         (checked_stale, self._clock(), tree))
+            conn.execute('commit')
+        return str(revision)
+
+    def mark_stale(self, tree_id):
+        """
+        Make the next is_current of a tree false and the next record compare its nodes, call when its source data
+        changes.
+        """
+        with self._connect() as conn:
+            conn.execute('update tree set stale = stale + 1 where tree = ?', (self._tree(tree_id),))
+
+    def is_current(self, tree_id, revision):
+        """
+        :return: true if revision is the current revision of the tree, which hasn't been marked stale and was compared
+        less than recheck_interval seconds ago, so that the tree needn't be read again
+        """
+        with self._connect() as conn:
+            row = conn.execute('select revision from tree where tree = ? and stale = checked_stale and checked_at > ?',
+                               (self._tree(tree_id), self._clock() - self.recheck_interval)).fetchone()
+        current = row is not None and str(row[0]) == revision
+        if current:
+            with self._lock:
+                self.hits += 1
+        return current
+
+    def touched_since(self, tree_id, revision):
+        """
+        :param tree_id: ID of the tree
+        :param revision: revision the client has
+        :return: set of the keys of the nodes added, removed or changed since revision, None if the history doesn't
+        cover it (unknown tree, trimmed history or invalid revision)
+        """
+        try:
+            revision = int(revision)
+        except ValueError:
+            return None
+        tree = self._tree(tree_id)
+        with self._connect() as conn:
+            row = conn.execute('select revision from tree where tree = ?', (tree,)).fetchone()
+            if row is None or not 0 < revision <= row[0]:
+                return None
+            changes = conn.execute('select revision, keys from tree_change where tree = ? and revision > ? '
+                                   'order by revision', (tree, revision)).fetchall()
+        if [change_revision for change_revision, _ in changes] != list(range(revision + 1, row[0] + 1)):
+            return None  # Trimmed
+        return {tuple(key) for _, keys in changes for key in json.loads(keys)}
+
+    def stats(self):
+        """
+        :return: dict with the number of reads answered by is_current (hits), of trees recorded (misses) and of trees
+        in the history (size)
+        """
+        with self._connect() as conn:
+            size = conn.execute('select count(*) from tree where tree like ?', (self.name + ':%',)).fetchone()[0]
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': size}
+
+
+def _digest(item):
+    """
+    :return: digest of a node, the same in every process
+    """
+    return hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _dump_key(key):
+    return json.dumps(list(key))
+
+
+cdh_tree_history = TreeHistory('cdh_tree')
+
+
+@on_invalidate_project
+def _mark_cdh_tree_stale(project_id):
+    cdh_tree_history.mark_stale(project_id)
@@ -0,0 +1,63 @@
+"""
+Assembly of trees, e.g. the CDH tree, from flat lists of nodes fetched in a single query.
+"""
+
+
+class Tree:
+    """
+    Nests items (dicts, e.g. nodes serialized flat) into their parents' children lists.
+    Linking is a single pass over the items using a dict of items by key, so building the tree is O(n) whatever the
+    order of the items. Items whose parent isn't in the list are left out of the tree.
+    """
+
+    def __init__(self, items, keys, parent_keys, children_field='children'):
+        """
+        :param items: list of dicts, one per node, each gets a children list
+        :param keys: key of each item, in the same order as items
+        :param parent_keys: key of each item's parent, in the same order as items, None for root items
+        :param children_field: name of the children list in each item
+        """
+        self.children_field = children_field
+        self._by_key = {}
+        for item, key in zip(items, keys):
+            item[children_field] = []
+            self._by_key[key] = item
+
+        self.roots = []
+        for item, parent_key in zip(items, parent_keys):
+            if parent_key is None:
+                self.roots.append(item)
+            else:
+                parent = self._by_key.get(parent_key)
+                if parent is not None:
+                    parent[children_field].append(item)
+
+    def get(self, key):
+        """
+        :return: the item with this key, with its subtree, None if there is no such item
+        """
+        return self._by_key.get(key)
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def truncate(self, items, depth):
+        """
+        Copy subtrees down to a depth, leaving the tree itself unchanged.
+        :param items: subtree roots, e.g. self.roots
+        :param depth: number of levels of children to keep, 0 for the given items only
+        :return: list of copies of items, the children lists of the items at the given depth are empty
+        """
+        children_field = self.children_field
+        copies = [dict(item) for item in items]
+        level = copies
+        for _ in range(depth):
+            next_level = []
+            for item in level:
+                children = [dict(child) for child in item[children_field]]
+                item[children_field] = children
+                next_level.extend(children)
+            level = next_level
+        for item in level:
+            item[children_field] = []
+        return copies
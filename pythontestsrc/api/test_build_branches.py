@@ -0,0 +1,52 @@
+"""
+The set-based branch_service.build_branch_skus must create the same BranchSku rows as the per-member ORM loop it
+replaced.
+"""
+
+from benchmarks.bench_build_branches import build_branch_skus_per_member
+from services import branch_service
+from util.factories import BranchFty, CdhItemFty, CdhItemMemberFty, CdhItemSkuFty, ProjectFty, SkuFty
+from util.test_base import TestBase
+
+
+class BuildBranchSkusTestCase(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.project = ProjectFty()
+        branches = [BranchFty(cdh_id=self.project.cdh.id) for _ in range(3)]
+        for item_no in range(4):
+            item = CdhItemFty()
+            item_skus = [CdhItemSkuFty(cdh_item_id=item.id, sku_id=SkuFty().id) for _ in range(3)]
+            if item_no % 2:
+                # Whole item to one branch
+                CdhItemMemberFty(project_id=self.project.id, cdh_item_id=item.id, branch_id=branches[item_no].id)
+            else:
+                # SKU by SKU, the same SKU may go to several branches
+                for sku_no, item_sku in enumerate(item_skus):
+                    CdhItemMemberFty(project_id=self.project.id, cdh_item_sku_id=item_sku.id,
+                                     branch_id=branches[sku_no].id)
+                CdhItemMemberFty(project_id=self.project.id, cdh_item_sku_id=item_skus[0].id,
+                                 branch_id=branches[2].id)
+        # Another project's members must be left out
+        other_project = ProjectFty(cdh=self.project.cdh)
+        other_item = CdhItemFty()
+        CdhItemSkuFty(cdh_item_id=other_item.id, sku_id=SkuFty().id)
+        CdhItemMemberFty(project_id=other_project.id, cdh_item_id=other_item.id, branch_id=branches[0].id)
+        self.session.commit()
+
+    def branch_skus(self):
+        return sorted(db.session.query(BranchSku.branch_id, BranchSku.cdh_id, BranchSku.sku_id)
+                      .filter(BranchSku.cdh_id == self.project.cdh_id))
+
+    def test_same_rows_as_the_per_member_loop(self):
+        self.project.delete_branch_skus()
+        build_branch_skus_per_member(self.project)
+        expected = self.branch_skus()
+        self.assertEqual(len(expected), 2 * 3 + 2 * 4)
+
+        self.project.delete_branch_skus()
+        db.session.flush()
+        created = branch_service.build_branch_skus(self.project)
+
+        self.assertEqual(created, len(expected))
+        self.assertEqual(self.branch_skus(), expected)
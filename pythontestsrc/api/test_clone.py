@@ -0,0 +1,102 @@
+import json
+
+from app import app
+from util.access_util import ATN_HEADER
+from util.factories import BranchFty, BranchSkuFty, CdhItemFty, CdhItemMemberFty, CdhItemSkuFty, ProjectFty,\
+    ProjectSkuDecisionFty, SkuFty, TaskStateFty, UserFty
+from util.test_base import TestBase
+
+
+class CloneProjectTestCase(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.user = UserFty(name='cloner1', email='cloner1@sainsburys.co.uk')
+        self.project = ProjectFty()
+        branch = BranchFty(cdh_id=self.project.cdh.id)
+        self.decisions = [ProjectSkuDecisionFty(project=self.project, comment='decision{}'.format(n),
+                                                branch_sku=BranchSkuFty(branch=branch, cdh_id=self.project.cdh.id))
+                          for n in range(3)]
+        TaskStateFty(project=self.project)
+        for item_no in range(2):
+            cdh_item = CdhItemFty(cdh_id=self.project.cdh.id)
+            cdh_item_skus = [CdhItemSkuFty(cdh_item_id=cdh_item.id, sku_id=SkuFty().id) for _ in range(2)]
+            if item_no:
+                CdhItemMemberFty(project_id=self.project.id, cdh_item_id=cdh_item.id, branch_id=branch.id)
+            else:
+                CdhItemMemberFty(project_id=self.project.id, cdh_item_sku_id=cdh_item_skus[0].id, branch_id=branch.id)
+        self.session.commit()
+
+    def clone(self, name='Clone', idempotency_key=None):
+        headers = {ATN_HEADER: self.user.email}
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+        with app.test_client() as client:
+            return client.post('/api/projects/{}/clone'.format(self.project.id), data=json.dumps({'name': name}),
+                               headers=headers)
+
+    def test_clone_copies_the_project_graph(self):
+        resp = self.clone()
+        self.assertEqual(resp.status_code, 200)
+        clone = models.Project.query.get(json.loads(resp.get_data(as_text=True))['id'])
+
+        self.assertEqual(clone.name, 'Clone')
+        self.assertEqual(clone.owner_user_id, self.user.id)
+        self.assertNotEqual(clone.cdh_id, self.project.cdh_id)
+        decisions = models.ProjectSkuDecision.query.filter_by(project_id=clone.id).all()
+        self.assertEqual(sorted(decision.comment for decision in decisions), ['decision0', 'decision1', 'decision2'])
+        for decision in decisions:
+            self.assertNotIn(decision.branch_sku_id, [original.branch_sku_id for original in self.decisions])
+            self.assertEqual(decision.branch_sku.cdh_id, clone.cdh_id)
+            self.assertEqual(decision.branch_sku.branch.cdh_id, clone.cdh_id)
+        self.assertEqual(models.TaskState.query.filter_by(project_id=clone.id).count(), 1)
+
+    def test_clone_has_its_own_cdh_items(self):
+        clone_id = json.loads(self.clone().get_data(as_text=True))['id']
+        clone = models.Project.query.get(clone_id)
+
+        cdh_items = models.CdhItem.query.filter_by(cdh_id=clone.cdh_id).all()
+        self.assertEqual(len(cdh_items), 2)
+        cdh_item_ids = {cdh_item.id for cdh_item in cdh_items}
+        cdh_item_skus = models.CdhItemSku.query.filter(models.CdhItemSku.cdh_item_id.in_(cdh_item_ids)).all()
+        self.assertEqual(len(cdh_item_skus), 4)
+        for member in models.CdhItemMember.query.filter_by(project_id=clone_id):
+            self.assertTrue(member.cdh_item_id in cdh_item_ids or
+                            member.cdh_item_sku_id in {cdh_item_sku.id for cdh_item_sku in cdh_item_skus},
+                            'the clone\'s memberships reference its own CDH items')
+            self.assertEqual(member.branch.cdh_id, clone.cdh_id)
+
+    def test_clone_has_the_same_cdh_tree(self):
+        clone_id = json.loads(self.clone().get_data(as_text=True))['id']
+        self.assertEqual(self.get_cdh_tree(clone_id), self.get_cdh_tree(self.project.id))
+
+    def get_cdh_tree(self, project_id):
+        """
+        :return: the project's CDH tree without the node IDs, which differ between a project and its clone
+        """
+        def without_ids(node):
+            node = {key: value for key, value in node.items() if key != 'id' and not key.endswith('_id')}
+            node['children'] = sorted((without_ids(child) for child in node.get('children', [])),
+                                      key=lambda child: json.dumps(child, sort_keys=True))
+            return node
+
+        with app.test_client() as client:
+            resp = client.get('/api/projects/{}/cdh_tree'.format(project_id), headers={ATN_HEADER: self.user.email})
+        self.assertEqual(resp.status_code, 200)
+        items = [without_ids(item) for item in json.loads(resp.get_data(as_text=True))['items']]
+        self.assertTrue(items)
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+
+    def test_retries_with_the_same_idempotency_key_return_the_first_clone(self):
+        first = json.loads(self.clone(idempotency_key='key1').get_data(as_text=True))
+        second = json.loads(self.clone(idempotency_key='key1').get_data(as_text=True))
+        third = json.loads(self.clone(idempotency_key='key2').get_data(as_text=True))
+
+        self.assertEqual(second['id'], first['id'])
+        self.assertNotEqual(third['id'], first['id'])
+        self.assertEqual(models.Project.query.filter_by(name='Clone').count(), 2)
+
+    def test_cloning_a_missing_project_is_not_found(self):
+        with app.test_client() as client:
+            resp = client.post('/api/projects/0/clone', data=json.dumps({'name': 'Clone'}),
+                               headers={ATN_HEADER: self.user.email})
+        self.assertEqual(resp.status_code, 404)
@@ -0,0 +1,56 @@
+import json
+
+from app import app
+from util.access_util import ATN_HEADER
+from util.factories import ProjectFty, ProjectSkuDecisionFty, UserFty
+from util.test_base import TestBase
+
+
+class BulkDecisionUpdateTestCase(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.owner_user = UserFty(name='owner1', email='owner1@sainsburys.co.uk')
+        self.project = ProjectFty(owner_user=self.owner_user)
+        self.decisions = [ProjectSkuDecisionFty(project=self.project, comment='old') for _ in range(3)]
+        self.other_decision = ProjectSkuDecisionFty()
+        self.session.commit()
+
+    def patch_decisions(self, decisions):
+        with app.test_client() as client:
+            return client.patch('/api/projects/{}/decisions'.format(self.project.id),
+                                data=json.dumps({'decisions': decisions}),
+                                headers={ATN_HEADER: self.owner_user.email})
+
+    def test_updates_only_the_given_fields(self):
+        first, second, third = self.decisions
+        resp = self.patch_decisions([
+            {'id': first.id, 'comment': 'new', 'is_active_choice': True},
+            {'id': second.id, 'is_active_choice': True},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        updated = json.loads(resp.get_data(as_text=True))
+        self.assertEqual([decision['id'] for decision in updated], [first.id, second.id])
+
+        self.session.expire_all()
+        self.assertEqual((first.comment, first.is_active_choice), ('new', True))
+        self.assertEqual((second.comment, second.is_active_choice), ('old', True))
+        self.assertEqual((third.comment, third.is_active_choice), ('old', False))
+
+    def test_nothing_is_updated_if_a_decision_is_not_the_projects(self):
+        resp = self.patch_decisions([
+            {'id': self.decisions[0].id, 'comment': 'new'},
+            {'id': self.other_decision.id, 'comment': 'new'},
+        ])
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(json.loads(resp.get_data(as_text=True))['decision_ids'], [self.other_decision.id])
+
+        self.session.expire_all()
+        self.assertEqual(self.decisions[0].comment, 'old')
+
+    def test_invalid_updates_are_rejected(self):
+        self.assertEqual(self.patch_decisions([]).status_code, 422)
+        self.assertEqual(self.patch_decisions([{'comment': 'no id'}]).status_code, 422)
+        self.assertEqual(self.patch_decisions([{'id': self.decisions[0].id, 'is_active_choice': 'maybe'}])
+                         .status_code, 422)
+        self.assertEqual(self.patch_decisions([{'id': self.decisions[0].id}, {'id': self.decisions[0].id}])
+                         .status_code, 422)
@@ -0,0 +1,32 @@
+from app import app
+from util.access_util import ATN_HEADER
+from util.factories import ProjectFty, UserFty
+from util.job_util import job_queue
+from util.test_base import TestBase
+
+
+@job_queue.job('test_noop')
+def noop_job(progress, project_id):
+    return {'project_id': project_id}
+
+
+class GetJobTestCase(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.useTemporaryJobQueue()
+        self.owner_user = UserFty(name='owner1', email='owner1@sainsburys.co.uk')
+        self.other_user = UserFty(name='other1', email='other1@sainsburys.co.uk')
+        self.project = ProjectFty(owner_user=self.owner_user)
+        self.session.commit()
+        self.job_id = job_queue.enqueue('test_noop', project_id=self.project.id)
+
+    def get_job(self, user):
+        with app.test_client() as client:
+            return client.get('/api/jobs/{}'.format(self.job_id), headers={ATN_HEADER: user.email})
+
+    def test_owner_can_get_the_job(self):
+        resp = self.get_job(self.owner_user)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_other_users_cant_get_the_job(self):
+        self.assertEqual(self.get_job(self.other_user).status_code, 403)
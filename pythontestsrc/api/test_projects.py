@@ -0,0 +1,87 @@
+"""
+Tests of the project list, GET /api/main, streamed and paged.
+"""
+
+import json
+from unittest import mock
+
+from app import app
+from util.factories import ProjectFty, TaskStateFty, UserFty
+from util.test_base import TestBase
+
+NUM_PROJECTS = 5
+TASKS_PER_PROJECT = 3
+
+
+class GetProjectsTestCase(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.owner_user = UserFty(name='owner1', email='owner1@sainsburys.co.uk')
+        self.projects = [ProjectFty(owner_user=self.owner_user) for _ in range(NUM_PROJECTS)]
+        for project in self.projects:
+            for _ in range(TASKS_PER_PROJECT):
+                TaskStateFty(project=project)
+        self.session.commit()
+
+    def get(self, url):
+        with app.test_client() as client:
+            resp = client.get(url, headers={'X-Forwarded-Email': self.owner_user.email})
+        self.assertEqual(resp.status_code, 200)
+        return resp
+
+    def get_projects(self, query_string=''):
+        return json.loads(self.get('/api/main?owner_user_id={}{}'.format(self.owner_user.id, query_string))
+                          .get_data(as_text=True))
+
+    def test_streamed_list_matches_the_list(self):
+        expected = self.get_projects()
+        self.assertEqual(len(expected), NUM_PROJECTS)
+        for chunk_size in (1, 2, NUM_PROJECTS, NUM_PROJECTS + 1):
+            with mock.patch('util.api_util.STREAM_CHUNK_SIZE', chunk_size):
+                self.assertEqual(self.get_projects('&stream=true'), expected,
+                                 'streamed in chunks of {}'.format(chunk_size))
+
+    def test_streamed_empty_list(self):
+        with mock.patch('util.api_util.STREAM_CHUNK_SIZE', 2):
+            resp = self.get('/api/main?owner_user_id={}&stream=true'.format(self.owner_user.id + 1000))
+        self.assertEqual(resp.get_data(as_text=True), '[]')
+
+    def get_page(self, limit, after=None):
+        """
+        :return: (projects, X-Next-Cursor header or None)
+        """
+        url = '/api/main?owner_user_id={}&limit={}'.format(self.owner_user.id, limit)
+        if after is not None:
+            url += '&after={}'.format(after)
+        resp = self.get(url)
+        return json.loads(resp.get_data(as_text=True)), resp.headers.get('X-Next-Cursor')
+
+    def test_page_size_is_capped(self):
+        with mock.patch('api.main.MAX_PAGE_SIZE', 2):
+            page, next_cursor = self.get_page(limit=NUM_PROJECTS)
+        self.assertEqual([project['id'] for project in page], sorted(p.id for p in self.projects)[:2])
+        self.assertEqual(next_cursor, str(page[-1]['id']))
+
+    def test_walking_all_pages(self):
+        expected = self.get_projects()
+        for limit in (1, 2, NUM_PROJECTS - 1):
+            projects, pages, after = [], 0, None
+            while True:
+                page, next_cursor = self.get_page(limit, after)
+                pages += 1
+                self.assertLessEqual(len(page), limit)
+                for project in page:
+                    self.assertEqual(len(project['task_state']), TASKS_PER_PROJECT,
+                                     'the task states of a project are never split between pages')
+                projects += page
+                if next_cursor is None:
+                    break
+                self.assertEqual(next_cursor, str(page[-1]['id']))
+                after = next_cursor
+            self.assertEqual(projects, expected, 'every project once, in order, with pages of {}'.format(limit))
+            self.assertEqual(pages, -(-NUM_PROJECTS // limit))
+
+    def test_last_page_has_no_cursor(self):
+        page, next_cursor = self.get_page(limit=NUM_PROJECTS)
+        self.assertEqual(len(page), NUM_PROJECTS)
+        self.assertIsNone(next_cursor)
@@ -0,0 +1,77 @@
+"""
+Guard against N+1 queries: each endpoint must execute the same number of queries whatever the size of the project,
+and no more than its baseline in query_counts.json. The first run against the test database records the baseline of
+an endpoint without one, commit query_counts.json afterwards. Record lower baselines with
+QUERY_BASELINE_UPDATE=1 pytest api/test_query_counts.py.
+"""
+
+from app import app
+from util.access_util import invalidate_user_cache
+from util.factories import BranchFty, BranchSkuFty, CdhItemFty, CdhItemMemberFty, CdhItemSkuFty, ClusterFty,\
+    ProjectFty, ProjectSkuDecisionFty, SkuFty, TaskStateFty, UserFty
+from util.response_cache import branches_cache
+from util.test_base import TestBase
+
+SMALL = 2
+LARGE = 6
+
+
+class QueryCountTestCase(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.owner_user = UserFty(name='owner1', email='owner1@sainsburys.co.uk')
+        self.projects = {size: self.make_project(size) for size in (SMALL, LARGE)}
+        self.session.commit()
+
+    def make_project(self, size):
+        """
+        :return: (project, cluster) with size branches of size SKUs each, with decisions, and size CDH items
+        """
+        project = ProjectFty(owner_user=self.owner_user)
+        cluster = ClusterFty(clustering=project.clustering)
+        for _ in range(size):
+            TaskStateFty(project=project)
+            branch = BranchFty(cdh_id=project.cdh.id)
+            cdh_item = CdhItemFty()
+            CdhItemMemberFty(project_id=project.id, cdh_item_id=cdh_item.id, branch_id=branch.id)
+            for _ in range(size):
+                sku = SkuFty()
+                CdhItemSkuFty(cdh_item_id=cdh_item.id, sku_id=sku.id)
+                branch_sku = BranchSkuFty(branch=branch, sku=sku, cdh_id=project.cdh.id)
+                ProjectSkuDecisionFty(project=project, branch_sku=branch_sku, cluster_id=cluster.id)
+        return project, cluster
+
+    def count_queries(self, url_template):
+        """
+        :return: dict of project size to the number of queries executed to GET the URL for the project of that size
+        """
+        counts = {}
+        for size, (project, cluster) in self.projects.items():
+            invalidate_user_cache()
+            branches_cache.invalidate_project(project.id)
+            with self.countQueries() as counter, app.test_client() as client:
+                resp = client.get(url_template.format(project=project, cluster=cluster),
+                                  headers={'X-Forwarded-Email': self.owner_user.email})
+            self.assertEqual(resp.status_code, 200)
+            counts[size] = counter.count
+        return counts
+
+    def assertConstantQueries(self, name, url_template):
+        counts = self.count_queries(url_template)
+        self.assertEqual(counts[LARGE], counts[SMALL],
+                         '{} executes more queries for a larger project: {}'.format(name, counts))
+        self.assertQueryBaseline(name, counts[LARGE])
+
+    def test_get_projects(self):
+        # Each project is in its own section
+        self.assertConstantQueries('get_projects', '/api/main?section_id={project.cdh.section_id}')
+
+    def test_get_project(self):
+        self.assertConstantQueries('get_project', '/api/projects/{project.id}')
+
+    def test_get_branches(self):
+        self.assertConstantQueries('get_branches', '/api/projects/{project.id}/branches?cluster={cluster.id}'
+                                                   '&num_bands=5')
+
+    def test_get_cdh_tree(self):
+        self.assertConstantQueries('get_cdh_tree', '/api/projects/{project.id}/cdh_tree')
@@ -1,4 +1,12 @@
-from app import app
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from api.swagger import SOURCE_HASH_KEY, _load_spec_artifact, source_hash
+from app import app, get_version
 from tests.test_base import TestBase
 from flask.json import JSONDecoder as FlaskJSONDecoder
 
@@ -12,3 +20,21 @@ class TestCase(TestBase):
             swagger = FlaskJSONDecoder().decode(resp.get_data(as_text=True))
             self.assertGreater(len(swagger['definitions']), 10)
             self.assertGreater(len(swagger['paths']), 10)
+
+    def test_build_swagger_spec_with_lazy_init(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spec_path = os.path.join(directory, 'swagger.json')
+            env = dict(os.environ, LAZY_INIT='1', PYTHONPATH=os.pathsep.join(sys.path))
+            subprocess.check_call([sys.executable, os.path.join(app.root_path, 'build_swagger_spec.py'), spec_path],
+                                  env=env)
+            with open(spec_path) as spec_file:
+                self.assertGreater(len(json.load(spec_file)['paths']), 10)
+
+    def test_stale_spec_artifact_is_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spec_path = os.path.join(directory, 'swagger.json')
+            with mock.patch.dict(app.config, SWAGGER_SPEC_PATH=spec_path):
+                for artifact_hash, loaded in (('stale', False), (source_hash(), True)):
+                    with open(spec_path, 'w') as spec_file:
+                        json.dump({'info': {'version': get_version(), SOURCE_HASH_KEY: artifact_hash}}, spec_file)
+                    self.assertEqual(_load_spec_artifact() is not None, loaded)
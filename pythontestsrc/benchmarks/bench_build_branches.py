@@ -0,0 +1,77 @@
+"""
+build_branches task completion: the set-based BranchSku insert against the previous per-member ORM loop, on a project
+with 50k SKUs.
+"""
+
+from benchmarks.bench_util import format_timing, record, time_call
+from services import branch_service
+from util.factories import BranchFty, CdhItemFty, CdhItemMemberFty, CdhItemSkuFty, ProjectFty, SkuFty
+from util.test_base import TestBase
+
+NUM_SKUS = 50000
+SKUS_PER_ITEM = 100
+NUM_BRANCHES = 20
+
+
+def build_branch_skus_per_member(project):
+    """
+    The implementation replaced by branch_service.build_branch_skus, kept for comparison.
+    """
+    cdh_item_branches = db.session.query(CdhItemMember).filter(CdhItemMember.project_id == project.id)
+    for cdh_item_branch in cdh_item_branches:
+        if cdh_item_branch.cdh_item_id:
+            project.map_skus_to_branches(cdh_item_branch.cdh_item_id, cdh_item_branch.branch_id)
+
+        if cdh_item_branch.cdh_item_sku_id:
+            cdh_item_sku = db.session.query(CdhItemSku).filter(
+                CdhItemSku.id == cdh_item_branch.cdh_item_sku_id).first()
+
+            db.session.add(BranchSku(
+                branch_id=cdh_item_branch.branch_id,
+                cdh_id=project.cdh_id,
+                sku_id=cdh_item_sku.sku_id
+            ))
+    db.session.flush()
+
+
+class BuildBranchesBenchmark(TestBase):
+    def setUp(self, create_all=True, factory_create=False):
+        super().setUp(create_all, factory_create)
+        project = ProjectFty()
+        objects = [project]
+        branches = [BranchFty(cdh_id=project.cdh.id) for _ in range(NUM_BRANCHES)]
+        objects.extend(branches)
+
+        # Half of the SKUs are mapped through whole CDH items, the other half one by one
+        for item_no in range(NUM_SKUS // SKUS_PER_ITEM):
+            item = CdhItemFty()
+            branch = branches[item_no % NUM_BRANCHES]
+            skus = [SkuFty() for _ in range(SKUS_PER_ITEM)]
+            item_skus = [CdhItemSkuFty(cdh_item_id=item.id, sku_id=sku.id) for sku in skus]
+            objects.append(item)
+            objects.extend(skus)
+            objects.extend(item_skus)
+            if item_no % 2:
+                objects.append(CdhItemMemberFty(project_id=project.id, branch_id=branch.id, cdh_item_id=item.id))
+            else:
+                objects.extend(CdhItemMemberFty(project_id=project.id, branch_id=branch.id,
+                                                cdh_item_sku_id=item_sku.id) for item_sku in item_skus)
+        self.session.add_all(objects)
+        self.session.commit()
+        self.project_id = project.id
+
+    def _run(self, build):
+        project = db.session.query(Project).get(self.project_id)
+        build(project)
+        self.assertEqual(db.session.query(BranchSku).filter(BranchSku.cdh_id == project.cdh_id).count(), NUM_SKUS)
+        db.session.rollback()
+
+    def test_set_based_build_is_faster(self):
+        per_member = time_call(lambda: self._run(build_branch_skus_per_member), repeat=3, warmup=1)
+        set_based = record('build_branches, {} SKUs'.format(NUM_SKUS),
+                           time_call(lambda: self._run(branch_service.build_branch_skus), repeat=3, warmup=1))
+
+        print()
+        print(format_timing('build branch SKUs, per member', per_member))
+        print(format_timing('build branch SKUs, INSERT ... SELECT', set_based))
+        self.assertLess(set_based['median'], per_member['median'])
@@ -0,0 +1,47 @@
+"""
+Seeding a 1M-row dataset with util.bulk_loader: 10k factory-built projects with their CDHs, clusterings and owners, and
+1M branch SKUs given as plain rows, loaded with COPY and with batched INSERTs.
+Needs the Postgres test database.
+"""
+
+import time
+from itertools import product
+
+from util.bulk_loader import BulkLoader
+from util.factories import BranchFty, ProjectFty, SkuFty
+from util.test_base import TestBase
+
+NUM_PROJECTS = 10000
+NUM_BRANCHES = 1000
+NUM_SKUS = 1000
+
+
+class BulkLoadBenchmark(TestBase):
+    def _seed(self, method):
+        start = time.perf_counter()
+        projects = ProjectFty.build_batch(NUM_PROJECTS)
+        cdh_id = projects[0].cdh.id
+        branches = BranchFty.build_batch(NUM_BRANCHES, cdh_id=cdh_id)
+        skus = SkuFty.build_batch(NUM_SKUS)
+        build_seconds = time.perf_counter() - start
+
+        loader = BulkLoader(self.session, method=method).add(*projects).add(*branches).add(*skus)
+        loader.add_rows(models.BranchSku, ({'id': n, 'branch_id': branch.id, 'cdh_id': cdh_id, 'sku_id': sku.id}
+                                           for n, (branch, sku) in enumerate(product(branches, skus), 1)))
+        report = loader.load()
+        self.session.commit()
+        print()
+        print('built {} projects, {} branches and {} SKUs in {:.3f} s'.format(NUM_PROJECTS, NUM_BRANCHES, NUM_SKUS,
+                                                                            build_seconds))
+        print(report)
+        return report
+
+    def test_copy(self):
+        report = self._seed('copy')
+        self.assertEqual(models.BranchSku.query.count(), NUM_BRANCHES * NUM_SKUS)
+        self.assertGreater(report.rows, NUM_BRANCHES * NUM_SKUS)
+
+    def test_insert(self):
+        report = self._seed('insert')
+        self.assertEqual(models.BranchSku.query.count(), NUM_BRANCHES * NUM_SKUS)
+        self.assertGreater(report.rows, NUM_BRANCHES * NUM_SKUS)
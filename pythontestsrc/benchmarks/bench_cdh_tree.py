@@ -0,0 +1,100 @@
+"""
+Assembly of a 100k node CDH-like tree (categories > groups > sub-groups > SKUs) from a flat list of serialized nodes:
+the single pass Tree against scanning the node list for the children of each node, and the size of a full tree
+against a diff with TreeHistory after one node changed. Needs no database.
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+from benchmarks.bench_util import format_timing, record, time_call
+from util.json_util import COMPACT_SEPARATORS, StdlibJSONBackend
+from util.tree_history import TreeHistory
+from util.tree_util import Tree
+
+NUM_NODES = 100000
+NUM_NAIVE_NODES = 5000  # The naive scan is quadratic, only time it on a small tree
+FAN_OUT = (10, 10, 10)  # Categories, groups per category, sub-groups per group, then SKUs fill up to NUM_NODES
+
+
+def make_nodes(num_nodes):
+    """
+    :return: (items, keys, parent_keys) as get_cdh_tree passes them to Tree, in random order
+    """
+    rows = []
+    level_keys = [None]
+    for level, fan_out in enumerate(FAN_OUT):
+        keys = []
+        for parent_key in level_keys:
+            for _ in range(fan_out):
+                keys.append(('level{}'.format(level), len(rows)))
+                rows.append((keys[-1], parent_key))
+        level_keys = keys
+    while len(rows) < num_nodes:
+        rows.append((('sku', len(rows)), level_keys[len(rows) % len(level_keys)]))
+    rows = rows[:num_nodes]
+    random.Random(42).shuffle(rows)
+    items = [{'node_type': key[0], 'node_id': key[1], 'name': 'Node {}'.format(key[1])} for key, _ in rows]
+    return items, [key for key, _ in rows], [parent_key for _, parent_key in rows]
+
+
+def naive_tree(items, keys, parent_keys):
+    def children_of(key):
+        return [dict(item, children=children_of(item_key))
+                for item, item_key, parent_key in zip(items, keys, parent_keys) if parent_key == key]
+    return children_of(None)
+
+
+class CdhTreeBenchmark(unittest.TestCase):
+    def test_build_tree(self):
+        items, keys, parent_keys = make_nodes(NUM_NODES)
+        backend = StdlibJSONBackend()
+
+        print()
+        print(format_timing('Tree, {} nodes'.format(NUM_NODES),
+                            record('Tree, {} nodes'.format(NUM_NODES),
+                                   time_call(lambda: Tree(items, keys, parent_keys), repeat=10, warmup=1))))
+        tree = Tree(items, keys, parent_keys)
+        self.assertEqual(len(tree), NUM_NODES)
+        print(format_timing('Tree.truncate to depth 2',
+                            time_call(lambda: tree.truncate(tree.roots, 2), repeat=10, warmup=1)))
+        print(format_timing('encode full tree',
+                            time_call(lambda: backend.dumps({'items': tree.roots}, separators=COMPACT_SEPARATORS),
+                                      repeat=5, warmup=1)))
+
+        small_items, small_keys, small_parent_keys = make_nodes(NUM_NAIVE_NODES)
+        print(format_timing('Tree, {} nodes'.format(NUM_NAIVE_NODES),
+                            time_call(lambda: Tree(small_items, small_keys, small_parent_keys), repeat=5, warmup=1)))
+        print(format_timing('naive scan, {} nodes'.format(NUM_NAIVE_NODES),
+                            time_call(lambda: naive_tree(small_items, small_keys, small_parent_keys),
+                                      repeat=3, warmup=0)))
+
+    def test_diff_against_full_tree(self):
+        items, keys, parent_keys = make_nodes(NUM_NODES)
+        backend = StdlibJSONBackend()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        history = TreeHistory('bench', os.path.join(directory.name, 'tree_history.sqlite3'))
+        revision = history.record(1, items, keys)
+        print()
+        print(format_timing('TreeHistory.is_current',
+                            time_call(lambda: history.is_current(1, revision), repeat=100, warmup=1)))
+
+        print(format_timing('TreeHistory.record, {} nodes, not stale'.format(NUM_NODES),
+                            time_call(lambda: history.record(1, items, keys), repeat=5, warmup=1)))
+
+        def record_stale():
+            history.mark_stale(1)
+            history.record(1, items, keys)
+
+        items[0] = dict(items[0], name='Renamed')
+        print(format_timing('TreeHistory.record, {} nodes, stale'.format(NUM_NODES),
+                            time_call(record_stale, repeat=5, warmup=1)))
+
+        touched = history.touched_since(1, revision)
+        changed = [item for item, key in zip(items, keys) if key in touched]
+        diff = backend.dumps({'changed': changed, 'removed': []}, separators=COMPACT_SEPARATORS)
+        full = backend.dumps({'items': Tree(items, keys, parent_keys).roots}, separators=COMPACT_SEPARATORS)
+        print('full tree {:,} bytes, diff after one change {:,} bytes'.format(len(full), len(diff)))
@@ -0,0 +1,46 @@
+"""
+Cloning a project with 100k decisions with clone_service.clone_project: one INSERT ... SELECT per table.
+Needs the Postgres test database, the fixture rows are generated server side with generate_series.
+"""
+
+from benchmarks.bench_util import format_timing, time_call
+from services import clone_service
+from util.factories import BranchFty, ProjectFty, SkuFty, UserFty
+from util.test_base import TestBase
+
+NUM_DECISIONS = 100000
+NUM_BRANCHES = 100
+
+
+class CloneProjectBenchmark(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.user = UserFty()
+        self.project = ProjectFty()
+        branches = [BranchFty(cdh_id=self.project.cdh.id) for _ in range(NUM_BRANCHES)]
+        skus = [SkuFty() for _ in range(NUM_DECISIONS // NUM_BRANCHES)]
+        self.session.commit()
+
+        branch_sku, decision = models.BranchSku.__table__, models.ProjectSkuDecision.__table__
+        self.session.execute(
+            'INSERT INTO {} (branch_id, cdh_id, sku_id) '
+            'SELECT b, :cdh_id, s FROM unnest(CAST(:branch_ids AS integer[])) AS b, '
+            'unnest(CAST(:sku_ids AS integer[])) AS s'.format(branch_sku.name),
+            {'cdh_id': self.project.cdh.id, 'branch_ids': [branch.id for branch in branches],
+             'sku_ids': [sku.id for sku in skus]})
+        self.session.execute(
+            'INSERT INTO {} (project_id, branch_sku_id, is_active_choice) SELECT :project_id, id, false FROM {}'
+            .format(decision.name, branch_sku.name),
+            {'project_id': self.project.id})
+        self.session.commit()
+
+    def test_clone_project(self):
+        clone_ids = []
+
+        def clone():
+            clone_ids.append(clone_service.clone_project(self.project.id, self.user.id, 'Clone'))
+
+        timing = time_call(clone, repeat=3, warmup=1)
+        print()
+        print(format_timing('clone_project, {} decisions'.format(NUM_DECISIONS), timing))
+        self.assertEqual(models.ProjectSkuDecision.query.filter_by(project_id=clone_ids[-1]).count(), NUM_DECISIONS)
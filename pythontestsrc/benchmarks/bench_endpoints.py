@@ -0,0 +1,66 @@
+"""
+The hot endpoints on a fixed synthetic dataset (see util.dataset_generator): login_required's user resolution, and the
+query and serialization of get_projects, get_branches and get_cdh_tree. The response cache is emptied before each
+get_branches call so that the query is timed. Needs the Postgres test database.
+"""
+
+from app import app
+from benchmarks.bench_util import format_timing, record, time_call
+from util.access_util import get_user_by_email, invalidate_user_cache
+from util.dataset_generator import DatasetSpec, generate_dataset
+from util.response_cache import branches_cache
+from util.test_base import TestBase
+
+SPEC = DatasetSpec(sections=2, projects_per_section=5, branches=20, skus_per_branch=100, clusters=4, seed=1)
+REPEAT = 20
+
+
+class EndpointsBenchmark(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.dataset = generate_dataset(self.session, SPEC)
+        self.session.commit()
+        self.project_id, cluster_ids = self.dataset.projects[0]
+        self.cluster_id = cluster_ids[0]
+        self.headers = {'X-Forwarded-Email': self.dataset.owner_email}
+
+    def time_get(self, name, url, before=None):
+        with app.test_client() as client:
+            def get():
+                if before:
+                    before()
+                resp = client.get(url, headers=self.headers)
+                self.assertEqual(resp.status_code, 200)
+                resp.get_data()
+
+            timing = record(name, time_call(get, repeat=REPEAT))
+        print(format_timing(name, timing))
+
+    def test_user_resolution(self):
+        email = self.dataset.owner_email.lower()
+        print()
+        with app.app_context():
+            def resolve_uncached():
+                invalidate_user_cache()
+                get_user_by_email(email)
+
+            print(format_timing('user resolution, uncached', record('user resolution, uncached',
+                                                                    time_call(resolve_uncached, repeat=REPEAT))))
+            print(format_timing('user resolution, cached', record('user resolution, cached',
+                                                                  time_call(lambda: get_user_by_email(email),
+                                                                            repeat=REPEAT))))
+
+    def test_get_projects(self):
+        print()
+        self.time_get('GET /api/main', '/api/main')
+        self.time_get('GET /api/main by section', '/api/main?section_id={}'.format(self.dataset.section_ids[0]))
+
+    def test_get_branches(self):
+        print()
+        self.time_get('GET branches, uncached',
+                      '/api/projects/{}/branches?cluster={}&num_bands=5'.format(self.project_id, self.cluster_id),
+                      before=lambda: branches_cache.invalidate_project(self.project_id))
+
+    def test_get_cdh_tree(self):
+        print()
+        self.time_get('GET cdh_tree', '/api/projects/{}/cdh_tree'.format(self.project_id))
@@ -0,0 +1,44 @@
+"""
+Encode throughput of the JSON backends on a get_branches-like payload: branches keyed by ID, each with SKU models.
+Needs no database.
+"""
+
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from benchmarks.bench_json_encoder import BenchSku
+from benchmarks.bench_util import format_timing, time_call
+from util.json_util import COMPACT_SEPARATORS, OrjsonJSONBackend, StdlibJSONBackend, orjson
+
+NUM_BRANCHES = 500
+SKUS_PER_BRANCH = 100
+
+
+class JSONBackendsBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.payload = {
+            branch_id: {
+                'id': branch_id,
+                'name': 'Branch{}'.format(branch_id),
+                'skus': [BenchSku(id=n, name='Sku{}'.format(n), brand='Brand{}'.format(n % 50),
+                                  sales=Decimal('1234.50') + n, margin=Decimal('0.1250'), volume=n * 3,
+                                  created_at=datetime(2017, 1, 1))
+                         for n in range(branch_id * SKUS_PER_BRANCH, (branch_id + 1) * SKUS_PER_BRANCH)]
+            }
+            for branch_id in range(NUM_BRANCHES)
+        }
+
+    def test_encode_throughput(self):
+        stdlib = StdlibJSONBackend()
+        backends = [stdlib] + ([OrjsonJSONBackend(stdlib)] if orjson is not None else [])
+
+        print()
+        for backend in backends:
+            def encode():
+                return backend.dumps(self.payload, sort_keys=True, ensure_ascii=True, separators=COMPACT_SEPARATORS)
+
+            size_mb = len(encode()) / 1e6
+            timing = time_call(encode, repeat=5, warmup=1)
+            print(format_timing('{} backend'.format(backend.name), timing) +
+                  '  {:7.1f} MB/s'.format(size_mb / timing['median']))
@@ -0,0 +1,76 @@
+"""
+AppJSONEncoder: compiled per-model serializers against the previous per-instance __dict__ filtering, on 100k model
+instances. Needs no database.
+"""
+
+import json
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from flask.json import JSONEncoder as FlaskJSONEncoder
+from flask_sqlalchemy import Model, SQLAlchemy
+
+from benchmarks.bench_util import format_timing, record, time_call
+from util.json_util import AppJSONEncoder
+
+NUM_INSTANCES = 100000
+
+bench_db = SQLAlchemy()
+
+
+class BenchSku(bench_db.Model):
+    __json_exclude__ = ['internal_note']
+
+    id = bench_db.Column(bench_db.Integer, primary_key=True)
+    name = bench_db.Column(bench_db.String)
+    brand = bench_db.Column(bench_db.String)
+    sales = bench_db.Column(bench_db.Numeric(12, 2))
+    margin = bench_db.Column(bench_db.Numeric(12, 4))
+    volume = bench_db.Column(bench_db.Integer)
+    created_at = bench_db.Column(bench_db.DateTime)
+    internal_note = bench_db.Column(bench_db.String)
+
+
+class LegacyAppJSONEncoder(FlaskJSONEncoder):
+    """
+    AppJSONEncoder before per-model serializers were compiled.
+    """
+    def default(self, o):
+        if isinstance(o, Model):
+            json_exclude = getattr(o, '__json_exclude__', None)
+            if json_exclude:
+                return {
+                    k: v for k, v in o.__dict__.items() if not k.startswith('_') and k not in json_exclude
+                }
+            else:
+                return {
+                    k: v for k, v in o.__dict__.items() if not k.startswith('_')
+                }
+        elif isinstance(o, Decimal):
+            return str(o)
+        else:
+            return super().default(o)
+
+
+class JSONEncoderBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.skus = [BenchSku(id=n, name='Sku{}'.format(n), brand='Brand{}'.format(n % 50),
+                              sales=Decimal('1234.50') + n, margin=Decimal('0.1250'), volume=n * 3,
+                              created_at=datetime(2017, 1, 1), internal_note='not exported')
+                     for n in range(NUM_INSTANCES)]
+
+    def test_compiled_encoder_is_faster(self):
+        def encode(encoder_class):
+            return json.dumps(self.skus, cls=encoder_class, sort_keys=True)
+
+        self.assertEqual(encode(AppJSONEncoder), encode(LegacyAppJSONEncoder))
+
+        legacy = time_call(lambda: encode(LegacyAppJSONEncoder), repeat=5, warmup=1)
+        compiled = record('AppJSONEncoder, {} models'.format(NUM_INSTANCES),
+                          time_call(lambda: encode(AppJSONEncoder), repeat=5, warmup=1))
+
+        print()
+        print(format_timing('encode {} models, legacy'.format(NUM_INSTANCES), legacy))
+        print(format_timing('encode {} models, compiled'.format(NUM_INSTANCES), compiled))
+        self.assertLess(compiled['median'], legacy['median'])
@@ -0,0 +1,47 @@
+"""
+Keyset pagination of GET /api/main: the latency of a deep page should be the same as the first page's.
+"""
+
+from app import app
+from benchmarks.bench_util import format_timing, time_call
+from util.factories import ProjectFty, TaskFty, TaskStateFty, UserFty
+from util.test_base import TestBase
+
+NUM_PAGES = 500
+PAGE_SIZE = 50
+NUM_TASKS = 3
+
+
+class PaginationBenchmark(TestBase):
+    def setUp(self, create_all=True, factory_create=False):
+        super().setUp(create_all, factory_create)
+        owner = UserFty(name='User1', email='user1@sainsburys.co.uk')
+        tasks = [TaskFty() for _ in range(NUM_TASKS)]
+        objects = [owner] + tasks
+        for _ in range(NUM_PAGES * PAGE_SIZE):
+            project = ProjectFty(owner_user=owner)
+            objects.append(project)
+            objects.extend(TaskStateFty(project=project, task=task) for task in tasks)
+        self.session.add_all(objects)
+        self.session.commit()
+        self.project_ids = sorted(o.id for o in objects if isinstance(o, ProjectFty._meta.model))
+
+    def test_deep_page_latency_is_flat(self):
+        last_page_cursor = self.project_ids[(NUM_PAGES - 1) * PAGE_SIZE - 1]
+
+        with app.test_client() as client:
+            def get_page(url):
+                resp = client.get(url)
+                self.assertEqual(resp.status_code, 200)
+                return resp
+
+            self.assertNotIn('X-Next-Cursor', get_page('/api/main?limit={}&after={}'.format(
+                PAGE_SIZE, last_page_cursor)).headers)
+
+            first = time_call(lambda: get_page('/api/main?limit={}'.format(PAGE_SIZE)))
+            last = time_call(lambda: get_page('/api/main?limit={}&after={}'.format(PAGE_SIZE, last_page_cursor)))
+
+        print()
+        print(format_timing('GET /api/main page 1', first))
+        print(format_timing('GET /api/main page {}'.format(NUM_PAGES), last))
+        self.assertLess(last['median'], first['median'] * 2)
@@ -0,0 +1,81 @@
+"""
+Request overhead and Cookie header size of Flask's signed cookie session against the server-side session stores, for a
+request reading an Auth0 userinfo profile from the session as server.py does. Needs no database.
+"""
+
+import os
+import tempfile
+import unittest
+
+from flask import Flask, session
+
+from benchmarks.bench_util import format_timing, record, time_call
+from util.session_store import init_session_store
+
+REPEAT = 2000
+
+# Shaped like an Auth0 userinfo profile of a Google account
+PROFILE = {
+    'sub': 'google-oauth2|104812345678901234567',
+    'email': 'user1@sainsburys.co.uk',
+    'email_verified': True,
+    'name': 'User One',
+    'given_name': 'User',
+    'family_name': 'One',
+    'nickname': 'user1',
+    'picture': 'https://lh3.googleusercontent.com/-abcdefghijk/AAAAAAAAAAI/AAAAAAAAAAA/0123456789/photo.jpg',
+    'locale': 'en-GB',
+    'updated_at': '2017-09-01T10:00:00.000Z',
+    'identities': [{'provider': 'google-oauth2', 'user_id': '104812345678901234567', 'connection': 'google-oauth2',
+                    'isSocial': True}],
+    'app_metadata': {'roles': ['range-planner', 'reviewer'], 'sections': list(range(1, 41))},
+    'user_metadata': {'preferences': {'num_bands': 5, 'default_cluster': 3, 'theme': 'light'}},
+}
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.secret_key = 'ThisIsTheSecretKey'
+    app.config.update(config)
+
+    @app.route('/login')
+    def login():
+        session['profile'] = PROFILE
+        return 'ok'
+
+    @app.route('/main')
+    def main():
+        return session['profile']['email']
+
+    init_session_store(app)
+    return app
+
+
+class SessionStoreBenchmark(unittest.TestCase):
+    def test_request_overhead_and_cookie_size(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        apps = [
+            ('cookie', make_app()),
+            ('memory', make_app(SESSION_STORE='memory')),
+            ('sqlite', make_app(SESSION_STORE='sqlite',
+                                SESSION_STORE_PATH=os.path.join(directory.name, 'sessions.sqlite3'))),
+        ]
+
+        print()
+        cookie_sizes = {}
+        for name, app in apps:
+            with app.test_client() as client:
+                cookie = client.get('/login').headers['Set-Cookie']
+                cookie_sizes[name] = len(cookie.split(';')[0])
+
+                def get_main():
+                    resp = client.get('/main')
+                    assert resp.status_code == 200
+
+                timing = record('session request, {}'.format(name), time_call(get_main, repeat=REPEAT, warmup=50))
+            print(format_timing('GET with a {} session'.format(name), timing) +
+                  '  Cookie {:5} bytes'.format(cookie_sizes[name]))
+
+        self.assertLess(cookie_sizes['memory'], cookie_sizes['cookie'])
+        self.assertLess(cookie_sizes['sqlite'], cookie_sizes['cookie'])
@@ -0,0 +1,52 @@
+"""
+Start-up time of the app: the cost of importing app.py, eagerly and with LAZY_INIT, against the cost of the Swagger
+docstring parsing deferred until /api/swagger is first requested. Each measurement runs in a fresh interpreter. Needs
+no database. For a per-package breakdown run python -m util.import_profiler from pythonsrc.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from benchmarks.bench_util import format_timing
+
+REPEAT = 5
+
+MEASURE_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.register_api_doc_paths()
+print(json.dumps({'import': imported - start, 'api_doc_paths': time.perf_counter() - imported}))
+"""
+
+
+def measure_startup(cwd, lazy=False):
+    """
+    :param cwd: directory the app is started from (pythonsrc, where its config lives)
+    :param lazy: start the app with LAZY_INIT=1
+    :return: dict of the seconds spent importing app.py and registering the Swagger paths
+    """
+    env = dict(os.environ, LAZY_INIT='1' if lazy else '0')
+    output = subprocess.check_output([sys.executable, '-c', MEASURE_SCRIPT], cwd=cwd, env=env)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+class StartupBenchmark(unittest.TestCase):
+    def test_deferred_api_doc_paths(self):
+        import app
+        cwd = os.path.dirname(os.path.abspath(app.__file__))
+        runs = [measure_startup(cwd) for _ in range(REPEAT)]
+        lazy_runs = [measure_startup(cwd, lazy=True) for _ in range(REPEAT)]
+
+        print()
+        for label, name, measured in (('eager', 'import', runs), ('lazy', 'import', lazy_runs),
+                                      ('eager', 'api_doc_paths', runs)):
+            timings = sorted(run[name] for run in measured)
+            print(format_timing('start-up, {} {}'.format(label, name), {
+                'min': timings[0], 'median': timings[len(timings) // 2], 'max': timings[-1]}))
+        print('Eager start-up would have taken the sum of both, the docstring parsing now happens on the first '
+              '/api/swagger request.')
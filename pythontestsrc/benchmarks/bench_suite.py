@@ -0,0 +1,123 @@
+"""
+Benchmark suite of the API's hot paths, with a store of past results and a regression check against a baseline.
+From pythontestsrc, with the test database configured:
+
+    PYTHONPATH=../pythonsrc:. python -m benchmarks.bench_suite run --update-baseline   # on the reference commit
+    PYTHONPATH=../pythonsrc:. python -m benchmarks.bench_suite run                     # fails on a regression
+    PYTHONPATH=../pythonsrc:. python -m benchmarks.bench_suite compare results/<run>.json --threshold 5
+
+Each run is saved to benchmarks/results/<UTC time>.json, which isn't committed. The baseline is
+benchmarks/baseline.json, commit it after updating it. The check fails when there is no baseline or a benchmark of the
+baseline is missing from the run. Timings depend on the machine, only compare runs made on the same one.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks.bench_util import RESULTS_ENV, compare, load_results
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+DEFAULT_THRESHOLD_PCT = 10
+
+# The hot paths: AppJSONEncoder, user resolution, get_projects, get_branches and get_cdh_tree, CDH tree assembly and
+# build_branches
+SUITE = ('bench_json_encoder.py', 'bench_endpoints.py', 'bench_cdh_tree.py', 'bench_build_branches.py')
+
+
+def run_suite(results_path, benchmarks=SUITE):
+    """
+    Run the benchmarks with pytest, saving their recorded timings to results_path.
+    :return: pytest's exit code
+    """
+    if os.path.exists(results_path):
+        os.remove(results_path)
+    env = dict(os.environ, **{RESULTS_ENV: results_path})
+    return subprocess.call([sys.executable, '-m', 'pytest', '-s', '-q'] +
+                           [os.path.join(BENCHMARKS_DIR, benchmark) for benchmark in benchmarks],
+                           cwd=os.path.dirname(BENCHMARKS_DIR), env=env)
+
+
+def latest_results_path():
+    runs = sorted(name for name in os.listdir(RESULTS_DIR) if name.endswith('.json')) if os.path.isdir(RESULTS_DIR) \
+        else []
+    if not runs:
+        raise SystemExit('No results in {}, run the suite first'.format(RESULTS_DIR))
+    return os.path.join(RESULTS_DIR, runs[-1])
+
+
+def format_comparison(comparisons, threshold_pct):
+    lines = ['{:<50} {:>12} {:>12} {:>9}'.format('benchmark', 'baseline ms', 'current ms', 'change')]
+    for name, before, after, change_pct, regressed in comparisons:
+        lines.append('{:<50} {:>12.3f} {:>12.3f} {:>+8.1f}%{}'.format(
+            name, before * 1000, after * 1000, change_pct, '  REGRESSED' if regressed else ''))
+    regressions = sum(1 for comparison in comparisons if comparison[-1])
+    lines.append('{} of {} benchmarks regressed by more than {}%'.format(regressions, len(comparisons), threshold_pct))
+    return '\n'.join(lines)
+
+
+def check(results_path, baseline_path, threshold_pct):
+    """
+    Print the comparison of a run with the baseline.
+    :return: 1 if there is no baseline, a benchmark of the baseline is missing from the run or regressed, else 0
+    """
+    if not os.path.exists(baseline_path):
+        print('No baseline at {}, record one with run --update-baseline'.format(baseline_path))
+        return 1
+    baseline, results = load_results(baseline_path), load_results(results_path)
+    comparisons = compare(baseline, results, threshold_pct)
+    print(format_comparison(comparisons, threshold_pct))
+    missing = sorted(set(baseline) - set(results))
+    for name in missing:
+        print('{} is in the baseline but wasn\'t run'.format(name))
+    for name in sorted(set(results) - set(baseline)):
+        print('{} has no baseline yet'.format(name))
+    return 1 if missing or any(comparison[-1] for comparison in comparisons) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the benchmark suite and compare its results with a baseline.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='run the suite, save its results and compare them')
+    run_parser.add_argument('--benchmarks', nargs='+', default=list(SUITE), help='bench_*.py files to run')
+    run_parser.add_argument('--update-baseline', action='store_true', help='save the results as the new baseline')
+
+    compare_parser = subparsers.add_parser('compare', help='compare saved results with the baseline')
+    compare_parser.add_argument('results', nargs='?', help='results file, default the latest run')
+
+    for subparser in (run_parser, compare_parser):
+        subparser.add_argument('--baseline', default=BASELINE_PATH, help='baseline results file')
+        subparser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD_PCT,
+                               help='slow-down of the median in percent flagged as a regression, default {}'.format(
+                                   DEFAULT_THRESHOLD_PCT))
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        results_path = os.path.join(RESULTS_DIR, datetime.utcnow().strftime('%Y%m%dT%H%M%S') + '.json')
+        exit_code = run_suite(results_path, args.benchmarks)
+        if exit_code or not os.path.exists(results_path):
+            print('The benchmarks failed')
+            return exit_code or 1
+        print('Results saved to {}'.format(results_path))
+        if args.update_baseline:
+            shutil.copyfile(results_path, args.baseline)
+            print('Baseline updated')
+            return 0
+        return check(results_path, args.baseline, args.threshold)
+
+    if args.command == 'compare':
+        return check(args.results or latest_results_path(), args.baseline, args.threshold)
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
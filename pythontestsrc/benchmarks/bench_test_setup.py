@@ -0,0 +1,32 @@
+"""
+Per-test database setup cost of TestBase: recreating the schema before each test against rolling back a transaction.
+Needs the Postgres test database.
+"""
+
+import unittest
+
+from benchmarks.bench_util import format_timing, time_call
+from util.test_base import TestBase
+
+
+class SetupCycle(TestBase):
+    def runTest(self):
+        pass
+
+
+def setup_cycle():
+    test = SetupCycle()
+    test.setUp()
+    test.doCleanups()
+
+
+class TestSetupBenchmark(unittest.TestCase):
+    def test_setup_per_isolation(self):
+        isolation = SetupCycle.TEST_DB_ISOLATION
+        print()
+        try:
+            for SetupCycle.TEST_DB_ISOLATION in ('schema', 'transaction'):
+                print(format_timing('TestBase set-up, {} isolation'.format(SetupCycle.TEST_DB_ISOLATION),
+                                    time_call(setup_cycle, repeat=10, warmup=1)))
+        finally:
+            SetupCycle.TEST_DB_ISOLATION = isolation
@@ -0,0 +1,79 @@
+"""
+Timing helpers shared by the benchmarks.
+Benchmarks are TestBase test cases in bench_*.py files, so the normal test run skips them. Run one explicitly with e.g.
+pytest -s benchmarks/bench_pagination.py
+The timings passed to record() are saved to the JSON file named by the BENCH_RESULTS environment variable, see
+benchmarks/bench_suite.py to run the suite and compare its results against a baseline.
+"""
+
+import json
+import os
+import statistics
+import time
+
+RESULTS_ENV = 'BENCH_RESULTS'
+
+
+def time_call(fn, repeat=20, warmup=3):
+    """
+    Time repeated calls of fn after a few untimed warm-up calls.
+    :return: dict of min, median, mean and max seconds per call
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+        'repeat': repeat,
+    }
+
+
+def format_timing(name, timing):
+    return '{:<40} median {:9.3f} ms  min {:9.3f} ms  max {:9.3f} ms'.format(
+        name, timing['median'] * 1000, timing['min'] * 1000, timing['max'] * 1000)
+
+
+def record(name, timing):
+    """
+    Save a timing under a name, unique across the suite, to the BENCH_RESULTS file if set.
+    :return: timing
+    """
+    path = os.getenv(RESULTS_ENV)
+    if path:
+        results = load_results(path) if os.path.exists(path) else {}
+        results[name] = timing
+        with open(path, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+    return timing
+
+
+def load_results(path):
+    """
+    :return: dict of benchmark name to timing
+    """
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def compare(baseline, current, threshold_pct):
+    """
+    Compare the median of each benchmark to its baseline.
+    :param baseline: dict of benchmark name to timing
+    :param current: dict of benchmark name to timing
+    :param threshold_pct: slow-down, in percent of the baseline median, over which a benchmark has regressed
+    :return: list of (name, baseline median, current median, change in percent, regressed) of the benchmarks in both,
+    by name
+    """
+    comparisons = []
+    for name in sorted(set(baseline) & set(current)):
+        before, after = baseline[name]['median'], current[name]['median']
+        change_pct = (after - before) / before * 100 if before else 0.0
+        comparisons.append((name, before, after, change_pct, change_pct > threshold_pct))
+    return comparisons
@@ -0,0 +1,344 @@
+"""
+Load test of the range planning API on a synthetic dataset (see util.dataset_generator).
+Requests to /api/main, /api/projects/<id>/branches and /api/projects/<id>/cdh_tree are sent by concurrent threads,
+either through the app's WSGI interface in this process or to a running server, and the latency percentiles,
+throughput and peak RSS of each endpoint are printed and saved as JSON, e.g. from pythontestsrc:
+
+    PYTHONPATH=../pythonsrc:. python -m benchmarks.load_harness --recreate-schema --projects-per-section 20 \\
+        --concurrency 8 --output results.json --compare previous.json
+
+Generating the dataset drops and recreates the test schema, so it is only done with --recreate-schema: point the app's
+config at a disposable database. The IDs of the generated dataset are saved to the --dataset file, later runs without
+--recreate-schema reuse that dataset.
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import sys
+import threading
+import time
+from datetime import datetime
+
+ENDPOINTS = ('projects', 'branches', 'cdh_tree')
+DEFAULT_DATASET_PATH = 'load_dataset.json'
+NUM_BANDS = 5
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile.
+    :param sorted_values: non-empty sorted list
+    :param pct: 0 to 100
+    """
+    rank = max(1, int(math.ceil(pct / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarise(latencies, errors, cache_hits, seconds, peak_rss_kb, exceptions=None):
+    """
+    :param latencies: seconds taken by each request
+    :param errors: number of requests that failed or didn't return a 2xx/304
+    :param cache_hits: number of responses served by the response cache (X-Cache: HIT)
+    :param seconds: wall time of the run
+    :param peak_rss_kb: peak resident set size of the server process, None if unknown
+    :param exceptions: dict of each exception raised by the requests, as 'ExceptionType: message', to its count
+    :return: dict of the endpoint's results
+    """
+    latencies = sorted(latencies)
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'cache_hits': cache_hits,
+        'seconds': seconds,
+        'throughput': len(latencies) / seconds if seconds else 0.0,
+        'peak_rss_kb': peak_rss_kb,
+        'exceptions': dict(exceptions or {}),
+    }
+    if latencies:
+        result['latency_ms'] = {
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'mean': sum(latencies) / len(latencies) * 1000,
+            'max': latencies[-1] * 1000,
+        }
+    return result
+
+
+def peak_rss_kb(pid=None):
+    """
+    :param pid: process ID, this process if None
+    :return: peak resident set size in kB, None if it can't be read
+    """
+    try:
+        with open('/proc/{}/status'.format(pid or 'self')) as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # kB on Linux
+    return None
+
+
+def reset_peak_rss(pid=None):
+    """
+    Reset the peak RSS so that the next endpoint's is measured on its own, Linux only.
+    """
+    try:
+        with open('/proc/{}/clear_refs'.format(pid or 'self'), 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def endpoint_urls(dataset, endpoint):
+    """
+    :return: list of the URLs requested for an endpoint, cycling through the dataset's sections or projects
+    """
+    if endpoint == 'projects':
+        return ['/api/main?section_id={}'.format(section_id) for section_id in dataset.section_ids]
+    if endpoint == 'branches':
+        return ['/api/projects/{}/branches?cluster={}&num_bands={}'.format(project_id, cluster_id, NUM_BANDS)
+                for project_id, cluster_ids in dataset.projects for cluster_id in cluster_ids]
+    if endpoint == 'cdh_tree':
+        return ['/api/projects/{}/cdh_tree'.format(project_id) for project_id, _ in dataset.projects]
+    raise ValueError('Unknown endpoint {}'.format(endpoint))
+
+
+class WsgiTarget:
+    """
+    Sends requests through the app's WSGI interface in this process, one test client per thread.
+    """
+
+    name = 'wsgi'
+    pid = None
+
+    def __init__(self, app, email):
+        self.app = app
+        self.headers = {'X-Forwarded-Email': email}
+        self._local = threading.local()
+
+    def get(self, url):
+        """
+        :return: (status code, X-Cache header)
+        """
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        resp = client.get(url, headers=self.headers)
+        resp.get_data()
+        return resp.status_code, resp.headers.get('X-Cache')
+
+
+class HttpTarget:
+    """
+    Sends requests to a running server, one HTTP session per thread.
+    """
+
+    name = 'http'
+
+    def __init__(self, base_url, email, pid=None):
+        """
+        :param pid: the server's process ID, to read its peak RSS when it runs on this machine
+        """
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'X-Forwarded-Email': email}
+        self.pid = pid
+        self._local = threading.local()
+
+    def get(self, url):
+        import requests
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        resp = session.get(self.base_url + url, headers=self.headers)
+        return resp.status_code, resp.headers.get('X-Cache')
+
+
+def run_endpoint(target, urls, num_requests, concurrency, warmup=0):
+    """
+    Send num_requests GETs, cycling through the URLs, from concurrency threads.
+    :return: summarise() dict
+    """
+    for n in range(warmup):
+        target.get(urls[n % len(urls)])
+
+    latencies, counters, exceptions = [], {'next': 0, 'errors': 0, 'cache_hits': 0}, {}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                n = counters['next']
+                if n >= num_requests:
+                    return
+                counters['next'] += 1
+            start = time.perf_counter()
+            try:
+                status, cache_status = target.get(urls[n % len(urls)])
+            except Exception as e:
+                status, cache_status = None, None
+                exception = '{}: {}'.format(type(e).__name__, e)
+                with lock:
+                    exceptions[exception] = exceptions.get(exception, 0) + 1
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status is None or not (200 <= status < 300 or status == 304):
+                    counters['errors'] += 1
+                if cache_status == 'HIT':
+                    counters['cache_hits'] += 1
+
+    reset_peak_rss(target.pid)
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return summarise(latencies, counters['errors'], counters['cache_hits'], seconds, peak_rss_kb(target.pid),
+                     exceptions)
+
+
+def format_results(results):
+    lines = ['{:<10} {:>8} {:>6} {:>10} {:>10} {:>10} {:>10} {:>12}'.format(
+        'endpoint', 'requests', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'peak RSS MB')]
+    for endpoint, result in results['endpoints'].items():
+        latency = result.get('latency_ms', {})
+        lines.append('{:<10} {:>8} {:>6} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>12}'.format(
+            endpoint, result['requests'], result['errors'], latency.get('p50', 0), latency.get('p95', 0),
+            latency.get('p99', 0), result['throughput'],
+            '{:.1f}'.format(result['peak_rss_kb'] / 1024) if result['peak_rss_kb'] else '-'))
+    for endpoint, result in results['endpoints'].items():
+        for exception, n in sorted(result.get('exceptions', {}).items()):
+            lines.append('{} raised {} x {}'.format(endpoint, n, exception))
+    return '\n'.join(lines)
+
+
+def compare_results(previous, current):
+    """
+    :return: lines of the change of each endpoint's p50, p95, p99 and throughput since a previous run
+    """
+    lines = []
+    for endpoint, result in current['endpoints'].items():
+        before = previous['endpoints'].get(endpoint)
+        if not before or 'latency_ms' not in before or 'latency_ms' not in result:
+            continue
+        changes = ['{} {:+.1f}%'.format(name, _change(before['latency_ms'][name], result['latency_ms'][name]))
+                   for name in ('p50', 'p95', 'p99')]
+        changes.append('req/s {:+.1f}%'.format(_change(before['throughput'], result['throughput'])))
+        lines.append('{:<10} {}'.format(endpoint, '  '.join(changes)))
+    return lines
+
+
+def _change(before, after):
+    return (after - before) / before * 100 if before else 0.0
+
+
+def generate(spec):
+    """
+    Drop and recreate the test schema and load a dataset in it.
+    :return: Dataset
+    """
+    from util.dataset_generator import generate_dataset
+    from util.test_base import recreate_schema, scoped_session
+    recreate_schema()
+    dataset = generate_dataset(scoped_session, spec)
+    scoped_session.commit()
+    scoped_session.remove()
+    return dataset
+
+
+def save_dataset(dataset, path):
+    """
+    Save the IDs of a generated dataset, for later runs to reuse it.
+    """
+    with open(path, 'w') as dataset_file:
+        json.dump({'spec': dataset.spec.to_dict(), 'owner_email': dataset.owner_email,
+                   'section_ids': dataset.section_ids, 'projects': dataset.projects}, dataset_file, indent=2)
+
+
+def load_dataset(path):
+    """
+    :return: Dataset saved by save_dataset
+    """
+    from util.dataset_generator import Dataset, DatasetSpec
+    with open(path) as dataset_file:
+        saved = json.load(dataset_file)
+    dataset = Dataset(DatasetSpec(**saved['spec']), saved['owner_email'])
+    dataset.section_ids = saved['section_ids']
+    dataset.projects = [(project_id, cluster_ids) for project_id, cluster_ids in saved['projects']]
+    return dataset
+
+
+def main(argv=None):
+    from util.dataset_generator import DatasetSpec
+    defaults = DatasetSpec()
+    parser = argparse.ArgumentParser(description='Load test the range planning API on a synthetic dataset.')
+    for name, value in sorted(defaults.to_dict().items()):
+        parser.add_argument('--' + name.replace('_', '-'), type=type(value), default=value,
+                            help='dataset {}, default {}'.format(name.replace('_', ' '), value))
+    parser.add_argument('--recreate-schema', action='store_true',
+                        help='drop and recreate the test schema and generate a new dataset in it')
+    parser.add_argument('--dataset', default=DEFAULT_DATASET_PATH,
+                        help='file of the IDs of the generated dataset, reused when --recreate-schema is not given, '
+                             'default {}'.format(DEFAULT_DATASET_PATH))
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint, default 500')
+    parser.add_argument('--concurrency', type=int, default=4, help='number of client threads, default 4')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per endpoint, default 10')
+    parser.add_argument('--url', help='base URL of a running server, default the app in this process')
+    parser.add_argument('--server-pid', type=int, help='process ID of the server at --url, to read its peak RSS')
+    parser.add_argument('--output', help='file to save the JSON results to')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    args = parser.parse_args(argv)
+
+    if args.recreate_schema:
+        spec = DatasetSpec(**{name: getattr(args, name) for name in defaults.to_dict()})
+        start = time.perf_counter()
+        dataset = generate(spec)
+        save_dataset(dataset, args.dataset)
+        print('Generated {} rows in {:.1f} s'.format(dataset.report.rows, time.perf_counter() - start))
+    elif os.path.exists(args.dataset):
+        dataset = load_dataset(args.dataset)
+        print('Reusing the dataset of {}'.format(args.dataset))
+    else:
+        parser.error('no dataset at {}, generate one with --recreate-schema, which drops the test schema'.format(
+            args.dataset))
+
+    if args.url:
+        target = HttpTarget(args.url, dataset.owner_email, args.server_pid)
+    else:
+        from app import app
+        target = WsgiTarget(app, dataset.owner_email)
+
+    results = {
+        'started_at': datetime.utcnow().isoformat(),
+        'target': args.url or target.name,
+        'concurrency': args.concurrency,
+        'dataset': dataset.to_dict(),
+        'endpoints': {},
+    }
+    for endpoint in args.endpoints:
+        results['endpoints'][endpoint] = run_endpoint(target, endpoint_urls(dataset, endpoint), args.requests,
+                                                      args.concurrency, args.warmup)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare) as previous:
+            print('\nChange since {}:'.format(args.compare))
+            print('\n'.join(compare_results(json.load(previous), results)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from benchmarks.bench_suite import check
+from benchmarks.bench_util import RESULTS_ENV, compare, load_results, record
+
+
+def timing(median):
+    return {'min': median, 'median': median, 'mean': median, 'max': median, 'repeat': 1}
+
+
+class BenchUtilTestCase(unittest.TestCase):
+    def test_record_merges_into_the_results_file(self):
+        with tempfile.TemporaryDirectory() as results_dir:
+            path = os.path.join(results_dir, 'results.json')
+            with mock.patch.dict(os.environ, {RESULTS_ENV: path}):
+                record('first', timing(0.1))
+                self.assertEqual(record('second', timing(0.2)), timing(0.2))
+
+            self.assertEqual(load_results(path), {'first': timing(0.1), 'second': timing(0.2)})
+
+    def test_record_without_results_file(self):
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual(record('first', timing(0.1)), timing(0.1))
+
+    def test_compare(self):
+        baseline = {'faster': timing(0.2), 'slower': timing(0.1), 'within': timing(0.1), 'removed': timing(0.1)}
+        current = {'faster': timing(0.1), 'slower': timing(0.125), 'within': timing(0.105), 'added': timing(0.1)}
+
+        comparisons = {name: (change_pct, regressed)
+                       for name, _, _, change_pct, regressed in compare(baseline, current, 10)}
+
+        self.assertEqual(sorted(comparisons), ['faster', 'slower', 'within'])
+        self.assertAlmostEqual(comparisons['faster'][0], -50)
+        self.assertFalse(comparisons['faster'][1])
+        self.assertAlmostEqual(comparisons['slower'][0], 25)
+        self.assertTrue(comparisons['slower'][1])
+        self.assertFalse(comparisons['within'][1])
+
+
+class CheckTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.baseline_path = os.path.join(self.directory.name, 'baseline.json')
+        self.results_path = os.path.join(self.directory.name, 'results.json')
+
+    def check(self, baseline, results):
+        for path, timings in ((self.baseline_path, baseline), (self.results_path, results)):
+            if timings is not None:
+                with open(path, 'w') as results_file:
+                    json.dump(timings, results_file)
+        with redirect_stdout(io.StringIO()):
+            return check(self.results_path, self.baseline_path, 10)
+
+    def test_passes_without_regressions(self):
+        self.assertEqual(self.check({'a': timing(0.1)}, {'a': timing(0.1), 'added': timing(0.1)}), 0)
+
+    def test_fails_on_a_regression(self):
+        self.assertEqual(self.check({'a': timing(0.1)}, {'a': timing(0.2)}), 1)
+
+    def test_fails_without_a_baseline(self):
+        self.assertEqual(self.check(None, {'a': timing(0.1)}), 1)
+
+    def test_fails_on_a_missing_benchmark(self):
+        self.assertEqual(self.check({'a': timing(0.1), 'removed': timing(0.1)}, {'a': timing(0.1)}), 1)
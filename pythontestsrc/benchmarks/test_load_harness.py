@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from benchmarks.load_harness import compare_results, endpoint_urls, load_dataset, percentile, run_endpoint, \
+    save_dataset, summarise
+
+
+class FakeTarget:
+    pid = None
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+        if url.endswith('fail'):
+            return 500, None
+        if url.endswith('raise'):
+            raise ConnectionError('refused')
+        return 200, 'HIT' if url.endswith('cached') else 'MISS'
+
+
+class LoadHarnessTestCase(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_summarise(self):
+        result = summarise([0.003, 0.001, 0.002, 0.004], 1, 2, 2.0, 1024)
+
+        self.assertEqual(result['requests'], 4)
+        self.assertEqual(result['throughput'], 2.0)
+        self.assertAlmostEqual(result['latency_ms']['p50'], 2.0)
+        self.assertAlmostEqual(result['latency_ms']['p99'], 4.0)
+        self.assertAlmostEqual(result['latency_ms']['mean'], 2.5)
+        self.assertEqual((result['errors'], result['cache_hits'], result['peak_rss_kb']), (1, 2, 1024))
+
+    def test_endpoint_urls(self):
+        dataset = SimpleNamespace(section_ids=[1], projects=[(10, [3, 4])])
+
+        self.assertEqual(endpoint_urls(dataset, 'projects'), ['/api/main?section_id=1'])
+        self.assertEqual(endpoint_urls(dataset, 'branches'), ['/api/projects/10/branches?cluster=3&num_bands=5',
+                                                              '/api/projects/10/branches?cluster=4&num_bands=5'])
+        self.assertEqual(endpoint_urls(dataset, 'cdh_tree'), ['/api/projects/10/cdh_tree'])
+        with self.assertRaises(ValueError):
+            endpoint_urls(dataset, 'other')
+
+    def test_run_endpoint(self):
+        target = FakeTarget()
+        result = run_endpoint(target, ['/ok', '/cached', '/fail'], 30, 4, warmup=3)
+
+        self.assertEqual(len(target.urls), 33)
+        self.assertEqual(result['requests'], 30)
+        self.assertEqual(result['errors'], 10)
+        self.assertEqual(result['cache_hits'], 10)
+        self.assertIn('p95', result['latency_ms'])
+        self.assertEqual(result['exceptions'], {})
+
+    def test_run_endpoint_records_exceptions(self):
+        result = run_endpoint(FakeTarget(), ['/ok', '/raise'], 10, 2)
+
+        self.assertEqual(result['errors'], 5)
+        self.assertEqual(result['exceptions'], {'ConnectionError: refused': 5})
+
+    def test_saved_dataset_is_reused(self):
+        from util.dataset_generator import Dataset, DatasetSpec
+        dataset = Dataset(DatasetSpec(sections=1), 'owner1@sainsburys.co.uk')
+        dataset.section_ids = [1]
+        dataset.projects = [(10, [3, 4])]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'load_dataset.json')
+            save_dataset(dataset, path)
+            loaded = load_dataset(path)
+
+        self.assertEqual(loaded.spec.to_dict(), dataset.spec.to_dict())
+        self.assertEqual((loaded.owner_email, loaded.section_ids, loaded.projects),
+                         ('owner1@sainsburys.co.uk', [1], [(10, [3, 4])]))
+
+    def test_compare_results(self):
+        previous = {'endpoints': {'cdh_tree': summarise([0.010, 0.020], 0, 0, 1.0, None)}}
+        current = {'endpoints': {'cdh_tree': summarise([0.005, 0.010], 0, 0, 0.5, None),
+                                 'branches': summarise([0.001], 0, 0, 1.0, None)}}
+
+        self.assertEqual(compare_results(previous, current),
+                         ['cdh_tree   p50 -50.0%  p95 -50.0%  p99 -50.0%  req/s +100.0%'])
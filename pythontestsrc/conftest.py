@@ -0,0 +1,8 @@
+import sys
+
+
+def pytest_sessionfinish(session, exitstatus):
+    # Only when database tests ran, the others don't need the database to be up
+    test_base = sys.modules.get('util.test_base')
+    if test_base is not None:
+        test_base.drop_worker_schema()
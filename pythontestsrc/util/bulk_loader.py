@@ -0,0 +1,310 @@
+"""
+Bulk loading of test fixtures, for tests and benchmarks needing realistic volumes.
+Objects built in memory by the factories (e.g. ProjectFty.build_batch(10000)) are grouped by table, ordered by their
+foreign keys and loaded with COPY on Postgres, batched INSERTs elsewhere, instead of one ORM INSERT per row:
+
+    loader = BulkLoader(self.session)
+    loader.add(*ProjectSkuDecisionFty.build_batch(100000, project=project))
+    print(loader.load())
+    self.session.commit()
+
+Many-to-one related objects (e.g. the CDH built by a SubFactory) are loaded too, and their IDs copied into the foreign
+key columns. The factories assign every ID, so the loaded tables' sequences are moved past the largest ID afterwards.
+Sequences aren't transactional: rolling the load back leaves them where they were moved, so later tests get higher IDs
+but never ones already taken.
+The loaded objects aren't added to the session, query them back if needed.
+"""
+
+import io
+import json
+import time
+from datetime import date, datetime, time as time_of_day
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlalchemy.orm import object_mapper
+from sqlalchemy.orm.exc import UnmappedColumnError
+from sqlalchemy.orm.interfaces import MANYTOONE
+
+INSERT_BATCH_SIZE = 1000
+
+
+class TableLoad:
+    """
+    Rows loaded into one table, and how long it took.
+    """
+
+    def __init__(self, table_name, rows, seconds):
+        self.table_name = table_name
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float('inf')
+
+
+class LoadReport:
+    """
+    The TableLoad of every table loaded by BulkLoader.load, in load order.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.tables = []
+
+    @property
+    def rows(self):
+        return sum(table.rows for table in self.tables)
+
+    @property
+    def seconds(self):
+        return sum(table.seconds for table in self.tables)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float('inf')
+
+    def __str__(self):
+        lines = ['{:<40} {:>10} rows {:9.3f} s {:>12.0f} rows/s'.format(
+            table.table_name, table.rows, table.seconds, table.rows_per_second) for table in self.tables]
+        lines.append('{:<40} {:>10} rows {:9.3f} s {:>12.0f} rows/s'.format(
+            'total ({})'.format(self.method), self.rows, self.seconds, self.rows_per_second))
+        return '\n'.join(lines)
+
+
+class _MapperPlan:
+    """
+    How to turn the objects of one mapped class into rows: per table, its columns and the mapped attribute holding each
+    column's value, and the many-to-one relationships whose objects provide foreign key values.
+    """
+
+    def __init__(self, mapper):
+        self.tables = [(table, _column_keys(mapper, table)) for table in mapper.tables]
+        self.parents = [(relationship.key, [(mapper.get_property_by_column(local).key,
+                                             relationship.mapper.get_property_by_column(remote).key)
+                                            for local, remote in relationship.local_remote_pairs])
+                        for relationship in mapper.relationships if relationship.direction is MANYTOONE]
+
+
+def _column_keys(mapper, table):
+    """
+    :return: list of (column, key of the attribute mapped to it), for the table's mapped columns
+    """
+    column_keys = []
+    for column in table.columns:
+        try:
+            column_keys.append((column, mapper.get_property_by_column(column).key))
+        except UnmappedColumnError:
+            pass
+    return column_keys
+
+
+class BulkLoader:
+    """
+    Collects factory-built objects and plain rows, then loads them in table dependency order in the session's
+    transaction. Nothing is committed.
+    """
+
+    def __init__(self, session, method='auto'):
+        """
+        :param session: session whose connection the rows are loaded on, e.g. TestBase.session
+        :param method: 'copy' (Postgres only), 'insert' for batched INSERTs (executemany), or 'auto' to use COPY when
+        possible
+        """
+        self.session = session
+        self.method = method
+        self._rows = {}  # table to list of row dicts
+        self._seen = {}  # id to object, keeping the objects alive so that their ids aren't reused
+        self._plans = {}
+
+    def _plan(self, mapper):
+        plan = self._plans.get(mapper)
+        if plan is None:
+            plan = self._plans[mapper] = _MapperPlan(mapper)
+        return plan
+
+    def add(self, *objects):
+        """
+        Queue mapped objects, and the many-to-one related objects they reference, to be loaded.
+        """
+        pending = list(objects)
+        while pending:
+            obj = pending.pop()
+            if id(obj) in self._seen:
+                continue
+            self._seen[id(obj)] = obj
+            plan = self._plan(object_mapper(obj))
+            values = obj.__dict__
+            fk_values = {}
+            for relationship_key, pairs in plan.parents:
+                parent = values.get(relationship_key)
+                if parent is None:
+                    continue
+                pending.append(parent)
+                parent_values = parent.__dict__
+                for local_key, remote_key in pairs:
+                    fk_values[local_key] = parent_values.get(remote_key)
+            for table, columns in plan.tables:
+                self._rows.setdefault(table, []).append(
+                    {column.name: fk_values[key] if key in fk_values else values.get(key) for column, key in columns})
+        return self
+
+    def add_rows(self, table, rows):
+        """
+        Queue rows given as dicts of column name to value, for fixtures too numerous to build with the factories.
+        :param table: Table, or mapped class
+        """
+        table = getattr(table, '__table__', table)
+        self._rows.setdefault(table, []).extend(rows)
+        return self
+
+    def _use_copy(self, connection):
+        postgres = connection.dialect.name == 'postgresql'
+        if self.method == 'copy' and not postgres:
+            raise ValueError('COPY needs a Postgres database')
+        return postgres and self.method in ('auto', 'copy')
+
+    def load(self):
+        """
+        Load the queued rows, parents before children, and move the sequences of their tables past the loaded IDs. The
+        sequences stay moved if the transaction is rolled back.
+        :return: LoadReport
+        """
+        connection = self.session.connection()
+        use_copy = self._use_copy(connection)
+        report = LoadReport('COPY' if use_copy else 'INSERT')
+        tables = [table for table in _sorted_tables(self._rows) if self._rows[table]]
+        for table in tables:
+            rows = self._rows[table]
+            columns = _loaded_columns(table, rows)
+            start = time.perf_counter()
+            if use_copy:
+                _copy_rows(connection, table, columns, rows)
+            else:
+                _insert_rows(connection, table, columns, rows)
+            report.tables.append(TableLoad(table.name, len(rows), time.perf_counter() - start))
+
+        if connection.dialect.name == 'postgresql':
+            for table in tables:
+                if 'id' in table.c:
+                    name = connection.dialect.identifier_preparer.format_table(table)
+                    connection.execute(text("SELECT setval(pg_get_serial_sequence(:table, 'id'), max(id)) FROM {} "
+                                            "HAVING max(id) IS NOT NULL".format(name)), table=name)
+        self._rows.clear()
+        self._seen.clear()
+        return report
+
+
+def _sorted_tables(tables):
+    """
+    :return: the tables, parents before the tables referencing them
+    """
+    order = {}
+    for metadata in {table.metadata for table in tables}:
+        for n, table in enumerate(metadata.sorted_tables):
+            order[table] = n
+    return sorted(tables, key=lambda table: order.get(table, len(order)))
+
+
+def _loaded_columns(table, rows):
+    """
+    :return: the table's columns given a value by any row, plus those with a Python default. The other columns are
+    omitted, to get their server default or NULL.
+    """
+    given = set()
+    for row in rows:
+        given.update(name for name, value in row.items() if value is not None)
+    return [column for column in table.columns
+            if column.name in given or _column_default(column) is not None]
+
+
+class _RowContext:
+    """
+    Stands in for the execution context passed to context-sensitive defaults: rows loaded in bulk aren't executed one
+    by one, only the row's values are available, as current_parameters.
+    """
+
+    def __init__(self, column, row):
+        self.column = column
+        self.current_parameters = row
+
+    def get_current_parameters(self, isolate_multiinsert_groups=True):
+        return self.current_parameters
+
+    def __getattr__(self, name):
+        raise ValueError('The default of {} uses the execution context\'s {}, bulk loaded rows only have '
+                         'current_parameters: give the column a value in every row'.format(self.column, name))
+
+
+def _column_default(column):
+    """
+    :return: function returning the column's Python default for one row given as a dict, None if it has none.
+    Callable defaults, e.g. datetime.utcnow, are called again for every row.
+    """
+    default = column.default
+    if default is None or default.is_sequence:
+        return None
+    if default.is_callable:
+        return lambda row: default.arg(_RowContext(column, row))
+    if default.is_scalar:
+        return lambda row: default.arg
+    return None
+
+
+def _row_values(columns, rows):
+    defaults = [_column_default(column) for column in columns]
+    names = [column.name for column in columns]
+    for row in rows:
+        values = []
+        for name, default in zip(names, defaults):
+            value = row.get(name)
+            values.append(default(row) if value is None and default is not None else value)
+        yield values
+
+
+def _insert_rows(connection, table, columns, rows):
+    names = [column.name for column in columns]
+    batch = []
+    for values in _row_values(columns, rows):
+        batch.append(dict(zip(names, values)))
+        if len(batch) == INSERT_BATCH_SIZE:
+            connection.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        connection.execute(table.insert(), batch)
+
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_text(value):
+    """
+    :return: value in the COPY text format
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, (datetime, date, time_of_day)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _copy_rows(connection, table, columns, rows):
+    buffer = io.StringIO()
+    for values in _row_values(columns, rows):
+        buffer.write('\t'.join(_copy_text(value) for value in values))
+        buffer.write('\n')
+    buffer.seek(0)
+    preparer = connection.dialect.identifier_preparer
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN'.format(
+            preparer.format_table(table), ', '.join(preparer.format_column(column) for column in columns)), buffer)
+    finally:
+        cursor.close()
@@ -0,0 +1,131 @@
+"""
+Synthetic range planning datasets at production scale, for load tests and benchmarks.
+Sections, CDHs, projects, branches, SKUs and clusters are built by the factories, the per-SKU rows (branch SKUs, CDH
+item SKUs and memberships, decisions) as plain rows, and everything is loaded with util.bulk_loader.
+"""
+
+import random
+from itertools import count
+
+from util.bulk_loader import BulkLoader
+from util.factories import BranchFty, CdhFty, CdhItemFty, ClusterFty, ClusteringFty, ProjectFty, SectionFty, SkuFty,\
+    TaskFty, TaskStateFty, UserFty
+
+NUM_TASKS = 3
+
+
+class DatasetSpec:
+    """
+    Size of a synthetic dataset. Each project has its own CDH, with its own branches, and its own clustering.
+    """
+
+    def __init__(self, sections=2, projects_per_section=5, branches=20, skus_per_branch=100, clusters=4,
+                 skus_per_cdh_item=20, active_choice_ratio=0.3, seed=0):
+        """
+        :param sections: number of sections
+        :param projects_per_section: number of projects in each section
+        :param branches: number of branches of each project
+        :param skus_per_branch: number of SKUs ranged in each branch, each with a decision per cluster
+        :param clusters: number of clusters of each project's clustering
+        :param skus_per_cdh_item: number of SKUs grouped in each CDH item
+        :param active_choice_ratio: share of the decisions that are active choices
+        :param seed: seed of the random choices, the same spec always generates the same dataset
+        """
+        self.sections = sections
+        self.projects_per_section = projects_per_section
+        self.branches = branches
+        self.skus_per_branch = skus_per_branch
+        self.clusters = clusters
+        self.skus_per_cdh_item = skus_per_cdh_item
+        self.active_choice_ratio = active_choice_ratio
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class Dataset:
+    """
+    IDs of a generated dataset, to build the URLs requested by load tests.
+    """
+
+    def __init__(self, spec, owner_email):
+        self.spec = spec
+        self.owner_email = owner_email
+        self.section_ids = []
+        self.projects = []  # list of (project ID, list of its cluster IDs)
+        self.report = None
+
+    def to_dict(self):
+        return {
+            'spec': self.spec.to_dict(),
+            'projects': len(self.projects),
+            'rows': self.report.rows if self.report else None,
+            'load_seconds': self.report.seconds if self.report else None,
+        }
+
+
+def _next_ids(session, *tables):
+    """
+    :return: dict of table to an iterator of the IDs following the table's largest ID
+    """
+    connection = session.connection()
+    preparer = connection.dialect.identifier_preparer
+    return {table: count(connection.scalar('SELECT coalesce(max(id), 0) + 1 FROM {}'.format(
+        preparer.format_table(table)))) for table in tables}
+
+
+def generate_dataset(session, spec, method='auto'):
+    """
+    Generate and load a dataset in the session's transaction, the caller commits.
+    :param session: e.g. TestBase.session
+    :param spec: DatasetSpec
+    :param method: loading method of BulkLoader
+    :return: Dataset, with the LoadReport in its report attribute
+    """
+    rnd = random.Random(spec.seed)
+    branch_sku_table = models.BranchSku.__table__
+    decision_table = models.ProjectSkuDecision.__table__
+    cdh_item_sku_table = models.CdhItemSku.__table__
+    member_table = models.CdhItemMember.__table__
+    ids = _next_ids(session, branch_sku_table, decision_table, cdh_item_sku_table, member_table)
+
+    owner = UserFty.build()
+    dataset = Dataset(spec, owner.email)
+    tasks = TaskFty.build_batch(NUM_TASKS)
+    loader = BulkLoader(session, method=method).add(owner, *tasks)
+    branch_skus, decisions, cdh_item_skus, members = [], [], [], []
+
+    for section in SectionFty.build_batch(spec.sections):
+        dataset.section_ids.append(section.id)
+        for _ in range(spec.projects_per_section):
+            project = ProjectFty.build(owner_user=owner, cdh=CdhFty.build(section=section),
+                                       clustering=ClusteringFty.build())
+            clusters = ClusterFty.build_batch(spec.clusters, clustering=project.clustering)
+            branches = BranchFty.build_batch(spec.branches, cdh_id=project.cdh.id)
+            skus = SkuFty.build_batch(spec.skus_per_branch)
+            cdh_items = CdhItemFty.build_batch(-(-len(skus) // spec.skus_per_cdh_item))
+            loader.add(project, *clusters).add(*branches).add(*skus).add(*cdh_items)
+            loader.add(*[TaskStateFty.build(project=project, task=task) for task in tasks])
+            dataset.projects.append((project.id, [cluster.id for cluster in clusters]))
+
+            for n, sku in enumerate(skus):
+                cdh_item = cdh_items[n // spec.skus_per_cdh_item]
+                cdh_item_skus.append({'id': next(ids[cdh_item_sku_table]), 'cdh_item_id': cdh_item.id,
+                                      'sku_id': sku.id})
+            for n, branch in enumerate(branches):
+                members.append({'id': next(ids[member_table]), 'project_id': project.id,
+                                'cdh_item_id': cdh_items[n % len(cdh_items)].id, 'branch_id': branch.id})
+                for sku in skus:
+                    branch_sku_id = next(ids[branch_sku_table])
+                    branch_skus.append({'id': branch_sku_id, 'branch_id': branch.id, 'cdh_id': project.cdh.id,
+                                        'sku_id': sku.id})
+                    for cluster in clusters:
+                        decisions.append({'id': next(ids[decision_table]), 'project_id': project.id,
+                                          'branch_sku_id': branch_sku_id, 'cluster_id': cluster.id,
+                                          'is_active_choice': rnd.random() < spec.active_choice_ratio})
+
+    loader.add_rows(branch_sku_table, branch_skus).add_rows(decision_table, decisions)
+    loader.add_rows(cdh_item_sku_table, cdh_item_skus).add_rows(member_table, members)
+    dataset.report = loader.load()
+    return dataset
@@ -29,3 +29,108 @@ class UserFty(BaseFty):
     created_at = datetime(2016, 1, 1, hour=1, minute=0, second=0)
     name = Sequence(lambda n: 'User{}'.format(n))
     email = factory.LazyAttribute(lambda o: (o.name + '@sainsburys.co.uk').lower())
+
+
+class SectionFty(BaseFty):
+    class Meta:
+        model = models.Section
+
+    name = Sequence(lambda n: 'Section{}'.format(n))
+
+
+class CdhFty(BaseFty):
+    class Meta:
+        model = models.Cdh
+
+    section = factory.SubFactory(SectionFty)
+
+
+class ClusteringFty(BaseFty):
+    class Meta:
+        model = models.Clustering
+
+    dataset_id = Sequence(lambda n: 'dataset{}'.format(n))
+
+
+class TaskFty(BaseFty):
+    class Meta:
+        model = models.Task
+
+    name = Sequence(lambda n: 'task{}'.format(n))
+    workflow_order = Sequence(lambda n: n)
+
+
+class ProjectFty(BaseFty):
+    class Meta:
+        model = models.Project
+
+    name = Sequence(lambda n: 'Project{}'.format(n))
+    cdh = factory.SubFactory(CdhFty)
+    clustering = factory.SubFactory(ClusteringFty)
+    owner_user = factory.SubFactory(UserFty)
+    metric_calculation_date_from = datetime(2017, 1, 1)
+    metric_calculation_date_to = datetime(2017, 6, 30)
+
+
+class TaskStateFty(BaseFty):
+    class Meta:
+        model = models.TaskState
+
+    project = factory.SubFactory(ProjectFty)
+    task = factory.SubFactory(TaskFty)
+
+
+class BranchFty(BaseFty):
+    class Meta:
+        model = models.Branch
+
+    name = Sequence(lambda n: 'Branch{}'.format(n))
+
+
+class SkuFty(BaseFty):
+    class Meta:
+        model = models.Sku
+
+    name = Sequence(lambda n: 'Sku{}'.format(n))
+
+
+class CdhItemFty(BaseFty):
+    class Meta:
+        model = models.CdhItem
+
+    name = Sequence(lambda n: 'CdhItem{}'.format(n))
+
+
+class CdhItemSkuFty(BaseFty):
+    class Meta:
+        model = models.CdhItemSku
+
+
+class CdhItemMemberFty(BaseFty):
+    class Meta:
+        model = models.CdhItemMember
+
+
+class BranchSkuFty(BaseFty):
+    class Meta:
+        model = models.BranchSku
+
+    branch = factory.SubFactory(BranchFty)
+    sku = factory.SubFactory(SkuFty)
+
+
+class ProjectSkuDecisionFty(BaseFty):
+    class Meta:
+        model = models.ProjectSkuDecision
+
+    project = factory.SubFactory(ProjectFty)
+    branch_sku = factory.SubFactory(BranchSkuFty)
+    comment = None
+    is_active_choice = False
+
+
+class ClusterFty(BaseFty):
+    class Meta:
+        model = models.Cluster
+
+    clustering = factory.SubFactory(ClusteringFty)
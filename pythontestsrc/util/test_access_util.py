@@ -0,0 +1,44 @@
+from sqlalchemy.orm.exc import NoResultFound
+
+from util.access_util import get_user_by_email, get_user_cache_stats, invalidate_user_cache
+from util.factories import UserFty
+from util.test_base import TestBase, app
+
+
+class UserCacheTestCase(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        invalidate_user_cache()
+        self.user = UserFty(name='cached1', email='cached1@sainsburys.co.uk')
+        self.session.commit()
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        db_lookups = get_user_cache_stats()['db_lookups']
+
+        first = get_user_by_email('cached1@sainsburys.co.uk')
+        second = get_user_by_email('cached1@sainsburys.co.uk')
+
+        self.assertEqual(first.id, self.user.id)
+        self.assertEqual(second.id, self.user.id)
+        self.assertEqual(second.name, 'cached1')
+        self.assertEqual(get_user_cache_stats()['db_lookups'], db_lookups + 1)
+
+    def test_changing_a_user_invalidates_it(self):
+        get_user_by_email('cached1@sainsburys.co.uk')
+
+        self.user.email = 'renamed1@sainsburys.co.uk'
+        self.session.commit()
+
+        self.assertEqual(get_user_by_email('renamed1@sainsburys.co.uk').id, self.user.id)
+        with self.assertRaises(NoResultFound):
+            get_user_by_email('cached1@sainsburys.co.uk')
+
+    def test_lookups_are_exported_in_metrics(self):
+        get_user_by_email('cached1@sainsburys.co.uk')
+
+        with app.test_client() as client:
+            client.get('/api/metrics')  # caches the requesting user
+            metrics = client.get('/api/metrics').get_data(as_text=True)
+
+        db_lookups = get_user_cache_stats()['db_lookups']
+        self.assertIn('rpt_cache_loads_total{{cache="users"}} {}\n'.format(db_lookups), metrics)
@@ -1,17 +1,69 @@
+import fcntl
+import json
+import os
+import tempfile
 import unittest
+import warnings
+from contextlib import contextmanager
+from unittest import mock
 
 import factory
 from flask.json import JSONDecoder as FlaskJSONDecoder
 
 from app import app
 from util.access_util import ATN_HEADER
+from util.job_util import job_queue
 
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from flask.testing import FlaskClient
 
 versioned_session(Session)
 scoped_session = db.create_scoped_session()
 
+# Default isolation of the tests' database changes, a test class can set its own TEST_DB_ISOLATION:
+# - 'transaction' (default): the schema is created once per test process and each test runs in a transaction rolled
+#   back at the end. Commits by the code under test only release a SAVEPOINT.
+# - 'schema': the schema is dropped and recreated before each test, for tests needing really committed data (e.g.
+#   read by another connection or a background job).
+TEST_DB_ISOLATION = os.getenv('TEST_DB_ISOLATION', 'transaction')
+
+# Schema the tests run in. When the tests are run in parallel by pytest-xdist (pytest -n <workers>) each worker gets
+# its own schema, named after its worker ID, so that the workers don't drop each other's tables. The public schema stays
+# on the search path for the extensions installed there. The worker schemas are dropped when the test session finishes,
+# see conftest.py.
+TEST_DB_SCHEMA = 'test_' + os.environ['PYTEST_XDIST_WORKER'] if 'PYTEST_XDIST_WORKER' in os.environ else 'public'
+
+_schema_created = False
+
+
+if TEST_DB_SCHEMA != 'public':
+    @event.listens_for(db.engine, 'connect')
+    def _set_search_path(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SET search_path TO {}, public'.format(TEST_DB_SCHEMA))
+        cursor.close()
+        dbapi_connection.commit()  # Or the setting is reset when the connection's first transaction is rolled back
+
+    db.engine.dispose()  # Connections opened before the listener was added would use the public schema
+
+
+def recreate_schema():
+    db.engine.execute("drop schema if exists {} cascade".format(TEST_DB_SCHEMA))
+    db.engine.execute("create schema {}".format(TEST_DB_SCHEMA))
+    # Only create things on the default db (Postgres). No existence check: it would find the tables of the public
+    # schema, that is on the search_path, and leave the new schema empty
+    db.Model.metadata.create_all(bind=db.engine, tables=db.get_tables_for_bind(None), checkfirst=False)
+
+
+def drop_worker_schema():
+    """
+    Drop the schema of this pytest-xdist worker, if the tests ran in one.
+    """
+    if TEST_DB_SCHEMA != 'public':
+        db.engine.execute("drop schema if exists {} cascade".format(TEST_DB_SCHEMA))
+        db.engine.dispose()
+
 
 class AppTestClient(FlaskClient):
     """
@@ -55,7 +107,61 @@ class AppTestClient(FlaskClient):
         return super().delete(*args, **kw)
 
 
+QUERY_BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'query_counts.json')
+
+
+def _update_query_baseline(name, count):
+    """
+    Record count as the baseline of name if there is none or it is lower. The file is locked while it is read and
+    rewritten, for the tests run in parallel by pytest-xdist.
+    :return: the baseline
+    """
+    with open(QUERY_BASELINE_PATH + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        with open(QUERY_BASELINE_PATH) as baseline_file:
+            baselines = json.load(baseline_file)
+        baseline = baselines.get(name)
+        if baseline is None or count < baseline:
+            baseline = baselines[name] = count
+            updated_path = QUERY_BASELINE_PATH + '.tmp'
+            with open(updated_path, 'w') as baseline_file:
+                json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+                baseline_file.write('\n')
+            os.replace(updated_path, QUERY_BASELINE_PATH)  # Readers never see a partly written file
+        return baseline
+
+
+class QueryCounter:
+    """
+    Context manager recording the SQL statements executed on an engine while active.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __str__(self):
+        return '\n'.join('{}. {}'.format(n, ' '.join(statement.split()))
+                         for n, statement in enumerate(self.statements, 1))
+
+
 class TestBase(unittest.TestCase):
+    TEST_DB_ISOLATION = TEST_DB_ISOLATION
+
     def _setFactoryStrategy(self, strategy):
         """
         Set the create/build strategy of the factory classes in the tests.factories module.
@@ -83,17 +189,73 @@ class TestBase(unittest.TestCase):
         db.engine.echo = app.config.get('DEBUG', True)
         self._setFactoryStrategy(factory.CREATE_STRATEGY if factory_create else factory.BUILD_STRATEGY)
         self.create_all = create_all
-        if self.create_all:
-            db.engine.execute("drop schema if exists public cascade")
-            db.engine.execute("create schema public")
-            db.create_all(bind=None)  # Only create things on the default db (Postgres)
-        self.session = scoped_session
+        self.isolation = self.TEST_DB_ISOLATION if create_all else None
+        if self.isolation == 'transaction':
+            global _schema_created
+            if not _schema_created:
+                recreate_schema()
+                _schema_created = True
+            self.session = self._begin_test_transaction()
+            self.useTemporaryJobQueue()
+        else:
+            if self.isolation == 'schema':
+                recreate_schema()
+            self.session = scoped_session
 
+    def _begin_test_transaction(self):
+        """
+        Bind db.session to a connection in a transaction rolled back by doCleanups, with a SAVEPOINT restarted whenever
+        the code under test commits or rolls back.
+        db.session is swapped for the whole process, and its remove() overridden: only the test's thread may use it, so
+        setUp keeps the job workers from starting with useTemporaryJobQueue. Tests of jobs run them in the test's thread.
+        :return: the scoped session now used as db.session
+        """
+        self._connection = db.engine.connect()
+        self._transaction = self._connection.begin()
+        self._app_session = db.session
+        session = db.create_scoped_session(options={'bind': self._connection, 'binds': {}})
+
+        @event.listens_for(session.session_factory, 'after_transaction_end')
+        def restart_savepoint(session, transaction):
+            if transaction.nested and not transaction._parent.nested:
+                session.expire_all()
+                session.begin_nested()
+
+        def remove():
+            # Flask-SQLAlchemy removes the session at the end of each request. Closing it ends its SAVEPOINT and leaves
+            # it in a transaction that isn't nested, that the next rollback by the code under test would roll back
+            # together with the test's fixtures: start a new SAVEPOINT right away
+            session.close()
+            session.begin_nested()
+
+        session.remove = remove
+        session.begin_nested()
+        db.session = session
+        return session
 
     def doCleanups(self):
-        self.session.close_all()
-        # db.engine.execute("drop schema if exists public cascade")
-        # db.engine.execute("create schema public")
+        super().doCleanups()  # The functions registered with addCleanup
+        if self.isolation == 'transaction':
+            self.session.close()
+            db.session = self._app_session
+            self._transaction.rollback()
+            self._connection.close()
+        else:
+            self.session.close_all()
+
+    def useTemporaryJobQueue(self):
+        """
+        Queue the jobs enqueued by the test in a temporary file, without starting the workers: the jobs stay queued.
+        Worker threads would run them on the test's connection, outside of its transaction.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(job_queue.init_app, app)  # Back to the configured queue, after the config patch is stopped
+        for patcher in (mock.patch.dict(app.config, JOB_QUEUE_PATH=os.path.join(directory.name, 'jobs.sqlite3')),
+                        mock.patch.object(job_queue, '_start_workers')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        job_queue.init_app(app)
 
     def verify_json_response(self, expected_data, url, **kwargs):
         with app.test_client() as client:
@@ -103,13 +265,47 @@ class TestBase(unittest.TestCase):
             retrieved_data = FlaskJSONDecoder().decode(retrieved_json)
             self.assertDictEqual(expected_data, retrieved_data)
 
+    def countQueries(self):
+        """
+        :return: QueryCounter of the statements executed on the app's database, e.g.
+            with self.countQueries() as counter:
+                ...
+            counter.count
+        """
+        return QueryCounter(db.engine)
+
+    @contextmanager
+    def assertMaxQueries(self, max_count, msg=None):
+        """
+        Fail if the block executes more than max_count SQL statements, listing them.
+        """
+        with self.countQueries() as counter:
+            yield counter
+        if counter.count > max_count:
+            self.fail(self._formatMessage(msg, '{} queries executed, expected at most {}:\n{}'.format(
+                counter.count, max_count, counter)))
+
+    def assertQueryBaseline(self, name, count):
+        """
+        Fail if count is over the baseline recorded for name in query_counts.json. An endpoint without a baseline gets
+        count as its baseline, with a warning to commit the file. Run the tests with QUERY_BASELINE_UPDATE=1 to record
+        lower baselines.
+        """
+        with open(QUERY_BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file).get(name)
+        if baseline is None or os.getenv('QUERY_BASELINE_UPDATE') == '1':
+            baseline = _update_query_baseline(name, count)
+            warnings.warn('Query count baseline of {} recorded as {}, commit query_counts.json'.format(name, baseline))
+        self.assertLessEqual(count, baseline, '{} now executes {} queries, its baseline is {}'.format(
+            name, count, baseline))
+
     def get_results(self, exp):
         """
         Execute SQL core expression and return result rows as a list, translating each row into a plain dict.
         :param exp:
         :return:
         """
-        return [dict(result) for result in self.session.bind.engine.execute(exp).fetchall()]
+        return [dict(result) for result in self.session.bind.execute(exp).fetchall()]
 
     def assertIntersectedDictsEqual(self, first, second, msg=None):
         """Fail if the intersected dicts are unequal as determined by the '=='
@@ -0,0 +1,86 @@
+import itertools
+import unittest
+
+from sqlalchemy import Column, Integer, MetaData, Table
+
+from util.bulk_loader import BulkLoader, _row_values
+from util.factories import BranchFty, BranchSkuFty, ProjectFty, ProjectSkuDecisionFty, UserFty
+from util.test_base import TestBase
+
+
+class BulkLoaderTestCase(TestBase):
+    def build_decisions(self):
+        project = ProjectFty.build(owner_user=UserFty.build(name='bulk1', email='bulk1@sainsburys.co.uk'))
+        branch = BranchFty.build(cdh_id=project.cdh.id)
+        branch_skus = BranchSkuFty.build_batch(5, branch=branch, cdh_id=project.cdh.id)
+        return project, [ProjectSkuDecisionFty.build(project=project, branch_sku=branch_sku,
+                                                     comment='decision{}'.format(n))
+                         for n, branch_sku in enumerate(branch_skus)]
+
+    def assertLoaded(self, project, decisions):
+        loaded = models.Project.query.get(project.id)
+        self.assertEqual(loaded.cdh_id, project.cdh.id)
+        self.assertEqual(loaded.owner_user.email, 'bulk1@sainsburys.co.uk')
+        loaded_decisions = models.ProjectSkuDecision.query.filter_by(project_id=project.id).all()
+        self.assertEqual(sorted(decision.comment for decision in loaded_decisions),
+                         sorted(decision.comment for decision in decisions))
+        for decision in loaded_decisions:
+            self.assertEqual(decision.branch_sku.cdh_id, project.cdh.id)
+
+    def test_loads_objects_and_their_parents_with_copy(self):
+        project, decisions = self.build_decisions()
+        report = BulkLoader(self.session).add(*decisions).load()
+        self.session.commit()
+
+        self.assertEqual(report.method, 'COPY')
+        self.assertLoaded(project, decisions)
+        table_names = [table.table_name for table in report.tables]
+        self.assertLess(table_names.index(models.Project.__table__.name),
+                        table_names.index(models.ProjectSkuDecision.__table__.name))
+        self.assertEqual(report.rows, sum(table.rows for table in report.tables))
+
+    def test_loads_objects_with_inserts(self):
+        project, decisions = self.build_decisions()
+        report = BulkLoader(self.session, method='insert').add(*decisions).load()
+        self.session.commit()
+
+        self.assertEqual(report.method, 'INSERT')
+        self.assertLoaded(project, decisions)
+
+    def test_moves_sequences_past_the_loaded_ids(self):
+        BulkLoader(self.session).add(UserFty.build(id=5000)).load()
+        self.session.commit()
+
+        user = models.User(name='after', email='after@sainsburys.co.uk')
+        self.session.add(user)
+        self.session.commit()
+        self.assertGreater(user.id, 5000)
+
+    def test_loads_plain_rows(self):
+        user = UserFty.build()
+        BulkLoader(self.session).add(user).add_rows(models.User, [
+            {'id': user.id + 1, 'name': 'row1', 'email': 'row1@sainsburys.co.uk', 'created_at': user.created_at},
+        ]).load()
+        self.session.commit()
+
+        self.assertEqual(models.User.query.get(user.id + 1).name, 'row1')
+
+
+class RowValuesTestCase(unittest.TestCase):
+    def test_callable_defaults_are_called_per_row(self):
+        counter = itertools.count(1)
+        table = Table('counted', MetaData(), Column('id', Integer), Column('n', Integer, default=lambda: next(counter)),
+                      Column('m', Integer, default=7))
+        rows = [{'id': 1}, {'id': 2, 'n': 10}, {'id': 3}]
+        self.assertEqual(list(_row_values(table.columns, rows)), [[1, 1, 7], [2, 10, 7], [3, 2, 7]])
+
+    def test_context_defaults_get_the_row(self):
+        table = Table('derived', MetaData(), Column('id', Integer),
+                      Column('n', Integer, default=lambda context: context.get_current_parameters()['id'] * 10))
+        self.assertEqual(list(_row_values(table.columns, [{'id': 1}, {'id': 2, 'n': 5}])), [[1, 10], [2, 5]])
+
+    def test_context_defaults_needing_the_connection_are_rejected(self):
+        table = Table('fetched', MetaData(), Column('id', Integer),
+                      Column('n', Integer, default=lambda context: context.connection.scalar('SELECT 1')))
+        with self.assertRaisesRegex(ValueError, 'fetched.n'):
+            list(_row_values(table.columns, [{'id': 1}]))
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+from util.cache_util import SqliteCache, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(max_size=2, ttl=10, clock=self.clock)
+
+    def test_get_returns_stored_value_until_expiry(self):
+        self.cache.set('a', 1)
+        self.clock.now = 9
+        self.assertEqual(self.cache.get('a'), 1)
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_delete_where(self):
+        self.cache.set(('project', 1), 'x')
+        self.cache.set(('project', 2), 'y')
+        deleted = self.cache.delete_where(lambda key, value: key[1] == 1)
+        self.assertEqual(deleted, 1)
+        self.assertIsNone(self.cache.get(('project', 1)))
+        self.assertEqual(self.cache.get(('project', 2)), 'y')
+
+    def test_delete_expired(self):
+        self.cache.set('a', 1)
+        self.clock.now = 5
+        self.cache.set('b', 2)
+        self.clock.now = 10
+        self.assertEqual(self.cache.delete_expired(), 1)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get('b'), 2)
+
+    def test_stats(self):
+        self.cache.set('a', 1)
+        self.cache.get('a')
+        self.cache.get('b')
+        self.cache.record_load()
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'loads': 1, 'hit_ratio': 0.5, 'size': 1})
+
+    def test_generations(self):
+        self.assertEqual(self.cache.generation('project:1'), 0)
+        self.assertEqual(self.cache.next_generation('project:1'), 1)
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.set('c', 3)
+        self.assertEqual(self.cache.generation('project:1'), 1, 'generations are not evicted')
+        self.assertEqual(self.cache.generation('project:2'), 0)
+
+
+class SqliteCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.cache = SqliteCache(os.path.join(self.directory.name, 'cache.sqlite3'), max_size=2, ttl=10,
+                                 clock=self.clock)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_returns_stored_value_until_expiry(self):
+        self.cache.set('a', {'body': '1'})
+        self.clock.now = 9
+        self.assertEqual(self.cache.get('a'), {'body': '1'})
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_oldest_entry_is_evicted(self):
+        for key in 'abc':
+            self.cache.set(key, key)
+            self.clock.now += 1
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('c'), 'c')
+        self.assertEqual(len(self.cache), 2)
+
+    def test_delete_prefix(self):
+        self.cache.set('branches:1:2', 'x')
+        self.cache.set('branches:10:2', 'y')
+        self.assertEqual(self.cache.delete_prefix('branches:1:'), 1)
+        self.assertIsNone(self.cache.get('branches:1:2'))
+        self.assertEqual(self.cache.get('branches:10:2'), 'y')
+
+    def test_delete_expired(self):
+        self.cache.set('a', 'x')
+        self.clock.now = 5
+        self.cache.set('b', 'y')
+        self.clock.now = 10
+        self.assertEqual(self.cache.delete_expired(), 1)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_generations_are_shared(self):
+        other = SqliteCache(self.cache.path, max_size=2, ttl=10, clock=self.clock)
+        self.assertEqual(self.cache.next_generation('project:1'), 1)
+        self.assertEqual(other.next_generation('project:1'), 2)
+        self.assertEqual(self.cache.generation('project:1'), 2)
+        self.assertEqual(other.generation('project:2'), 0)
@@ -0,0 +1,23 @@
+from util.dataset_generator import DatasetSpec, generate_dataset
+from util.test_base import TestBase
+
+
+class DatasetGeneratorTestCase(TestBase):
+    def test_generates_the_spec(self):
+        spec = DatasetSpec(sections=2, projects_per_section=2, branches=3, skus_per_branch=4, clusters=2,
+                           skus_per_cdh_item=3)
+        dataset = generate_dataset(self.session, spec)
+        self.session.commit()
+
+        self.assertEqual(len(dataset.section_ids), 2)
+        self.assertEqual(len(dataset.projects), 4)
+        project_ids = [project_id for project_id, _ in dataset.projects]
+        self.assertEqual(models.Project.query.filter(models.Project.id.in_(project_ids)).count(), 4)
+        for project_id, cluster_ids in dataset.projects:
+            project = models.Project.query.get(project_id)
+            self.assertEqual(project.owner_user.email, dataset.owner_email)
+            self.assertEqual(models.Branch.query.filter_by(cdh_id=project.cdh_id).count(), 3)
+            self.assertEqual(models.BranchSku.query.filter_by(cdh_id=project.cdh_id).count(), 3 * 4)
+            self.assertEqual(models.ProjectSkuDecision.query.filter_by(project_id=project_id).count(), 3 * 4 * 2)
+            self.assertEqual(models.Cluster.query.filter(models.Cluster.id.in_(cluster_ids)).count(), 2)
+        self.assertEqual(dataset.to_dict()['rows'], dataset.report.rows)
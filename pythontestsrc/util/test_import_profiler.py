@@ -0,0 +1,31 @@
+import unittest
+
+from util.import_profiler import ImportTiming, parse_import_times, self_time_by_package, total_import_time_us
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | io
+import time:       200 |        200 |     flask.globals
+import time:       500 |        700 |   flask.app
+import time:      1000 |       1700 | flask
+import time:        50 |         50 | util.json_util
+some other output
+"""
+
+
+class ImportProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.timings = parse_import_times(IMPORTTIME_OUTPUT)
+
+    def test_parse_import_times(self):
+        self.assertEqual(len(self.timings), 6)
+        self.assertEqual(self.timings[0], ImportTiming('_io', 120, 120, 1))
+        self.assertEqual(self.timings[2], ImportTiming('flask.globals', 200, 200, 2))
+        self.assertEqual(self.timings[4], ImportTiming('flask', 1000, 1700, 0))
+
+    def test_total_import_time_sums_top_level_imports(self):
+        self.assertEqual(total_import_time_us(self.timings), 420 + 1700 + 50)
+
+    def test_self_time_by_package(self):
+        self.assertEqual(self_time_by_package(self.timings),
+                         [('flask', 1700), ('io', 300), ('_io', 120), ('util', 50)])
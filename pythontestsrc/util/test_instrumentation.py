@@ -0,0 +1,57 @@
+import time
+import unittest
+
+from flask import Blueprint, Flask
+from sqlalchemy import create_engine
+
+from util.instrumentation import endpoint_metrics, init_blueprint, record_serialization_time, timed_serialization
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        blueprint = Blueprint('instrumented', __name__)
+        init_blueprint(blueprint)
+
+        @blueprint.route('/query')
+        def query():
+            with engine.connect() as conn:
+                rows = conn.execute('select 1 union all select 2').fetchall()
+                conn.execute('select 3').fetchall()
+            record_serialization_time(0.002)
+            return str(len(rows))
+
+        @blueprint.route('/dump')
+        def dump():
+            with timed_serialization():
+                time.sleep(0.01)  # A schema dump
+            return 'ok'
+
+        self.app = Flask(__name__)
+        self.app.register_blueprint(blueprint, url_prefix='/api')
+        endpoint_metrics.clear()
+
+    def test_requests_are_instrumented(self):
+        with self.app.test_client() as client:
+            resp = client.get('/api/query')
+            client.get('/api/query')
+
+        server_timing = resp.headers['Server-Timing']
+        self.assertRegex(server_timing, r'^db;dur=[\d.]+;desc="2 statements, \d+ rows", serialize;dur=2.0, total;dur=')
+
+        totals = endpoint_metrics.snapshot()[('instrumented.query', 'GET', 200)]
+        self.assertEqual(totals['requests'], 2)
+        self.assertEqual(totals['statements'], 4)
+        self.assertAlmostEqual(totals['serialization_seconds'], 0.004)
+
+    def test_schema_dumps_are_counted_as_serialization(self):
+        with self.app.test_client() as client:
+            client.get('/api/dump')
+
+        totals = endpoint_metrics.snapshot()[('instrumented.dump', 'GET', 200)]
+        self.assertGreaterEqual(totals['serialization_seconds'], 0.01)
+
+    def test_server_timing_can_be_disabled(self):
+        self.app.config['SERVER_TIMING'] = False
+        with self.app.test_client() as client:
+            self.assertNotIn('Server-Timing', client.get('/api/query').headers)
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from util.job_util import FAILED, RUNNING, STALE_AFTER, STALE_MESSAGE, SUCCEEDED, JobError, JobQueue
+
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        app = Flask(__name__)
+        app.config['JOB_QUEUE_PATH'] = os.path.join(self.directory.name, 'jobs.sqlite3')
+        self.job_queue = JobQueue()
+        self.job_queue.init_app(app)
+
+        @self.job_queue.job('double')
+        def double(progress, n):
+            progress(50, 'Doubling')
+            if n < 0:
+                raise JobError('n must be positive')
+            return {'n': n * 2}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def wait_for(self, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.job_queue.get(job_id)
+            if job['status'] in (SUCCEEDED, FAILED):
+                return job
+            time.sleep(0.05)
+        self.fail('Job {} did not finish'.format(job_id))
+
+    def test_job_result_is_stored(self):
+        job = self.wait_for(self.job_queue.enqueue('double', n=2))
+        self.assertEqual(job['status'], SUCCEEDED)
+        self.assertEqual(job['progress'], 100)
+        self.assertEqual(job['result'], {'n': 4})
+
+    def test_job_error_fails_the_job_with_its_message(self):
+        job = self.wait_for(self.job_queue.enqueue('double', n=-1))
+        self.assertEqual(job['status'], FAILED)
+        self.assertEqual(job['message'], 'n must be positive')
+
+    def test_unknown_job_is_none(self):
+        self.assertIsNone(self.job_queue.get(12345))
+
+    def test_job_left_running_by_a_dead_worker_is_failed(self):
+        heartbeat_at = (datetime.utcnow() - timedelta(seconds=STALE_AFTER + 1)).isoformat()
+        with sqlite3.connect(self.job_queue.path, isolation_level=None) as conn:
+            dead_job_id = conn.execute(
+                'insert into job (name, args, dedupe_key, status, created_at, started_at, heartbeat_at) '
+                'values (?, ?, ?, ?, ?, ?, ?)',
+                ('double', '{"n": 3}', 'double:{"n": 3}', RUNNING, heartbeat_at, heartbeat_at, heartbeat_at)).lastrowid
+
+        job_id = self.job_queue.enqueue('double', dedupe=True, n=3)
+
+        self.assertNotEqual(job_id, dead_job_id)
+        dead_job = self.job_queue.get(dead_job_id)
+        self.assertEqual(dead_job['status'], FAILED)
+        self.assertEqual(dead_job['message'], STALE_MESSAGE)
+        self.assertEqual(self.wait_for(job_id)['result'], {'n': 6})
+
+    def test_worker_survives_queue_errors(self):
+        claim = self.job_queue._claim
+        errors = [sqlite3.OperationalError('database is locked')]
+
+        def failing_claim():
+            if errors:
+                raise errors.pop()
+            return claim()
+
+        self.job_queue._claim = failing_claim
+        self.job_queue.num_workers = 1
+        with self.assertLogs('util.job_util', 'ERROR'):
+            job = self.wait_for(self.job_queue.enqueue('double', n=5))
+        self.assertEqual(job['result'], {'n': 10})
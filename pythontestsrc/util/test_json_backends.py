@@ -0,0 +1,77 @@
+"""
+Conformance of the JSON backends: every backend must produce byte for byte the output of the stdlib backend.
+"""
+
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from flask_sqlalchemy import SQLAlchemy
+
+from util.json_util import COMPACT_SEPARATORS, OrjsonJSONBackend, StdlibJSONBackend, orjson
+
+test_db = SQLAlchemy()
+
+
+class JsonBackendsBranch(test_db.Model):
+    __json_exclude__ = ['notes']
+
+    id = test_db.Column(test_db.Integer, primary_key=True)
+    name = test_db.Column(test_db.String)
+    sales = test_db.Column(test_db.Numeric(12, 2))
+    notes = test_db.Column(test_db.String)
+
+
+PAYLOADS = [
+    None,
+    True,
+    [],
+    {},
+    'plain',
+    'escapes " \\ / \n \t \x00 \x1f \x7f',
+    'non-ASCII café   \U0001f600',
+    [0, -1, 2 ** 63 - 1, -2 ** 63, 2 ** 64, 10 ** 30],
+    [0.0, -0.0, 0.1, 1.5, 1e15, 1e16, 1e-4, 1e-5, 2.5e-7, 123456789.123, 1.7976931348623157e308],
+    [Decimal('12.50'), Decimal('-0.0001'), Decimal('1E+3')],
+    [datetime(2017, 1, 2, 3, 4, 5), date(2017, 1, 2)],
+    UUID('12345678-1234-5678-1234-567812345678'),
+    {'b': 1, 'a': {'d': [1, 2, {'f': None, 'e': 'x'}], 'c': 'y'}},
+    {10: 'ten', 9: 'nine', 100: {'nested': True}},
+    {'outer': {2: 'two', 1: 'one'}},
+    JsonBackendsBranch(id=1, name='Branch1', sales=Decimal('99.99'), notes='not exported'),
+    {3: JsonBackendsBranch(id=3, name='Café'), 1: JsonBackendsBranch(id=1, sales=Decimal('1.10'))},
+    [JsonBackendsBranch(id=n, name='Branch{}'.format(n), sales=Decimal(n) / 100) for n in range(50)],
+]
+
+OPTIONS = [
+    dict(sort_keys=True, ensure_ascii=True, separators=COMPACT_SEPARATORS),
+    dict(sort_keys=True, ensure_ascii=False, separators=COMPACT_SEPARATORS),
+    dict(sort_keys=False, ensure_ascii=True, separators=COMPACT_SEPARATORS),
+    dict(sort_keys=True, ensure_ascii=True, indent=2, separators=(', ', ': ')),
+    dict(sort_keys=True, ensure_ascii=True),
+]
+
+
+# Backends checked against the stdlib backend: (name, factory taking the stdlib backend, None if not installed)
+BACKENDS = [
+    ('orjson', None if orjson is None else OrjsonJSONBackend),
+]
+
+
+class JsonBackendConformanceTestCase(unittest.TestCase):
+    def check_backend(self, make_backend):
+        stdlib = StdlibJSONBackend()
+        backend = make_backend(stdlib)
+        for payload in PAYLOADS:
+            for options in OPTIONS:
+                with self.subTest(payload=payload, options=options):
+                    self.assertEqual(backend.dumps(payload, **options), stdlib.dumps(payload, **options))
+
+    def test_output_matches_stdlib(self):
+        installed = [(name, make_backend) for name, make_backend in BACKENDS if make_backend is not None]
+        if not installed:
+            self.skipTest('No JSON backend other than the stdlib one is installed')
+        for name, make_backend in installed:
+            with self.subTest(backend=name):
+                self.check_backend(make_backend)
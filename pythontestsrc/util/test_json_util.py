@@ -0,0 +1,28 @@
+import unittest
+from decimal import Decimal
+
+from flask_sqlalchemy import SQLAlchemy
+
+from util.json_util import model_to_dict
+
+test_db = SQLAlchemy()
+
+
+class JsonUtilSku(test_db.Model):
+    __json_exclude__ = ['internal_note']
+
+    id = test_db.Column(test_db.Integer, primary_key=True)
+    name = test_db.Column(test_db.String)
+    sales = test_db.Column(test_db.Numeric(12, 2))
+    weight = test_db.Column(test_db.Float)
+    internal_note = test_db.Column(test_db.String)
+
+
+class ModelToDictTestCase(unittest.TestCase):
+    def test_exports_loaded_public_attributes(self):
+        sku = JsonUtilSku(id=1, name='Sku1', internal_note='secret')
+        self.assertEqual(model_to_dict(sku), {'id': 1, 'name': 'Sku1'})
+
+    def test_decimals_are_strings(self):
+        sku = JsonUtilSku(id=1, sales=Decimal('12.50'), weight=1.5)
+        self.assertEqual(model_to_dict(sku), {'id': 1, 'sales': '12.50', 'weight': 1.5})
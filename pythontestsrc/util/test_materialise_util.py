@@ -0,0 +1,61 @@
+from unittest import mock
+
+from app import app
+from util.materialise_util import Materialisation, _materialisations, materialisation
+from util.test_base import TestBase
+
+
+class MaterialisationTestCase(TestBase):
+    """
+    Freshness tracking, with no materialised models so that no banding or metrics fixtures are needed. The refresh jobs
+    aren't run, the tests refresh the keys themselves.
+    """
+
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.useTemporaryJobQueue()
+        self.materialisation = Materialisation('test', [])
+        self.addCleanup(_materialisations.pop, 'test', None)
+        patcher = mock.patch.object(self.materialisation, '_enqueue_refresh')
+        self.enqueue_refresh = patcher.start()
+        self.addCleanup(patcher.stop)
+        app_context = app.app_context()
+        app_context.push()
+        self.addCleanup(app_context.pop)
+
+    def test_key_is_materialised_by_its_refresh(self):
+        self.assertIsNone(self.materialisation.aliases(1, 2, 5))
+        self.assertEqual(db.session.query(materialisation).count(), 0, 'requests don\'t write')
+        self.enqueue_refresh.assert_called_once_with(1, 2, 5, 0)
+
+        self.materialisation.refresh(1, 2, 5)
+        self.assertEqual(db.session.query(materialisation).count(), 1)
+        self.assertEqual(self.materialisation.aliases(1, 2, 5), [])
+
+    def test_project_changes_make_its_keys_stale(self):
+        for project_id in (1, 2):
+            self.materialisation.aliases(project_id, 2, 5)
+            self.materialisation.refresh(project_id, 2, 5)
+
+        self.materialisation.invalidate_project(1)
+        self.assertIsNone(self.materialisation.aliases(1, 2, 5))
+        self.assertEqual(self.materialisation.aliases(2, 2, 5), [])
+
+        self.materialisation.refresh(1, 2, 5)
+        self.assertEqual(self.materialisation.aliases(1, 2, 5), [])
+
+    def test_each_change_queues_a_refresh(self):
+        self.materialisation.refresh(1, 2, 5)
+        self.enqueue_refresh.reset_mock()
+
+        self.materialisation.invalidate_project(1)
+        self.materialisation.invalidate_project(1)  # While the first refresh runs
+        self.assertEqual(self.enqueue_refresh.call_args_list, [mock.call(1, 2, 5, 2), mock.call(1, 2, 5, 3)])
+
+    def test_refresh_is_queued_once_per_generation(self):
+        other = Materialisation('test_queued', [])
+        self.addCleanup(_materialisations.pop, 'test_queued', None)
+        with mock.patch('util.materialise_util.job_queue') as job_queue:
+            for generation in (1, 1, 2):
+                other._enqueue_refresh(1, 2, 5, generation)
+        self.assertEqual(job_queue.enqueue.call_count, 2)
@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask, jsonify
+
+from util.cache_util import TTLCache
+from util.factories import CdhFty, ProjectFty, UserFty
+from util.response_cache import ResponseCache, invalidate_cdh
+from util.test_base import TestBase
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    cache = ResponseCache('branches')
+    cache.init_app(app)
+    return app, cache
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'response_cache.sqlite3')
+
+    def store(self, app, cache, key, data):
+        with app.test_request_context():
+            return cache.store(key, jsonify(data))
+
+    def get(self, app, cache, key):
+        with app.test_request_context():
+            resp = cache.get(key)
+            return None if resp is None else json.loads(resp.get_data(as_text=True))
+
+    def test_shared_by_default(self):
+        app, cache = make_app(RESPONSE_CACHE_PATH=self.path)
+        other_app, other_cache = make_app(RESPONSE_CACHE_PATH=self.path)
+        self.store(app, cache, cache.key(1, 'a'), {'n': 1})
+        self.assertEqual(self.get(other_app, other_cache, other_cache.key(1, 'a')), {'n': 1})
+
+        other_cache.invalidate_project(1)
+        self.assertIsNone(self.get(app, cache, cache.key(1, 'a')), 'invalidated by another process')
+
+    def test_memory_backend(self):
+        app, cache = make_app(RESPONSE_CACHE_PATH='')
+        self.assertIsInstance(cache.backend, TTLCache)
+        self.store(app, cache, cache.key(1, 'a'), {'n': 1})
+        self.assertEqual(self.get(app, cache, cache.key(1, 'a')), {'n': 1})
+
+    def test_read_started_before_an_invalidation_is_not_stored(self):
+        app, cache = make_app(RESPONSE_CACHE_PATH=self.path)
+        stale_key = cache.key(1, 'a')
+        cache.invalidate_project(1)
+        resp = self.store(app, cache, stale_key, {'n': 'stale'})
+
+        self.assertEqual(resp.headers['X-Cache'], 'MISS')
+        self.assertIsNone(self.get(app, cache, stale_key))
+        self.assertIsNone(self.get(app, cache, cache.key(1, 'a')))
+
+    def test_invalidation_is_per_project(self):
+        app, cache = make_app(RESPONSE_CACHE_PATH=self.path)
+        key = cache.key(2, 'a')
+        self.store(app, cache, key, {'n': 2})
+        cache.invalidate_project(1)
+        self.assertEqual(self.get(app, cache, cache.key(2, 'a')), {'n': 2})
+
+
+class InvalidateCdhTestCase(TestBase):
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        owner_user = UserFty(name='owner1', email='owner1@sainsburys.co.uk')
+        cdh = CdhFty()
+        self.projects = [ProjectFty(cdh=cdh, owner_user=owner_user), ProjectFty(cdh=cdh, owner_user=owner_user),
+                         ProjectFty(owner_user=owner_user)]
+        self.session.commit()
+        self.cache = ResponseCache('branches')
+        for patcher in (mock.patch('util.response_cache.branches_cache', self.cache),
+                        mock.patch('util.response_cache._project_invalidation_callbacks', [])):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_every_project_of_the_cdh_is_invalidated(self):
+        keys = [self.cache.key(project.id, 'a') for project in self.projects]
+        for key in keys:
+            self.cache.backend.set(key, ('{}', 'etag'))
+
+        invalidate_cdh(self.projects[0].cdh_id)
+
+        self.assertEqual([self.cache.backend.get(key) is not None for key in keys], [False, False, True])
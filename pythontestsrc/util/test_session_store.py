@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+
+from flask import Flask, session
+
+from util.cache_util import TTLCache
+from util.session_store import SWEEP_INTERVAL, ServerSideSessionInterface, init_session_store, regenerate_session
+
+PROFILE = {'email': 'user1@sainsburys.co.uk', 'name': 'User 1', 'picture': 'https://example.com/user1.png'}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.secret_key = 'secret'
+    app.config.update(config)
+
+    @app.route('/login')
+    def login():
+        regenerate_session(session)
+        session['profile'] = PROFILE
+        return 'ok'
+
+    @app.route('/profile')
+    def profile():
+        return session.get('profile', {}).get('email', 'anonymous')
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    init_session_store(app)
+    return app
+
+
+def session_cookie(resp):
+    return [header for header in resp.headers.getlist('Set-Cookie') if header.startswith('session=')]
+
+
+class SessionStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check_session_round_trip(self, app):
+        store = app.session_interface.store
+        with app.test_client() as client:
+            cookie = session_cookie(client.get('/login'))[0]
+            sid = cookie.split(';')[0].split('=', 1)[1]
+            self.assertEqual(len(sid), 64)
+            self.assertNotIn('user1', cookie)
+            self.assertEqual(store.get(sid), {'profile': PROFILE})
+
+            resp = client.get('/profile')
+            self.assertEqual(resp.get_data(as_text=True), 'user1@sainsburys.co.uk')
+            self.assertEqual(session_cookie(resp), [], 'an unmodified session is not saved again')
+
+            client.get('/logout')
+            self.assertIsNone(store.get(sid))
+            self.assertEqual(client.get('/profile').get_data(as_text=True), 'anonymous')
+
+    def test_memory_store(self):
+        self.check_session_round_trip(make_app(SESSION_STORE='memory'))
+
+    def test_sqlite_store(self):
+        self.check_session_round_trip(make_app(SESSION_STORE='sqlite', SESSION_STORE_PATH=os.path.join(
+            self.directory.name, 'sessions.sqlite3')))
+
+    def test_cookie_sessions_by_default(self):
+        app = make_app()
+        self.assertNotIsInstance(app.session_interface, ServerSideSessionInterface)
+        with app.test_client() as client:
+            client.get('/login')
+            self.assertEqual(client.get('/profile').get_data(as_text=True), 'user1@sainsburys.co.uk')
+
+    def test_unknown_store(self):
+        with self.assertRaises(ValueError):
+            make_app(SESSION_STORE='redis')
+
+    def test_login_gives_the_session_a_new_id(self):
+        app = make_app(SESSION_STORE='memory')
+        store = app.session_interface.store
+        with app.test_client() as client:
+            client.set_cookie('localhost', 'session', 'fixed')
+            store.set('fixed', {'next': '/main'})
+            cookie = session_cookie(client.get('/login'))[0]
+            sid = cookie.split(';')[0].split('=', 1)[1]
+
+            self.assertNotEqual(sid, 'fixed')
+            self.assertIsNone(store.get('fixed'))
+            self.assertEqual(store.get(sid), {'next': '/main', 'profile': PROFILE})
+
+    def test_unknown_session_id_starts_a_new_session(self):
+        app = make_app(SESSION_STORE='memory')
+        with app.test_client() as client:
+            client.set_cookie('localhost', 'session', 'unknown')
+            self.assertEqual(client.get('/profile').get_data(as_text=True), 'anonymous')
+
+    def test_sweep_deletes_expired_sessions(self):
+        store_clock, sweep_clock = FakeClock(), FakeClock()
+        interface = ServerSideSessionInterface(TTLCache(10, 60, clock=store_clock), clock=sweep_clock)
+        interface.store.set('a', {})
+        store_clock.now = 60
+
+        self.assertEqual(interface.sweep(), 0, 'swept at most every SWEEP_INTERVAL seconds')
+        sweep_clock.now = SWEEP_INTERVAL
+        self.assertEqual(interface.sweep(), 1)
+        self.assertEqual(len(interface.store), 0)
@@ -0,0 +1,43 @@
+from flask import Flask
+
+from util.factories import UserFty
+from util.test_base import TestBase
+
+
+def rollback_app():
+    """
+    A throwaway app, so the route isn't registered on the API: it removes db.session at the end of each request as
+    Flask-SQLAlchemy does for the API.
+    """
+    rollback = Flask(__name__)
+
+    @rollback.route('/rollback')
+    def rollback_api():
+        db.session.add(models.User(name='rolledback1', email='rolledback1@sainsburys.co.uk'))
+        db.session.flush()
+        db.session.rollback()
+        return 'OK'
+
+    @rollback.teardown_appcontext
+    def shutdown_session(response_or_exc):
+        db.session.remove()
+
+    return rollback
+
+
+class TransactionIsolationTestCase(TestBase):
+    TEST_DB_ISOLATION = 'transaction'
+
+    def setUp(self, create_all=True, factory_create=True):
+        super().setUp(create_all, factory_create)
+        self.user = UserFty(name='fixture1', email='fixture1@sainsburys.co.uk')
+        self.session.commit()
+
+    def test_rollbacks_between_requests_keep_the_fixtures(self):
+        client = rollback_app().test_client()
+        for _ in range(2):
+            resp = client.get('/rollback')
+            self.assertEqual(resp.status_code, 200)
+
+        self.assertEqual(models.User.query.filter_by(email='fixture1@sainsburys.co.uk').count(), 1)
+        self.assertEqual(models.User.query.filter_by(email='rolledback1@sainsburys.co.uk').count(), 0)
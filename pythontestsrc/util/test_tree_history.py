@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+from util.tree_history import TreeHistory
+
+
+def nodes(*names):
+    """
+    :return: (items, keys) of sku nodes named name, with IDs in the order given
+    """
+    items = [{'node_type': 'sku', 'node_id': node_id, 'name': name} for node_id, name in enumerate(names)]
+    return items, [('sku', item['node_id']) for item in items]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TreeHistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'tree_history.sqlite3')
+        self.clock = FakeClock()
+        self.history = self.make_history()
+
+    def make_history(self):
+        history = TreeHistory('test', self.path, clock=self.clock)
+        history.revisions = 2
+        return history
+
+    def change(self, tree_id, *names, history=None):
+        """
+        Record the tree after marking it stale, as done when its source data changes.
+        """
+        history = history or self.history
+        history.mark_stale(tree_id)
+        return history.record(tree_id, *nodes(*names))
+
+    def test_revision_only_changes_with_the_tree(self):
+        first = self.history.record(1, *nodes('a', 'b'))
+        self.assertEqual(first, '1')
+        self.assertEqual(self.history.record(1, *nodes('a', 'b')), first)
+        self.assertEqual(self.change(1, 'a', 'b'), first)
+        self.assertEqual(self.change(1, 'a', 'c'), '2')
+        self.assertEqual(self.history.record(2, *nodes('a')), '1', 'counted per tree')
+
+    def test_nodes_are_only_compared_when_stale_or_after_the_recheck_interval(self):
+        first = self.history.record(1, *nodes('a'))
+        self.assertEqual(self.history.record(1, *nodes('b')), first)
+        self.clock.now += self.history.recheck_interval
+        self.assertEqual(self.history.record(1, *nodes('b')), '2')
+
+    def test_touched_since(self):
+        first = self.history.record(1, *nodes('a', 'b', 'c'))
+        second = self.change(1, 'a', 'B', 'c')
+        self.change(1, 'a', 'B')
+        self.assertEqual(self.history.touched_since(1, first), {('sku', 1), ('sku', 2)})
+        self.assertEqual(self.history.touched_since(1, second), {('sku', 2)})
+
+    def test_shared_between_processes(self):
+        first = self.history.record(1, *nodes('a', 'b'))
+        other = self.make_history()
+        self.assertEqual(other.record(1, *nodes('a', 'b')), first)
+        second = self.change(1, 'a', 'c', history=other)
+        self.assertEqual(self.history.touched_since(1, first), {('sku', 1)})
+        self.assertTrue(self.history.is_current(1, second))
+
+    def test_unknown_revisions_are_not_diffed(self):
+        first = self.history.record(1, *nodes('a'))
+        self.assertEqual(self.history.touched_since(1, first), set())
+        self.assertIsNone(self.history.touched_since(2, first))
+        self.assertIsNone(self.history.touched_since(1, '0'))
+        self.assertIsNone(self.history.touched_since(1, 'garbage'))
+        self.assertIsNone(self.history.touched_since(1, '99'))
+
+        # Only the last two revisions are kept
+        for name in ('b', 'c', 'd'):
+            self.change(1, name)
+        self.assertIsNone(self.history.touched_since(1, first))
+        self.assertEqual(self.history.touched_since(1, '2'), {('sku', 0)})
+
+    def test_is_current(self):
+        revision = self.history.record(1, *nodes('a'))
+        self.assertTrue(self.history.is_current(1, revision))
+        self.assertFalse(self.history.is_current(1, '0'))
+        self.assertFalse(self.history.is_current(2, revision))
+
+        self.history.mark_stale(1)
+        self.assertFalse(self.history.is_current(1, revision), 'until the tree is read again')
+        self.history.record(1, *nodes('a'))
+        self.assertTrue(self.history.is_current(1, revision))
+
+        self.clock.now += self.history.recheck_interval
+        self.assertFalse(self.history.is_current(1, revision), 'the tree must be read again now and then')
+        self.assertEqual(self.history.stats(), {'hits': 2, 'misses': 2, 'size': 1})
+
+    def test_tree_marked_stale_during_a_read_stays_stale(self):
+        revision = self.history.record(1, *nodes('a'))
+        stale_counter = self.history.stale_counter(1)
+        self.history.mark_stale(1)  # While the tree is being read
+        self.assertEqual(self.history.record(1, *nodes('a'), stale_counter=stale_counter), revision)
+        self.assertFalse(self.history.is_current(1, revision))
+
+        self.history.record(1, *nodes('a'), stale_counter=self.history.stale_counter(1))
+        self.assertTrue(self.history.is_current(1, revision))
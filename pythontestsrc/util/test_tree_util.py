@@ -0,0 +1,43 @@
+import unittest
+
+from util.tree_util import Tree
+
+
+class TreeTestCase(unittest.TestCase):
+    def setUp(self):
+        # Children listed before their parents, and an orphan whose parent isn't in the list
+        rows = [
+            ('sku', 1, 'group', 1),
+            ('group', 1, 'category', 1),
+            ('sku', 2, 'group', 1),
+            ('category', 1, None, None),
+            ('category', 2, None, None),
+            ('sku', 3, 'group', 99),
+        ]
+        self.items = [{'node_type': node_type, 'node_id': node_id} for node_type, node_id, _, _ in rows]
+        self.tree = Tree(self.items,
+                         [(node_type, node_id) for node_type, node_id, _, _ in rows],
+                         [None if parent_type is None else (parent_type, parent_id)
+                          for _, _, parent_type, parent_id in rows])
+
+    def test_roots_and_children_are_linked(self):
+        self.assertEqual([(item['node_type'], item['node_id']) for item in self.tree.roots],
+                         [('category', 1), ('category', 2)])
+        group = self.tree.roots[0]['children'][0]
+        self.assertEqual(group['node_type'], 'group')
+        self.assertEqual([item['node_id'] for item in group['children']], [1, 2])
+        self.assertEqual(self.tree.roots[1]['children'], [])
+
+    def test_get_returns_subtree(self):
+        group = self.tree.get(('group', 1))
+        self.assertEqual(len(group['children']), 2)
+        self.assertIsNone(self.tree.get(('group', 2)))
+
+    def test_truncate_copies_down_to_depth(self):
+        truncated = self.tree.truncate(self.tree.roots, 1)
+        self.assertEqual(truncated[0]['children'][0]['node_type'], 'group')
+        self.assertEqual(truncated[0]['children'][0]['children'], [])
+        # The tree itself is unchanged
+        self.assertEqual(len(self.tree.get(('group', 1))['children']), 2)
+
+        self.assertEqual(self.tree.truncate([self.tree.get(('group', 1))], 0)[0]['children'], [])